@@ -16,9 +16,7 @@ def create_app():
     # CORS
     CORS(app, supports_credentials=True)
     
-    # Initialize Firebase (if needed)
-    from app.utils.helpers import initialize_firebase
-    initialize_firebase()
+    # Firebase is initialized lazily by the first Firebase login (AuthService)
     
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -27,6 +25,9 @@ def create_app():
     from app.routes.todos import todos_bp
     from app.routes.ai_routes import ai_bp
     from app.routes.dashboard import dashboard_bp
+    from app.routes.jobs import jobs_bp
+    from app.routes.admin import admin_bp
+    from app.routes.conversations import conversations_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(users_bp)
@@ -34,6 +35,25 @@ def create_app():
     app.register_blueprint(todos_bp)
     app.register_blueprint(ai_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(conversations_bp)
+    
+    # Dashboard summaries are kept up to date by plan/todo events
+    from app.services.stats_service import register_event_handlers
+    register_event_handlers()
+    
+    # `flask indexes sync|check`; optionally build missing indexes on boot
+    from app.cli import register_cli
+    register_cli(app)
+    
+    from app.utils.indexes import INDEXES_SYNC_ON_STARTUP, sync_indexes_in_background
+    if INDEXES_SYNC_ON_STARTUP:
+        sync_indexes_in_background()
+    
+    # inprocess jobs: re-run jobs lost by a restart or a dead worker thread
+    from app.services.job_service import JobService
+    JobService.start_recovery()
     
     # Add headers middleware
     @app.after_request
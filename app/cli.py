@@ -0,0 +1,207 @@
+import os
+import sys
+import click
+from flask.cli import AppGroup
+
+indexes_cli = AppGroup("indexes", help="Manage the declared MongoDB indexes.")
+
+
+@indexes_cli.command("sync")
+def sync_indexes():
+    """Build missing indexes (existing ones are left untouched)."""
+    from app.utils.helpers import get_db
+    from app.utils.indexes import ensure_indexes, format_report, has_drift
+
+    reports = ensure_indexes(get_db())
+    for report in reports:
+        for line in format_report(report):
+            click.echo(line)
+    created = sum(len(report["created"]) for report in reports)
+    click.echo(f"{created} index(es) built")
+    if has_drift(reports):
+        sys.exit(1)
+
+
+@indexes_cli.command("check")
+def check_indexes():
+    """Report drift between declared and live indexes; exits 1 if any."""
+    from app.utils.helpers import get_db
+    from app.utils.indexes import check_indexes as check, format_report, has_drift
+
+    reports = check(get_db())
+    for report in reports:
+        for line in format_report(report):
+            click.echo(line)
+    if has_drift(reports):
+        click.echo("Index drift found")
+        sys.exit(1)
+    click.echo("Indexes match the declared specs")
+
+
+plans_cli = AppGroup("plans", help="Maintenance for learning plans.")
+
+
+@plans_cli.command("repair-counters")
+@click.option("--user", "user_id", default=None, help="Only recount this user's plans.")
+def repair_counters(user_id):
+    """Recompute totalTodos/completedTodos, progress and status from the todos."""
+    from app.services.todo_service import TodoService
+
+    result = TodoService.repair_plan_counters(user_id)
+    click.echo(f"{result['plans']} plan(s) recounted, {result['repaired']} had drifted")
+
+
+dashboard_cli = AppGroup("dashboard", help="Dashboard query diagnostics.")
+
+
+@dashboard_cli.command("explain")
+@click.option("--user", "user_id", required=True, help="User whose dashboard query is explained.")
+def explain_dashboard(user_id):
+    """Explain the dashboard aggregation; exits 1 if any part scans a whole collection."""
+    from app.services.dashboard_service import DashboardService
+
+    report = DashboardService.explain_dashboard(user_id)
+    for part, scans in report.items():
+        click.echo(f"  {'❌' if scans else '✅'} {part}: {', '.join(scans) or 'index scans only'}")
+    if any(report.values()):
+        click.echo("Collection scans found; run `flask indexes sync`")
+        sys.exit(1)
+
+
+stats_cli = AppGroup("stats", help="Write-time dashboard summaries (user_stats).")
+
+
+@stats_cli.command("rebuild")
+@click.option("--user", "user_id", default=None, help="Only rebuild this user's summary.")
+def rebuild_stats(user_id):
+    """Recompute dashboard summaries from plans and todos."""
+    from app.services.stats_service import StatsService
+
+    result = StatsService.rebuild(user_id)
+    click.echo(f"{result['users']} summary(ies) rebuilt")
+
+
+@stats_cli.command("check")
+@click.option("--user", "user_id", required=True, help="User whose summary is compared.")
+def check_stats(user_id):
+    """Compare a user's summary with the dashboard computed from todos; exits 1 on drift."""
+    from app.services.dashboard_service import DashboardService
+
+    summary = DashboardService.get_dashboard_data(user_id)
+    if isinstance(summary, tuple):
+        click.echo(summary[0]["message"])
+        sys.exit(1)
+    stored = summary["dashboard"]["overallStats"]
+    live = DashboardService.get_live_dashboard_data(user_id)["overallStats"]
+
+    drift = {name: (stored.get(name), value) for name, value in live.items() if stored.get(name) != value}
+    for name, (stored_value, live_value) in drift.items():
+        click.echo(f"  ⚠️ {name}: summary {stored_value}, live {live_value}")
+    if drift:
+        click.echo("Summary has drifted; run `flask stats rebuild --user ...`")
+        sys.exit(1)
+    click.echo("Summary matches the live dashboard")
+
+
+llm_cli = AppGroup("llm", help="Offline checks for the prompt templates.")
+
+# Inputs every registered prompt is rendered with by `flask llm check-prompts`
+PROMPT_SAMPLES = {
+    "chat_qa": {"tasks_context": "Day 1: Variables", "chat_history": [], "question": "What is a variable?"},
+    "roadmap": {"topic": "Python", "days": 3, "hours": 2},
+    "task_qa": {"tasks_context": "Day 1: Variables", "question": "How do I name variables?"},
+    "refinement": {"roadmap": '{"topic": "Python", "roadmap": []}', "instruction": "Add a review day"},
+    "refinement_patch": {"roadmap": '{"topic": "Python", "roadmap": []}', "instruction": "Add a review day"},
+    "flashcards": {"topic": "Python", "understanding": '{"loops": 40}'},
+    "study_guide": {"topic": "Python", "understanding": '{"loops": 40}'},
+    "materials": {"topic": "Python"},
+    "search_enhanced": {"search_results": "Python tutorial https://docs.python.org", "understanding": "{}",
+                        "chat_history": [], "question": "Latest Python release?"},
+    "history_summary": {"previous_summary": "(none)", "messages": "Student: hi", "max_words": 50},
+}
+
+# Templates answered in plain text rather than JSON
+TEXT_PROMPTS = {"history_summary"}
+
+
+def _changed(value):
+    """A different value of the same kind, for the cache key check"""
+    if isinstance(value, list):
+        return value + [{"type": "human", "content": "another message"}]
+    if isinstance(value, int):
+        return value + 1
+    return f"{value} (changed)"
+
+
+@llm_cli.command("check-prompts")
+def check_prompts():
+    """Render, key and run every registered prompt with the offline fake model; exits 1 on failure."""
+    from app.utils import ai_helpers
+
+    # The check never calls a real model. Roadmaps take a moment so that
+    # concurrent generations overlap in the single-flight check below.
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ.setdefault("FAKE_LLM_LATENCY_ROADMAP", "fixed:0.2")
+    ai_helpers.llm_provider.reset()
+
+    failures = 0
+    for name, prompt in ai_helpers.registered_prompts():
+        sample = PROMPT_SAMPLES.get(name)
+        problem = None
+        if sample is None:
+            problem = "no sample inputs"
+        elif set(prompt.input_variables) != set(sample):
+            # Unescaped braces show up here as extra "variables"
+            problem = f"template variables {sorted(prompt.input_variables)}, expected {sorted(sample)}"
+        else:
+            try:
+                prompt.invoke(sample)
+            except Exception as e:
+                problem = f"render failed: {e!r}"
+        if problem is None:
+            # Every input must reach the cache key, or different requests share an answer
+            key = ai_helpers.llm_cache_key(prompt, sample)
+            ignored = [
+                variable for variable, value in sample.items()
+                if ai_helpers.llm_cache_key(prompt, {**sample, variable: _changed(value)}) == key
+            ]
+            if ignored:
+                problem = f"cache key ignores {ignored}"
+        if problem is None:
+            if name in TEXT_PROMPTS:
+                answer = ai_helpers.invoke_llm(prompt.invoke(sample), template=name, inputs=sample).content
+            else:
+                answer = ai_helpers.run_chain(prompt, sample, use_cache=False)
+            if not answer:
+                problem = "no answer"
+
+        failures += problem is not None
+        click.echo(f"  {'❌' if problem else '✅'} {name}{': ' + problem if problem else ''}")
+
+    # Concurrent generations for different inputs must not be coalesced
+    from concurrent.futures import ThreadPoolExecutor
+
+    topics = ["Python", "Rust"]
+    prompt = ai_helpers.get_prompt("roadmap_prompt")
+    with ThreadPoolExecutor(max_workers=len(topics)) as pool:
+        roadmaps = list(pool.map(
+            lambda topic: ai_helpers.run_chain(prompt, {**PROMPT_SAMPLES["roadmap"], "topic": topic}, use_cache=False),
+            topics
+        ))
+    answered = [(roadmap or {}).get("topic") for roadmap in roadmaps]
+    coalesced = answered != topics
+    failures += coalesced
+    click.echo(f"  {'❌' if coalesced else '✅'} concurrent roadmaps for {topics} answered for {answered}")
+
+    if failures:
+        click.echo(f"{failures} check(s) failed")
+        sys.exit(1)
+    click.echo("Every prompt renders, keys and parses")
+
+
+def register_cli(app):
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(plans_cli)
+    app.cli.add_command(dashboard_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(llm_cli)
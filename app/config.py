@@ -11,6 +11,84 @@ class Config:
     # Gemini AI
     GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
     
+    # LLM provider: "gemini" or the offline "fake" model for benchmarks
+    LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+    FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "fixed:0")
+    
+    # LLM scheduler (per worker)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+    LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "60"))
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+    
+    # Hedged LLM requests
+    LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+    LLM_HEDGE_TEMPLATES = os.getenv("LLM_HEDGE_TEMPLATES", "")
+    
+    # LLM response cache
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() != "false"
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+    LLM_CACHE_DEFAULT_TTL = int(os.getenv("LLM_CACHE_DEFAULT_TTL", "3600"))
+    LLM_SINGLEFLIGHT_TIMEOUT = float(os.getenv("LLM_SINGLEFLIGHT_TIMEOUT", "90"))
+    MATERIALS_SINGLEFLIGHT_TIMEOUT = float(os.getenv("MATERIALS_SINGLEFLIGHT_TIMEOUT", "120"))
+    
+    # Web search cache
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "21600"))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+    SEARCH_CACHE_PERSIST = os.getenv("SEARCH_CACHE_PERSIST", "false").lower() == "true"
+    SEARCH_CORPUS_ENABLED = os.getenv("SEARCH_CORPUS_ENABLED", "true").lower() == "true"
+    # memory | mongo | file (the JSONL file is for single-process deployments)
+    SEARCH_CORPUS_BACKEND = os.getenv("SEARCH_CORPUS_BACKEND", "memory")
+    SEARCH_CORPUS_PATH = os.getenv("SEARCH_CORPUS_PATH", ".cache/search_corpus.jsonl")
+    SEARCH_CORPUS_MAX_AGE = int(os.getenv("SEARCH_CORPUS_MAX_AGE", "604800"))
+    
+    # Chat history compaction
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+    CHAT_HISTORY_KEEP_MESSAGES = int(os.getenv("CHAT_HISTORY_KEEP_MESSAGES", "6"))
+    
+    # Server-side conversations
+    CONVERSATION_BUCKET_SIZE = int(os.getenv("CONVERSATION_BUCKET_SIZE", "50"))
+    # Cap on unsummarized messages loaded per turn; older ones live in the stored summary
+    CONVERSATION_CONTEXT_MESSAGES = int(os.getenv("CONVERSATION_CONTEXT_MESSAGES", "100"))
+    CONVERSATION_PAGE_SIZE = int(os.getenv("CONVERSATION_PAGE_SIZE", "30"))
+    
+    # Learner understanding store
+    UNDERSTANDING_CACHE_TTL = int(os.getenv("UNDERSTANDING_CACHE_TTL", "60"))
+    
+    # Prompt construction
+    TASK_CONTEXT_TOP_K = int(os.getenv("TASK_CONTEXT_TOP_K", "8"))
+    ROADMAP_REFINE_MODE = os.getenv("ROADMAP_REFINE_MODE", "patch")
+    
+    # Circuit breakers (CIRCUIT_LLM_* / CIRCUIT_SEARCH_* override the rest)
+    CIRCUIT_LLM_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_LLM_SLOW_CALL_SECONDS", "20"))
+    CIRCUIT_SEARCH_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SEARCH_SLOW_CALL_SECONDS", "8"))
+    # Half-open trial calls that never report back free their slot after this
+    CIRCUIT_LLM_TRIAL_TIMEOUT = float(os.getenv("CIRCUIT_LLM_TRIAL_TIMEOUT", "60"))
+    CIRCUIT_SEARCH_TRIAL_TIMEOUT = float(os.getenv("CIRCUIT_SEARCH_TRIAL_TIMEOUT", "60"))
+    
+    # Admin endpoints (/admin/*) are disabled unless a key is set
+    ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+    
+    # Plan creation (todo materialization)
+    TODO_INSERT_BATCH_SIZE = int(os.getenv("TODO_INSERT_BATCH_SIZE", "500"))
+    PLAN_WRITE_MODE = os.getenv("PLAN_WRITE_MODE", "auto")
+    
+    # MongoDB indexes (app/utils/indexes.py); `flask indexes sync` builds them
+    INDEXES_SYNC_ON_STARTUP = os.getenv("INDEXES_SYNC_ON_STARTUP", "false").lower() == "true"
+    
+    # Background jobs
+    JOB_MODE = os.getenv("JOB_MODE", "inprocess")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "86400"))
+    # Running jobs heartbeat; one silent for JOB_LEASE_SECONDS is re-queued
+    # (or failed after JOB_MAX_ATTEMPTS). In inprocess mode a sweeper thread
+    # also runs jobs left queued by a restarted worker.
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+    JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RECOVERY_INTERVAL = float(os.getenv("JOB_RECOVERY_INTERVAL", "60"))
+    
     # Firebase
     FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
     FIREBASE_CLIENT_EMAIL = os.getenv("FIREBASE_CLIENT_EMAIL")
@@ -1,3 +1,5 @@
+import os
+import hmac
 import jwt
 from functools import wraps
 from flask import request, jsonify
@@ -96,4 +98,31 @@ def token_required(f):
         
         return f(*args, **kwargs)
     
-    return decorated
\ No newline at end of file
+    return decorated
+
+
+def admin_required(f):
+    """
+    Decorator for operational endpoints: requires the X-Admin-Key header to
+    match ADMIN_API_KEY. The endpoints are disabled when no key is configured.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        admin_key = os.getenv("ADMIN_API_KEY")
+        if not admin_key:
+            return jsonify({
+                "status": "error",
+                "message": "Endpoint not found"
+            }), 404
+
+        provided = request.headers.get('X-Admin-Key', '')
+        if not hmac.compare_digest(provided.encode("utf-8"), admin_key.encode("utf-8")):
+            print(f"❌ [AUTH] Invalid admin key - Path: {request.path}")
+            return jsonify({
+                "status": "error",
+                "message": "Invalid admin key"
+            }), 401
+
+        return f(*args, **kwargs)
+
+    return decorated
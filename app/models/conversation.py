@@ -0,0 +1,54 @@
+from datetime import datetime
+
+class Conversation:
+    USER = "user"
+    AI = "ai"
+
+    @staticmethod
+    def create_conversation_doc(user_id, bucket_size, topic=None, kind="chat", title=None):
+        return {
+            "userId": user_id,
+            "topic": topic,
+            "kind": kind,
+            "title": title or topic or "New conversation",
+            "messageCount": 0,
+            # Fixed per conversation so seq -> bucket never changes if the setting does
+            "bucketSize": bucket_size,
+            # Rolling summary of every message with seq < summarizedThroughSeq
+            "summary": None,
+            "summarizedThroughSeq": 0,
+            "createdAt": datetime.now(),
+            "updatedAt": datetime.now(),
+            "lastMessageAt": None
+        }
+
+    @staticmethod
+    def create_message(seq, role, text):
+        return {
+            "seq": seq,
+            "role": role,
+            "text": text,
+            "createdAt": datetime.now()
+        }
+
+    @staticmethod
+    def get_conversation_response(conversation):
+        last_message_at = conversation.get('lastMessageAt')
+        return {
+            "id": str(conversation['_id']),
+            "topic": conversation.get('topic'),
+            "kind": conversation.get('kind'),
+            "title": conversation.get('title'),
+            "messageCount": conversation.get('messageCount', 0),
+            "createdAt": conversation['createdAt'].isoformat() if conversation.get('createdAt') else None,
+            "lastMessageAt": last_message_at.isoformat() if last_message_at else None
+        }
+
+    @staticmethod
+    def get_message_response(message):
+        return {
+            "seq": message.get('seq'),
+            "role": message.get('role'),
+            "text": message.get('text'),
+            "createdAt": message['createdAt'].isoformat() if message.get('createdAt') else None
+        }
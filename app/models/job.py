@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+class Job:
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+    @staticmethod
+    def create_job_doc(user_id, kind, payload, ttl_seconds):
+        return {
+            "userId": user_id,
+            "kind": kind,
+            "payload": payload,
+            "status": Job.QUEUED,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "createdAt": datetime.now(),
+            "updatedAt": datetime.now(),
+            "startedAt": None,
+            "claimedAt": None,
+            "heartbeatAt": None,
+            "finishedAt": None,
+            "expiresAt": datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        }
+
+    @staticmethod
+    def get_job_response(job):
+        return {
+            "jobId": str(job['_id']),
+            "kind": job.get('kind'),
+            "status": job.get('status'),
+            "result": job.get('result'),
+            "error": job.get('error'),
+            "createdAt": job.get('createdAt'),
+            "finishedAt": job.get('finishedAt')
+        }
@@ -1,8 +1,13 @@
 from datetime import datetime
 
 class Plan:
+    # PENDING plans are still being written and are hidden from every listing
+    PENDING = "PENDING"
+    ONGOING = "ONGOING"
+    COMPLETED = "COMPLETED"
+
     @staticmethod
-    def create_plan_doc(user_id, topic, days, hours, roadmap=None):
+    def create_plan_doc(user_id, topic, days, hours, roadmap=None, status=ONGOING, total_todos=0):
         return {
             "userId": user_id,
             "topic": topic,
@@ -10,7 +15,10 @@ class Plan:
             "hours": hours,
             "roadmap": roadmap,
             "progress": 0,
-            "status": "ONGOING",
+            "status": status,
+            # Maintained by TodoService on every toggle/delete; progress is derived from them
+            "totalTodos": total_todos,
+            "completedTodos": 0,
             "startDate": datetime.now().isoformat(),
             "createdAt": datetime.now(),
             "updatedAt": datetime.now()
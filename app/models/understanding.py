@@ -0,0 +1,39 @@
+from datetime import datetime
+
+class Understanding:
+    MAX_LEVEL = 100
+
+    @staticmethod
+    def topic_key(topic):
+        return " ".join(str(topic or "").lower().split())
+
+    @staticmethod
+    def concept_field(concept):
+        """Mongo field path for a concept; '.', '$' and '%' are escaped in the key"""
+        key = str(concept).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+        return f"concepts.{key}"
+
+    @staticmethod
+    def decode_concept(key):
+        return key.replace("%2E", ".").replace("%24", "$").replace("%25", "%")
+
+    @staticmethod
+    def create_understanding_doc(user_id, topic):
+        return {
+            "userId": user_id,
+            "topic": Understanding.topic_key(topic),
+            "concepts": {},
+            "interactions": 0,
+            "createdAt": datetime.now(),
+            "updatedAt": datetime.now()
+        }
+
+    @staticmethod
+    def get_levels(doc):
+        """{concept: level} from a stored document, capped at MAX_LEVEL"""
+        if not doc:
+            return {}
+        return {
+            Understanding.decode_concept(key): min(level, Understanding.MAX_LEVEL)
+            for key, level in (doc.get("concepts") or {}).items()
+        }
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+class UserStats:
+    # Completed todos kept for the dashboard's recent activity
+    RECENT_LIMIT = 6
+
+    @staticmethod
+    def day_key(plan_id, day):
+        """Key in the `days` map counting a plan day's completed todos"""
+        return f"{plan_id}:{day}"
+
+    @staticmethod
+    def create_plan_entry(plan, total_todos=0, completed_todos=0):
+        return {
+            "topic": plan.get("topic"),
+            "days": plan.get("days") or 0,
+            "hours": plan.get("hours") or 0,
+            "studyHours": (plan.get("hours") or 0) * (plan.get("days") or 0),
+            "status": plan.get("status", "ONGOING"),
+            "startDate": plan.get("startDate"),
+            "createdAt": plan.get("createdAt"),
+            "totalTodos": total_todos,
+            "completedTodos": completed_todos
+        }
+
+    @staticmethod
+    def create_recent_entry(todo_id, plan_id, task, completed_at=None):
+        return {
+            "todoId": str(todo_id),
+            "planId": str(plan_id),
+            "task": task,
+            "completedAt": completed_at or datetime.now()
+        }
+
+    @staticmethod
+    def create_stats_doc(user_id, plans=None, days=None, recent=None, generation=None, snapshot_at=None):
+        """
+        Summary for one user built from scratch. `plans` maps plan id to a plan
+        entry and `days` maps day_key to that day's completed todo count.
+        `version` counts incremental updates; `generation` identifies the
+        rebuild that wrote the document and `snapshotAt` when it started reading.
+        """
+        plans = plans or {}
+        days = days or {}
+        completed_plans = sum(1 for entry in plans.values() if entry["status"] == "COMPLETED")
+        return {
+            "_id": user_id,
+            "plans": plans,
+            "days": days,
+            "recent": recent or [],
+            "totalPlans": len(plans),
+            "activePlans": len(plans) - completed_plans,
+            "completedPlans": completed_plans,
+            "totalTodos": sum(entry["totalTodos"] for entry in plans.values()),
+            "completedTodos": sum(entry["completedTodos"] for entry in plans.values()),
+            "activeDays": sum(1 for count in days.values() if count > 0),
+            "totalStudyHours": sum(entry["studyHours"] for entry in plans.values()),
+            "version": 0,
+            "generation": generation,
+            "snapshotAt": snapshot_at,
+            "rebuiltAt": datetime.now()
+        }
+
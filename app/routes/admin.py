@@ -0,0 +1,37 @@
+from flask import Blueprint, request, jsonify
+from app.middleware.auth import admin_required
+from app.services.job_service import JobService, ADMIN_JOB_USER
+
+# AdminService reads the AI helpers' stats, so it is imported inside the view.
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route("/admin/status", methods=["GET"])
+@admin_required
+def get_status():
+    from app.services.admin_service import AdminService
+    result = AdminService.get_status()
+    return jsonify(result)
+
+@admin_bp.route("/admin/repair-plan-counters", methods=["POST"])
+@admin_required
+def repair_plan_counters():
+    # Optional {"userId": ...} limits the recount to one user's plans
+    data = request.json or {}
+    result, code = JobService.submit(ADMIN_JOB_USER, "repair_plan_counters", {"userId": data.get("userId")})
+    return jsonify(result), code
+
+@admin_bp.route("/admin/rebuild-user-stats", methods=["POST"])
+@admin_required
+def rebuild_user_stats():
+    # Optional {"userId": ...} rebuilds a single user's dashboard summary
+    data = request.json or {}
+    result, code = JobService.submit(ADMIN_JOB_USER, "rebuild_user_stats", {"userId": data.get("userId")})
+    return jsonify(result), code
+
+@admin_bp.route("/admin/jobs/<job_id>", methods=["GET"])
+@admin_required
+def get_job(job_id):
+    result = JobService.get_job(ADMIN_JOB_USER, job_id)
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
+    return jsonify(result)
@@ -1,25 +1,50 @@
 # ai_routes.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from app.middleware.auth import token_required
-from app.services.ai_service import AIService
+from app.services.job_service import JobService
+from app.utils.helpers import format_sse
 from flask_cors import CORS
 
+# AIService (langchain, prompts, LLM clients) is imported inside the views so
+# worker boot does not pay for it.
 ai_bp = Blueprint('ai', __name__)
 CORS(ai_bp, resources={r"/ai-env/*": {"origins": "*"}}, supports_credentials=True)
 
+def sse_response(events):
+    """Stream (event, payload) tuples to the client as Server-Sent Events"""
+    def generate():
+        for event, payload in events:
+            yield format_sse(event, payload)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    # Disable proxy buffering so tokens reach the client immediately
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @ai_bp.route("/ask-about-task", methods=["POST"])
 @token_required
 def ask_about_task():
+    from app.services.ai_service import AIService
     data = request.json
     user_id = request.user_id
     
     result = AIService.ask_about_task(user_id, data)
     return jsonify(result)
 
+@ai_bp.route("/ask-about-task/stream", methods=["POST"])
+@token_required
+def ask_about_task_stream():
+    from app.services.ai_service import AIService
+    data = request.json or {}
+    user_id = request.user_id
+
+    return sse_response(AIService.stream_ask_about_task(user_id, data))
+
 @ai_bp.route("/ai-env/materials", methods=["POST"])
 @token_required
 def get_learning_materials():
+    from app.services.ai_service import AIService
     data = request.json
     topic = data.get("topic")
 
@@ -28,9 +53,14 @@ def get_learning_materials():
         # which is search-first and includes validation.
         materials = AIService.get_ai_generated_materials(topic)
 
+        # Categories whose search did not finish in time are flagged, not awaited
+        missing = materials.pop("missing", [])
+
         return jsonify({
             "status": "success",
-            "materials": materials
+            "materials": materials,
+            "partial": bool(missing),
+            "missingCategories": missing
         })
     except Exception as e:
         print("Error in get_learning_materials:", e)
@@ -44,18 +74,33 @@ def get_learning_materials():
 @ai_bp.route("/ai-env/chat", methods=["POST"])
 @token_required
 def ai_env_chat():
+    from app.services.ai_service import AIService
     data = request.json
     user_id = request.user_id
     
     result = AIService.handle_ai_chat(user_id, data)
     return jsonify(result)
 
+@ai_bp.route("/ai-env/chat/stream", methods=["POST"])
+@token_required
+def ai_env_chat_stream():
+    from app.services.ai_service import AIService
+    data = request.json or {}
+    user_id = request.user_id
+
+    return sse_response(AIService.stream_ai_chat(user_id, data))
+
 @ai_bp.route("/ai-env/flashcards", methods=["POST"])
 @token_required
 def generate_flashcards():
+    from app.services.ai_service import AIService
     data = request.json
+    if data and data.get("async"):
+        result, code = JobService.submit(request.user_id, "flashcards", data)
+        return jsonify(result), code
+
     try:
-        result = AIService.generate_flashcards(data)
+        result = AIService.generate_flashcards(data, request.user_id)
         
         # FIX: Return the result directly. The service already
         # formats it as {"status": "success", "flashcards": [...]}.
@@ -71,9 +116,14 @@ def generate_flashcards():
 @ai_bp.route("/ai-env/study-guide", methods=["POST"])
 @token_required
 def generate_study_guide():
+    from app.services.ai_service import AIService
     data = request.json
+    if data and data.get("async"):
+        result, code = JobService.submit(request.user_id, "study_guide", data)
+        return jsonify(result), code
+
     try:
-        result = AIService.generate_study_guide(data)
+        result = AIService.generate_study_guide(data, request.user_id)
         
         # FIX: Return the result directly. The service already
         # formats it as {"status": "success", "study_guide": {...}}.
@@ -84,4 +134,13 @@ def generate_study_guide():
         return jsonify({
             "status": "error",
             "message": "Failed to generate study guide"
-        }), 500
\ No newline at end of file
+        }), 500
+
+@ai_bp.route("/ai-env/understanding/<path:topic>", methods=["GET"])
+@token_required
+def get_understanding(topic):
+    from app.services.understanding_service import UnderstandingService
+    user_id = request.user_id
+
+    result = UnderstandingService.get_user_understanding(user_id, topic)
+    return jsonify(result)
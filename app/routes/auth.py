@@ -1,11 +1,12 @@
 from flask import Blueprint, request, jsonify
-from app.services.auth_service import AuthService
 from app.utils.validators import validate_email_password
 
+# AuthService (bcrypt, Firebase) is imported inside the views.
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route("/register", methods=["POST"])
 def register():
+    from app.services.auth_service import AuthService
     data = request.json
     email = data.get("email")
     password = data.get("password")
@@ -24,6 +25,7 @@ def register():
 
 @auth_bp.route("/login", methods=["POST"])
 def login():
+    from app.services.auth_service import AuthService
     if not request.is_json:
         return jsonify({"status": "error", "message": "Content-Type must be application/json"}), 400
 
@@ -44,6 +46,7 @@ def login():
 
 @auth_bp.route("/auth/firebase", methods=["POST"])
 def handle_firebase_auth():
+    from app.services.auth_service import AuthService
     data = request.json
     if not data:
         return jsonify({"status": "error", "message": "No JSON data provided"}), 400
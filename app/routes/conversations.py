@@ -0,0 +1,45 @@
+from flask import Blueprint, request, jsonify
+from app.middleware.auth import token_required
+from app.services.conversation_service import ConversationService
+
+conversations_bp = Blueprint('conversations', __name__)
+
+def respond(result):
+    if isinstance(result, tuple):
+        body, code = result
+        return jsonify(body), code
+    return jsonify(result)
+
+@conversations_bp.route("/conversations", methods=["POST"])
+@token_required
+def create_conversation():
+    data = request.json or {}
+    user_id = request.user_id
+
+    return respond(ConversationService.create_conversation(user_id, data))
+
+@conversations_bp.route("/conversations", methods=["GET"])
+@token_required
+def list_conversations():
+    user_id = request.user_id
+
+    return respond(ConversationService.list_conversations(
+        user_id, request.args.get("limit"), request.args.get("skip")
+    ))
+
+@conversations_bp.route("/conversations/<conversation_id>/messages", methods=["GET"])
+@token_required
+def get_messages(conversation_id):
+    user_id = request.user_id
+
+    # Pages go backwards in time: pass the previous page's nextBefore as `before`
+    return respond(ConversationService.get_messages(
+        user_id, conversation_id, request.args.get("before"), request.args.get("limit")
+    ))
+
+@conversations_bp.route("/conversations/<conversation_id>", methods=["DELETE"])
+@token_required
+def delete_conversation(conversation_id):
+    user_id = request.user_id
+
+    return respond(ConversationService.delete_conversation(user_id, conversation_id))
@@ -0,0 +1,14 @@
+from flask import Blueprint, request, jsonify
+from app.middleware.auth import token_required
+from app.services.job_service import JobService
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_job(job_id):
+    user_id = request.user_id
+    result = JobService.get_job(user_id, job_id)
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
+    return jsonify(result)
@@ -1,21 +1,29 @@
 from flask import Blueprint, request, jsonify
 from app.middleware.auth import token_required
-from app.services.plan_service import PlanService
+from app.services.job_service import JobService
 
+# PlanService pulls in the AI helpers, so it is imported inside the views.
 plans_bp = Blueprint('plans', __name__)
 
 @plans_bp.route("/generate-roadmap", methods=["POST"])
 @token_required
 def generate_roadmap():
+    from app.services.plan_service import PlanService
     data = request.json
     user_id = request.user_id
     
+    # Async mode returns a job id to poll at /jobs/<job_id>
+    if data and data.get("async"):
+        result, code = JobService.submit(user_id, "generate_roadmap", data)
+        return jsonify(result), code
+    
     result = PlanService.generate_roadmap(data)
     return jsonify(result)
 
 @plans_bp.route("/generate-todo", methods=["POST"])
 @token_required
 def generate_todo():
+    from app.services.plan_service import PlanService
     data = request.json
     user_id = request.user_id
     
@@ -25,6 +33,7 @@ def generate_todo():
 @plans_bp.route("/refine", methods=["POST"])
 @token_required
 def refine():
+    from app.services.plan_service import PlanService
     data = request.json
     roadmap = data.get("roadmap")
     instruction = data.get("instruction")
@@ -32,12 +41,18 @@ def refine():
     if not roadmap or not instruction:
         return jsonify({"status": "error", "message": "Missing roadmap or instruction"}), 400
 
-    result = PlanService.refine_roadmap(roadmap, instruction)
+    if data.get("async"):
+        result, code = JobService.submit(request.user_id, "refine", data)
+        return jsonify(result), code
+
+    # "mode": "patch" (default) or "full"
+    result = PlanService.refine_roadmap(roadmap, instruction, data.get("mode"))
     return jsonify(result)
 
 @plans_bp.route("/plans/active", methods=["GET"])
 @token_required
 def get_active_plans():
+    from app.services.plan_service import PlanService
     user_id = request.user_id
     result = PlanService.get_active_plans(user_id)
     return jsonify(result)
@@ -45,6 +60,7 @@ def get_active_plans():
 @plans_bp.route("/plans/all", methods=["GET"])
 @token_required
 def get_all_plans():
+    from app.services.plan_service import PlanService
     user_id = request.user_id
     result = PlanService.get_all_plans(user_id)
     return jsonify(result)
@@ -52,6 +68,7 @@ def get_all_plans():
 @plans_bp.route("/plans/<plan_id>", methods=["DELETE"])
 @token_required
 def delete_plan(plan_id):
+    from app.services.plan_service import PlanService
     user_id = request.user_id
     result = PlanService.delete_plan(user_id, plan_id)
     return jsonify(result)
@@ -59,6 +76,7 @@ def delete_plan(plan_id):
 @plans_bp.route("/check-initial-data", methods=["GET"])
 @token_required
 def check_initial_data():
+    from app.services.plan_service import PlanService
     user_id = request.user_id
     result = PlanService.check_initial_data(user_id)
     return jsonify(result)
@@ -67,6 +85,7 @@ def check_initial_data():
 @plans_bp.route("/todos/plan/<plan_id>/next-day-task", methods=["GET"])
 @token_required
 def get_next_day_task(plan_id):
+    from app.services.plan_service import PlanService
     user_id = request.user_id
     result = PlanService.get_next_day_task(user_id, plan_id)
     return jsonify(result)
\ No newline at end of file
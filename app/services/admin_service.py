@@ -0,0 +1,27 @@
+from datetime import datetime
+from app.utils.ai_helpers import (
+    get_circuit_breaker_stats,
+    get_llm_cache_stats,
+    get_search_cache_stats,
+    get_llm_scheduler_stats,
+    get_llm_hedge_stats
+)
+
+
+class AdminService:
+    @staticmethod
+    def get_status():
+        """Per-worker state of the AI dependencies: circuits, caches, scheduler and hedging"""
+        try:
+            return {
+                "status": "success",
+                "timestamp": datetime.now().isoformat(),
+                "circuits": get_circuit_breaker_stats(),
+                "llmCache": get_llm_cache_stats(),
+                "searchCache": get_search_cache_stats(),
+                "scheduler": get_llm_scheduler_stats(),
+                "hedging": get_llm_hedge_stats()
+            }
+        except Exception as e:
+            print(f"Error collecting admin status: {e}")
+            return {"status": "error", "message": "Failed to collect status"}, 500
@@ -1,7 +1,10 @@
+import os
+import copy
 import json
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from langchain_core.messages import HumanMessage, AIMessage
-import re
+from langchain_core.outputs import Generation
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from app.utils.ai_helpers import (
     run_chain, 
@@ -16,58 +19,55 @@ from app.utils.ai_helpers import (
     extract_resources_from_search,
     update_understanding_level,
     search,
-    extract_title_from_line,
-    extract_domain_from_url,
-    enhanced_process_ai_response  # Add this import
+    search_corpus,
+    enhanced_process_ai_response,  # Add this import
+    CodeFenceStreamParser,
+    invoke_llm,
+    stream_llm,
+    json_parser,
+    summarize_history
 )
 from app.utils.helpers import get_db
+from app.utils.singleflight import SingleFlight
+from app.utils.chat_history import compact_history, compact_stored_history
+from app.utils.keyword_matcher import match_keywords
+from app.utils.search_parser import parse_search_results, unique_records, truncate
+from app.utils.task_context import build_tasks_context
+from app.services.understanding_service import UnderstandingService
+from app.services.conversation_service import ConversationService
+
+# Bounded pool for concurrent web searches
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "8"))
+MATERIALS_SEARCH_DEADLINE = float(os.getenv("MATERIALS_SEARCH_DEADLINE", "8"))
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix="search")
+
+# Keyword categories that count as key concepts
+KEY_CONCEPT_CATEGORIES = {"concept.technical", "domain.basic", "domain.intermediate", "domain.advanced"}
+
+# Concurrent requests for the same topic share one materials generation
+MATERIALS_SINGLEFLIGHT_TIMEOUT = float(os.getenv("MATERIALS_SINGLEFLIGHT_TIMEOUT", "120"))
+materials_flight = SingleFlight(default_timeout=MATERIALS_SINGLEFLIGHT_TIMEOUT)
 
 class AIService:
     @staticmethod
     def ask_about_task(user_id, data):
         question = data.get("question")
-        tasks_context = data.get("context")
-        chat_history_raw = data.get("chat_history", [])
-
-        chat_history = []
-        for msg in chat_history_raw:
-            if msg.get("role") == "user":
-                chat_history.append(HumanMessage(content=msg.get("text")))
-            elif msg.get("role") == "ai":
-                chat_history.append(AIMessage(content=msg.get("text")))
 
         if not question:
             return {"status": "error", "message": "Missing question"}, 400
 
         try:
-            tasks_str = ""
-            if tasks_context and len(tasks_context) > 0:
-                tasks_str = "User's current tasks:\n"
-                for task in tasks_context:
-                    status = "✅ Completed" if task.get('completed') else "⏳ Pending"
-                    tasks_str += f"- [Group: {task.get('parent_task_title')}] {task.get('task')} ({task.get('duration_minutes', 0)}min) - {status}. Description: {task.get('description')}\n"
-                tasks_str += "\n"
-            
-            else:
-                tasks_str = "No tasks are currently defined."
+            data, conversation_id = AIService.load_conversation(user_id, data, "chat_history")
+            if data is None:
+                return {"status": "error", "message": "Conversation not found"}, 404
 
-            prompt_data = {
-                "tasks_context": tasks_str,
-                "question": question,
-                "chat_history": chat_history
-            }
+            prompt_data = AIService.build_task_chat_input(data, user_id)
 
-            from app.utils.ai_helpers import llm
             response = run_chain(chat_qa_prompt, prompt_data)
             if not response:
                 raise Exception("AI did not return JSON")
 
-            raw_answer = response.content
-
-            # FIX: Use enhanced processing instead of old method
-            processed_data = enhanced_process_ai_response(raw_answer)
-
-            return {
+            result = {
                 "status": "success",
                 "answer": response.get("markdown", ""),
                 "bullets": response.get("bullets", []),
@@ -75,109 +75,229 @@ class AIService:
                 "bold": response.get("bold", []),
                 "code_blocks": response.get("code_blocks", [])
             }
+            if conversation_id:
+                AIService.record_turn(user_id, conversation_id, question, result["answer"])
+                result["conversationId"] = conversation_id
+            return result
 
         except Exception as e:
             print(f"Error in ask-about-task: {e}")
             return {"status": "error", "message": "Failed to get AI response"}, 500
 
     @staticmethod
-    def fetch_current_materials_with_search(topic):
-        # Search for different types of materials
-        video_results = search.run(f"{topic} tutorial video YouTube 2024")
-        article_results = search.run(f"{topic} guide article documentation 2024")
-        practice_results = search.run(f"{topic} practice exercises examples code")
-        tool_results = search.run(f"{topic} tools libraries frameworks")
-        
+    def load_conversation(user_id, data, history_field):
+        """
+        When the request names a conversationId, replace the client-sent history
+        in `history_field` ("chatHistory" or "chat_history") with the stored
+        window. Returns (data, conversation_id); data is None if the conversation
+        does not belong to the user.
+        """
+        conversation_id = data.get("conversationId")
+        if not conversation_id:
+            return data, None
+
+        stored = ConversationService.load_history(user_id, conversation_id)
+        if stored is None:
+            return None, None
+
+        history = stored["messages"]
+        if history_field == "chatHistory":
+            history = [{"sender": message["role"], "text": message["text"]} for message in history]
+        # The stored summary covers everything before fromSeq (see compact_chat_history)
+        summary = {"summary": stored["summary"], "fromSeq": stored["fromSeq"]}
+        return {**data, history_field: history, "conversationSummary": summary}, conversation_id
+
+    @staticmethod
+    def compact_chat_history(messages, data, user_id=None):
+        """
+        Chat history for a prompt, under the token budget. Stored conversations
+        keep their rolling summary on the conversation, tracked by message seq;
+        client-sent histories use the per-process summary cache.
+        """
+        stored = data.get("conversationSummary")
+        conversation_id = data.get("conversationId")
+        if not stored or not conversation_id:
+            return compact_history(messages, user_id, conversation_id, summarize=summarize_history)
+
+        history, summary, folded = compact_stored_history(
+            messages, stored.get("summary"), summarize=summarize_history
+        )
+        if folded:
+            try:
+                ConversationService.save_summary(user_id, conversation_id, summary, stored["fromSeq"] + folded)
+            except Exception as e:
+                print(f"Error saving conversation summary: {e}")
+        return history
+
+    @staticmethod
+    def record_turn(user_id, conversation_id, user_text, ai_text):
+        """Append a question and its answer to the stored conversation"""
+        try:
+            ConversationService.append_messages(
+                user_id, conversation_id, [("user", user_text), ("ai", ai_text)]
+            )
+        except Exception as e:
+            print(f"Error saving conversation turn: {e}")
+
+    @staticmethod
+    def build_task_chat_input(data, user_id=None):
+        """Build the chat_qa_prompt input from the task context and chat history"""
+        question = data.get("question")
+        tasks_context = data.get("context")
+        chat_history_raw = data.get("chat_history", [])
+
+        chat_history = []
+        for msg in chat_history_raw:
+            if msg.get("role") == "user":
+                chat_history.append(HumanMessage(content=msg.get("text")))
+            elif msg.get("role") == "ai":
+                chat_history.append(AIMessage(content=msg.get("text")))
+
+        # Only the tasks relevant to the question go in full; the rest are summarized
+        tasks_str = build_tasks_context(tasks_context or [], question)
+
         return {
-            "videos": AIService.extract_videos_from_search(video_results),
-            "articles": AIService.extract_articles_from_search(article_results),
-            "practice": AIService.extract_practice_from_search(practice_results),
-            "tools": AIService.extract_tools_from_search(tool_results)
+            "tasks_context": tasks_str,
+            "question": question,
+            "chat_history": AIService.compact_chat_history(chat_history, data, user_id)
+        }
+
+    @staticmethod
+    def fetch_current_materials_with_search(topic, deadline=None):
+        """
+        Search for every material category concurrently.
+        Categories that fail or miss the deadline come back empty and are
+        listed under "missing".
+        """
+        deadline = MATERIALS_SEARCH_DEADLINE if deadline is None else deadline
+
+        # Search for different types of materials
+        searches = {
+            "videos": (f"{topic} tutorial video YouTube 2024", AIService.extract_videos_from_search),
+            "articles": (f"{topic} guide article documentation 2024", AIService.extract_articles_from_search),
+            "practice": (f"{topic} practice exercises examples code", AIService.extract_practice_from_search),
+            "tools": (f"{topic} tools libraries frameworks", AIService.extract_tools_from_search)
         }
+
+        futures = {
+            category: _search_executor.submit(search.run, query)
+            for category, (query, _) in searches.items()
+        }
+        done, _ = wait(futures.values(), timeout=deadline)
+
+        materials = {}
+        missing = []
+        for category, future in futures.items():
+            extractor = searches[category][1]
+            if future in done and future.exception() is None:
+                materials[category] = extractor(future.result())
+            else:
+                if future in done:
+                    print(f"Search for {category} failed: {future.exception()}")
+                else:
+                    future.cancel()
+                    print(f"Search for {category} missed the {deadline}s deadline")
+                materials[category] = []
+                missing.append(category)
+
+        materials["missing"] = missing
+        return materials
     
 
     @staticmethod
     def extract_videos_from_search(results):
         """Extract video resources from search results"""
-        videos = []
-        lines = results.split('\n')
-        
-        for line in lines:
-            if 'youtube.com' in line.lower() or 'youtu.be' in line.lower():
-                urls = re.findall(r'https?://[^\s]+', line)
-                for url in urls:
-                    if 'youtube.com' in url or 'youtu.be' in url:
-                        videos.append({
-                            "title": extract_title_from_line(line),
-                            "url": url,
-                            "channel": "YouTube",
-                            "duration": "Unknown duration",
-                            "type": "video"
-                        })
-        
-        return videos[:5]  # Return top 5 videos
+        records = unique_records(parse_search_results(results), predicate=lambda r: r.is_video, limit=5)
+        return [
+            {
+                "title": record.title,
+                "url": record.url,
+                "channel": "YouTube",
+                "duration": "Unknown duration",
+                "type": "video"
+            }
+            for record in records
+        ]
 
     @staticmethod
     def extract_articles_from_search(results):
         """Extract article resources from search results"""
-        articles = []
-        lines = results.split('\n')
-        
-        for line in lines:
-            urls = re.findall(r'https?://[^\s]+', line)
-            for url in urls:
-                # Exclude video and social media sites
-                if not any(site in url for site in ['youtube.com', 'youtu.be', 'twitter.com', 'facebook.com']):
-                    articles.append({
-                        "title": extract_title_from_line(line),
-                        "url": url,
-                        "source": extract_domain_from_url(url),
-                        "reading_time": "Unknown reading time",
-                        "type": "article"
-                    })
-        
-        return articles[:5]
+        # Exclude video and social media sites
+        records = unique_records(
+            parse_search_results(results),
+            predicate=lambda r: not r.is_video and not r.is_social,
+            limit=5
+        )
+        return [
+            {
+                "title": record.title,
+                "url": record.url,
+                "source": record.domain,
+                "reading_time": "Unknown reading time",
+                "type": "article"
+            }
+            for record in records
+        ]
 
     @staticmethod
     def extract_practice_from_search(results):
         """Extract practice resources from search results"""
-        practice = []
-        lines = results.split('\n')
-        
-        for line in lines:
-            if any(keyword in line.lower() for keyword in ['exercise', 'practice', 'example', 'tutorial']):
-                urls = re.findall(r'https?://[^\s]+', line)
-                for url in urls:
-                    practice.append({
-                        "title": extract_title_from_line(line),
-                        "url": url,
-                        "difficulty": "Intermediate",
-                        "type": "practice"
-                    })
-        
-        return practice[:5]
+        records = unique_records(parse_search_results(results), predicate=lambda r: "practice" in r.tags, limit=5)
+        return [
+            {
+                "title": record.title,
+                "url": record.url,
+                "difficulty": "Intermediate",
+                "type": "practice"
+            }
+            for record in records
+        ]
 
     @staticmethod
     def extract_tools_from_search(results):
         """Extract tool resources from search results"""
-        tools = []
-        lines = results.split('\n')
-        
-        for line in lines:
-            if any(keyword in line.lower() for keyword in ['library', 'framework', 'tool', 'package']):
-                urls = re.findall(r'https?://[^\s]+', line)
-                for url in urls:
-                    tools.append({
-                        "name": extract_title_from_line(line),
-                        "url": url,
-                        "description": line.strip()[:100] + "..." if len(line) > 100 else line.strip(),
-                        "type": "tool"
-                    })
-        
-        return tools[:5]
+        records = unique_records(parse_search_results(results), predicate=lambda r: "tool" in r.tags, limit=5)
+        return [
+            {
+                "name": record.title,
+                "url": record.url,
+                "description": truncate(record.snippet, 100),
+                "type": "tool"
+            }
+            for record in records
+        ]
 
     @staticmethod
     def get_ai_generated_materials(topic):
+        key = " ".join(str(topic or "").lower().split())
+        materials = materials_flight.do(key, AIService._generate_materials, topic)
+
+        # Callers mutate the result, so never hand out the shared object
+        return copy.deepcopy(materials)
+
+    @staticmethod
+    def _generate_materials(topic):
+        materials = AIService._fetch_materials(topic)
+        AIService._index_materials(topic, materials)
+        return materials
+
+    @staticmethod
+    def _index_materials(topic, materials):
+        """Add served materials to the local search corpus so later lookups stay offline"""
+        if search_corpus is None or not isinstance(materials, dict):
+            return
+        try:
+            for category in ("videos", "articles", "practice", "tools"):
+                items = [
+                    {**item, "type": item.get("type") or category}
+                    for item in materials.get(category) or [] if isinstance(item, dict)
+                ]
+                search_corpus.add_resources(items, topic)
+        except Exception as e:
+            print(f"Materials indexing error: {e}")
+
+    @staticmethod
+    def _fetch_materials(topic):
 
         # Try LLM
         materials = run_chain(materials_prompt, {"topic": topic})
@@ -194,13 +314,15 @@ class AIService:
             len(materials.get("tools", [])) == 0
         ):
             fallback = AIService.fetch_current_materials_with_search(topic)
-
-            return {
+            merged = {
                 "videos": materials.get("videos") or fallback["videos"],
                 "articles": materials.get("articles") or fallback["articles"],
                 "practice": materials.get("practice") or fallback["practice"],
                 "tools": materials.get("tools") or fallback["tools"],
             }
+            merged["missing"] = [category for category in fallback["missing"] if not merged[category]]
+
+            return merged
 
         # Case C: everything is fine
         return materials
@@ -209,9 +331,9 @@ class AIService:
 
 
     @staticmethod
-    def generate_flashcards(data):
+    def generate_flashcards(data, user_id=None):
         topic = data.get("topic")
-        user_understanding = data.get("userUnderstanding", {})
+        user_understanding = UnderstandingService.resolve(user_id, data)
         
         try:
             print(f"Generating flashcards for topic: {topic}")
@@ -220,7 +342,7 @@ class AIService:
             result = run_chain(flashcards_prompt, {
                 "topic": topic,
                 "understanding": json.dumps(user_understanding)
-            })
+            }, use_cache=not data.get("bypassCache"))
             
             print(f"Raw flashcard result: {result}")
             
@@ -317,9 +439,9 @@ class AIService:
             ]
 
     @staticmethod
-    def generate_study_guide(data):
+    def generate_study_guide(data, user_id=None):
         topic = data.get("topic")
-        user_understanding = data.get("userUnderstanding", {})
+        user_understanding = UnderstandingService.resolve(user_id, data)
         
         try:
             print(f"Generating study guide for topic: {topic}")
@@ -328,7 +450,7 @@ class AIService:
             result = run_chain(study_guide_prompt, {
                 "topic": topic,
                 "understanding": json.dumps(user_understanding)
-            })
+            }, use_cache=not data.get("bypassCache"))
             
             print(f"Raw study guide result: {result}")
             
@@ -422,56 +544,42 @@ class AIService:
     def handle_ai_chat(user_id, data):
         message = data.get("message")
         topic = data.get("topic")
-        tasks = data.get("tasks", [])
-        chat_history = data.get("chatHistory", [])
-        user_understanding = data.get("userUnderstanding", {})
+
+        data, conversation_id = AIService.load_conversation(user_id, data, "chatHistory")
+        if data is None:
+            return {"status": "error", "message": "Conversation not found"}, 404
+
+        # Prompts use the server-side understanding; clients only need to send the topic
+        data = {**data, "userUnderstanding": UnderstandingService.resolve(user_id, data)}
         
         # Check if web search is needed
         needs_search = should_use_search(message, topic)
         
         if needs_search:
-            return AIService.handle_search_enhanced_chat(data, needs_search)
+            result = AIService.handle_search_enhanced_chat(data, needs_search, user_id)
         else:
-            return AIService.handle_regular_chat(data)
+            result = AIService.handle_regular_chat(data, user_id)
+
+        if conversation_id and isinstance(result, dict) and result.get("status") == "success":
+            AIService.record_turn(user_id, conversation_id, message, result["response"]["text"])
+            result["conversationId"] = conversation_id
+        return result
 
     @staticmethod
-    def handle_search_enhanced_chat(data, search_type):
+    def handle_search_enhanced_chat(data, search_type, user_id=None):
         """Handle chat with web search integration"""
         message = data.get("message")
         topic = data.get("topic")
-        chat_history = data.get("chatHistory", [])
         user_understanding = data.get("userUnderstanding", {})
         
         try:
-            # Perform web search based on query type
-            if 'trend' in message.lower() or 'current' in message.lower():
-                search_query = f"{topic} current trends developments 2024"
-            elif 'tool' in message.lower():
-                search_query = f"{topic} tools libraries frameworks 2024"
-            else:
-                search_query = f"{topic} {message} tutorial guide examples 2024"
-            
-            search_results = search.run(search_query)
-            
-            # Convert chat history
-            history_messages = []
-            for msg in chat_history:
-                if msg.get('sender') == 'user':
-                    history_messages.append(HumanMessage(content=msg.get('text', '')))
-                else:
-                    history_messages.append(AIMessage(content=msg.get('text', '')))
-            
-            prompt_data = {
-                "topic": topic,
-                "search_results": search_results[:2000],
-                "question": message,
-                "understanding": json.dumps(user_understanding),
-                "chat_history": history_messages
-            }
+            prompt_data, search_results = AIService.build_search_chat_input(data, user_id)
             
-            from app.utils.ai_helpers import llm
-            chain = search_enhanced_prompt | llm
-            response = chain.invoke(prompt_data)
+            response = invoke_llm(
+                search_enhanced_prompt.invoke(prompt_data),
+                template="search_enhanced",
+                inputs=prompt_data
+            )
             
             # FIX: Use enhanced processing instead of old method
             processed = enhanced_process_ai_response(response.content)
@@ -481,7 +589,7 @@ class AIService:
             
             # Update understanding based on conversation
             understanding_update = AIService.calculate_understanding_update(
-                message, processed["text"], user_understanding, topic
+                message, processed["text"], user_understanding, topic, user_id
             )
             
             return {
@@ -498,17 +606,92 @@ class AIService:
             
         except Exception as e:
             print(f"Search-enhanced chat error: {e}")
-            return AIService.handle_regular_chat(data)
+            return AIService.handle_regular_chat(data, user_id)
 
     @staticmethod
-    def handle_regular_chat(data):
+    def handle_regular_chat(data, user_id=None):
         """Enhanced regular chat implementation"""
         message = data.get("message")
         topic = data.get("topic")
-        tasks = data.get("tasks", [])
-        chat_history = data.get("chatHistory", [])
         user_understanding = data.get("userUnderstanding", {})
         
+        try:
+            response = invoke_llm(AIService.build_regular_chat_messages(data), template="chat", inputs=data)
+            
+            # FIX: Use enhanced processing instead of old method
+            processed = enhanced_process_ai_response(response.content)
+            
+            # Calculate understanding update
+            understanding_update = AIService.calculate_understanding_update(
+                message, processed["text"], user_understanding, topic, user_id
+            )
+            
+            return {
+                "status": "success",
+                "response": {
+                    "text": processed["text"],
+                    "type": "general",
+                    "understandingUpdate": understanding_update,
+                    "search_used": False,
+                    "code_blocks": processed.get("code_blocks", [])  # Include code blocks
+                }
+            }
+            
+        except Exception as e:
+            print(f"Regular chat error: {e}")
+            return {"status": "error", "message": "Failed to process request"}, 500
+
+    @staticmethod
+    def convert_chat_history(chat_history):
+        """Convert client chat history into LangChain messages"""
+        history_messages = []
+        for msg in chat_history:
+            if msg.get('sender') == 'user':
+                history_messages.append(HumanMessage(content=msg.get('text', '')))
+            else:
+                history_messages.append(AIMessage(content=msg.get('text', '')))
+        return history_messages
+
+    @staticmethod
+    def build_search_chat_input(data, user_id=None):
+        """Run the web search and build the search-enhanced prompt input"""
+        message = data.get("message")
+        topic = data.get("topic")
+        chat_history = data.get("chatHistory", [])
+        user_understanding = data.get("userUnderstanding", {})
+
+        # Perform web search based on query type. Only the topic-level
+        # queries may be answered from the local corpus.
+        use_corpus = True
+        if 'trend' in message.lower() or 'current' in message.lower():
+            search_query = f"{topic} current trends developments 2024"
+        elif 'tool' in message.lower():
+            search_query = f"{topic} tools libraries frameworks 2024"
+        else:
+            search_query = f"{topic} {message} tutorial guide examples 2024"
+            use_corpus = False
+        
+        search_results = search.run(search_query, use_corpus=use_corpus)
+        
+        prompt_data = {
+            "topic": topic,
+            "search_results": search_results[:2000],
+            "question": message,
+            "understanding": json.dumps(user_understanding),
+            "chat_history": AIService.compact_chat_history(
+                AIService.convert_chat_history(chat_history), data, user_id
+            )
+        }
+        return prompt_data, search_results
+
+    @staticmethod
+    def build_regular_chat_messages(data):
+        """Build the tutor prompt used by regular (non-search) chat"""
+        message = data.get("message")
+        topic = data.get("topic")
+        tasks = data.get("tasks", [])
+        user_understanding = data.get("userUnderstanding", {})
+
         # Create context from tasks
         tasks_context = ""
         if tasks and len(tasks) > 0:
@@ -516,20 +699,9 @@ class AIService:
             for task in tasks:
                 status = "✅" if task.get('completed') else "⏳"
                 tasks_context += f"- {status} {task.get('task')}\n"
-        
-        # Convert chat history
-        history_messages = []
-        for msg in chat_history:
-            if msg.get('sender') == 'user':
-                history_messages.append(HumanMessage(content=msg.get('text', '')))
-            else:
-                history_messages.append(AIMessage(content=msg.get('text', '')))
-        
-        from app.utils.ai_helpers import llm
-        
-        try:
-            response = llm.invoke([
-                HumanMessage(content=f"""You are an expert tutor for {topic}. 
+
+        return [
+            HumanMessage(content=f"""You are an expert tutor for {topic}. 
 
 Student's current tasks: {tasks_context}
 
@@ -546,37 +718,160 @@ Please provide a clear, structured response that:
 6. Focuses on educational value
 
 Your response:""")
-            ])
-            
-            # FIX: Use enhanced processing instead of old method
-            processed = enhanced_process_ai_response(response.content)
-            
-            # Calculate understanding update
-            understanding_update = AIService.calculate_understanding_update(
-                message, processed["text"], user_understanding, topic
-            )
-            
-            return {
-                "status": "success",
-                "response": {
-                    "text": processed["text"],
-                    "type": "general",
-                    "understandingUpdate": understanding_update,
-                    "search_used": False,
-                    "code_blocks": processed.get("code_blocks", [])  # Include code blocks
-                }
-            }
-            
+        ]
+
+    @staticmethod
+    def stream_ai_chat(user_id, data):
+        """
+        Streaming variant of handle_ai_chat.
+        Yields (event, payload) tuples: "token" and "code" deltas as they arrive,
+        "code_block" when a fence closes and a final "done" event with the
+        understanding update.
+        """
+        message = data.get("message")
+        topic = data.get("topic")
+
+        if not message:
+            yield "error", {"message": "Missing message"}
+            return
+
+        data, conversation_id = AIService.load_conversation(user_id, data, "chatHistory")
+        if data is None:
+            yield "error", {"message": "Conversation not found"}
+            return
+
+        user_understanding = UnderstandingService.resolve(user_id, data)
+        data = {**data, "userUnderstanding": user_understanding}
+
+        chunks = None
+        resources = []
+        response_type = "general"
+
+        if should_use_search(message, topic):
+            try:
+                prompt_data, search_results = AIService.build_search_chat_input(data, user_id)
+                chunks = stream_llm(
+                    search_enhanced_prompt.invoke(prompt_data),
+                    template="search_enhanced",
+                    inputs=prompt_data
+                )
+                resources = extract_resources_from_search(search_results, topic)
+                response_type = "search_enhanced"
+            except Exception as e:
+                print(f"Search-enhanced stream error: {e}")
+                chunks = None
+
+        if chunks is None:
+            chunks = stream_llm(AIService.build_regular_chat_messages(data), template="chat", inputs=data)
+
+        parser = CodeFenceStreamParser()
+        try:
+            for chunk in chunks:
+                for event in parser.feed(chunk.content):
+                    yield AIService._stream_event(event)
+            for event in parser.close():
+                yield AIService._stream_event(event)
         except Exception as e:
-            print(f"Regular chat error: {e}")
-            return {"status": "error", "message": "Failed to process request"}, 500
+            print(f"Chat stream error: {e}")
+            yield "error", {"message": "Failed to process request"}
+            return
+
+        processed = parser.result()
+        understanding_update = AIService.calculate_understanding_update(
+            message, processed["text"], user_understanding, topic, user_id
+        )
+        done = {
+            "text": processed["text"],
+            "type": response_type,
+            "resources": resources,
+            "understandingUpdate": understanding_update,
+            "search_used": response_type == "search_enhanced",
+            "code_blocks": processed["code_blocks"]
+        }
+        if conversation_id:
+            AIService.record_turn(user_id, conversation_id, message, processed["text"])
+            done["conversationId"] = conversation_id
+
+        yield "done", done
+
+    @staticmethod
+    def stream_ask_about_task(user_id, data):
+        """
+        Streaming variant of ask_about_task.
+        The prompt returns JSON, so partial objects are parsed as they stream and
+        only the growing "markdown" field is forwarded as tokens.
+        """
+        question = data.get("question")
+        if not question:
+            yield "error", {"message": "Missing question"}
+            return
+
+        data, conversation_id = AIService.load_conversation(user_id, data, "chat_history")
+        if data is None:
+            yield "error", {"message": "Conversation not found"}
+            return
+
+        prompt_data = AIService.build_task_chat_input(data, user_id)
+        parser = CodeFenceStreamParser()
+        raw = ""
+        sent = 0
+        response = {}
+
+        try:
+            chunks = stream_llm(chat_qa_prompt.invoke(prompt_data), template="chat_qa", inputs=prompt_data)
+            for chunk in chunks:
+                raw += chunk.content
+                try:
+                    partial = json_parser.parse_result([Generation(text=raw)], partial=True)
+                except Exception:
+                    continue
+                if not isinstance(partial, dict):
+                    continue
+                response = partial
+                markdown = partial.get("markdown") or ""
+                if len(markdown) > sent:
+                    for event in parser.feed(markdown[sent:]):
+                        yield AIService._stream_event(event)
+                    sent = len(markdown)
+            for event in parser.close():
+                yield AIService._stream_event(event)
+        except Exception as e:
+            print(f"Ask-about-task stream error: {e}")
+            yield "error", {"message": "Failed to get AI response"}
+            return
+
+        done = {
+            "answer": response.get("markdown", ""),
+            "bullets": response.get("bullets", []),
+            "steps": response.get("steps", []),
+            "bold": response.get("bold", []),
+            "code_blocks": response.get("code_blocks", [])
+        }
+        if conversation_id:
+            AIService.record_turn(user_id, conversation_id, question, done["answer"])
+            done["conversationId"] = conversation_id
+
+        yield "done", done
+
+    @staticmethod
+    def _stream_event(event):
+        """Map a CodeFenceStreamParser event to an SSE (event, payload) pair"""
+        if event["type"] == "text":
+            return "token", {"text": event["text"]}
+        if event["type"] == "code":
+            return "code", {"id": event["id"], "text": event["text"]}
+        return "code_block", event["block"]
 
     # FIX: Remove the problematic clean_ai_response and extract_code_blocks methods
     # and use enhanced_process_ai_response from ai_helpers instead
 
     @staticmethod
-    def calculate_understanding_update(user_message, ai_response, current_understanding, topic):
-        """Enhanced understanding level calculation"""
+    def calculate_understanding_update(user_message, ai_response, current_understanding, topic, user_id=None):
+        """
+        Enhanced understanding level calculation.
+        With a user_id the change is persisted to the understanding store:
+        concept gains with $inc and baselines with $max, never the whole map.
+        """
         understanding_update = current_understanding.copy()
         
         # Analyze conversation complexity
@@ -585,20 +880,30 @@ Your response:""")
         # Extract key concepts
         concepts = AIService.extract_key_concepts(user_message + " " + ai_response, topic)
         
+        # Calculate improvement based on complexity and engagement
+        improvement = complexity_score * 2
+        improvement = min(improvement, 10)  # Cap at 10% per interaction
+        
         # Update understanding for each concept
         for concept in concepts:
             current_level = understanding_update.get(concept, 0)
-            
-            # Calculate improvement based on complexity and engagement
-            improvement = complexity_score * 2
-            improvement = min(improvement, 10)  # Cap at 10% per interaction
-            
             new_level = min(current_level + improvement, 100)
             understanding_update[concept] = new_level
         
         # Ensure main topic is always included
         if topic not in understanding_update:
             understanding_update[topic] = 10
+
+        if user_id and topic:
+            stored = UnderstandingService.get_understanding(user_id, topic)
+            # Levels a legacy client sent that the store has not seen yet
+            minimums = {
+                concept: level for concept, level in understanding_update.items()
+                if concept not in concepts and isinstance(level, (int, float)) and level > stored.get(concept, 0)
+            }
+            UnderstandingService.apply_update(
+                user_id, topic, increments={concept: improvement for concept in concepts}, minimums=minimums
+            )
         
         return understanding_update
 
@@ -616,15 +921,12 @@ Your response:""")
         if ai_words > 100:
             score += 3
         
-        # Question complexity analysis
-        complex_indicators = [
-            'how does', 'why does', 'explain', 'compare', 'difference between',
-            'implement', 'optimize', 'architecture', 'best practice', 'advanced'
-        ]
-        
-        for indicator in complex_indicators:
-            if indicator in user_message.lower():
-                score += 2
+        # Question complexity analysis: each distinct indicator counts once
+        indicators = {
+            match.term for match in match_keywords(user_message)
+            if match.category == "complexity.indicator"
+        }
+        score += 2 * len(indicators)
         
         # Code presence analysis
         if '```' in ai_response:
@@ -640,17 +942,10 @@ Your response:""")
         # Always include main topic
         concepts.add(main_topic.lower())
         
-        # Technical terms
-        technical_terms = [
-            'function', 'variable', 'class', 'object', 'method',
-            'algorithm', 'framework', 'library', 'api', 'database',
-            'syntax', 'compiler', 'debug', 'deploy', 'optimize'
-        ]
-        
-        words = text.lower().split()
-        for word in words:
-            if len(word) > 4 and word in technical_terms:
-                concepts.add(word)
+        # Shared technical terms plus the topic's domain vocabulary
+        for match in match_keywords(text, main_topic, whole_words=True):
+            if match.category in KEY_CONCEPT_CATEGORIES:
+                concepts.add(match.term)
         
         return list(concepts)
 
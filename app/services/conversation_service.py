@@ -0,0 +1,261 @@
+import os
+import threading
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.models.conversation import Conversation
+from app.utils.helpers import get_db
+from app.utils.indexes import ensure_collection_indexes
+
+# Messages per bucket document, fixed per conversation when it is created
+CONVERSATION_BUCKET_SIZE = int(os.getenv("CONVERSATION_BUCKET_SIZE", "50"))
+# Cap on the not-yet-summarized messages loaded into a prompt when a chat
+# names a conversation (older ones are covered by its stored summary)
+CONVERSATION_CONTEXT_MESSAGES = int(os.getenv("CONVERSATION_CONTEXT_MESSAGES", "100"))
+CONVERSATION_PAGE_SIZE = int(os.getenv("CONVERSATION_PAGE_SIZE", "30"))
+CONVERSATION_PAGE_MAX = 100
+
+_indexes_ready = False
+_indexes_lock = threading.Lock()
+
+
+def _collections():
+    """(conversations, conversation_messages), creating their indexes on first use"""
+    global _indexes_ready
+    db = get_db()
+    if not _indexes_ready:
+        with _indexes_lock:
+            if not _indexes_ready:
+                ensure_collection_indexes(db.conversations)
+                ensure_collection_indexes(db.conversation_messages)
+                _indexes_ready = True
+    return db.conversations, db.conversation_messages
+
+
+def _object_id(value):
+    try:
+        return ObjectId(value)
+    except Exception:
+        return None
+
+
+def _page_size(value, default):
+    try:
+        return max(1, min(int(value), CONVERSATION_PAGE_MAX))
+    except (TypeError, ValueError):
+        return default
+
+
+def _read_range(messages_col, conversation, start, end):
+    """Messages with start <= seq < end, read from the buckets covering that range"""
+    if end <= start:
+        return []
+    bucket_size = conversation.get("bucketSize") or CONVERSATION_BUCKET_SIZE
+    buckets = messages_col.find(
+        {
+            "conversationId": conversation["_id"],
+            "bucket": {"$gte": start // bucket_size, "$lte": (end - 1) // bucket_size}
+        },
+        {"messages": 1}
+    )
+    # Concurrent appends can land slightly out of order inside a bucket
+    messages = [
+        message
+        for bucket in buckets
+        for message in bucket.get("messages", [])
+        if start <= message.get("seq", -1) < end
+    ]
+    messages.sort(key=lambda message: message["seq"])
+    return messages
+
+
+class ConversationService:
+    @staticmethod
+    def create_conversation(user_id, data):
+        data = data or {}
+        try:
+            conversations_col, _ = _collections()
+            conversation_doc = Conversation.create_conversation_doc(
+                user_id, CONVERSATION_BUCKET_SIZE,
+                topic=data.get("topic"), kind=data.get("kind", "chat"), title=data.get("title")
+            )
+            conversation_doc["_id"] = conversations_col.insert_one(conversation_doc).inserted_id
+            return {
+                "status": "success",
+                "conversation": Conversation.get_conversation_response(conversation_doc)
+            }, 201
+        except Exception as e:
+            print(f"Error creating conversation: {e}")
+            return {"status": "error", "message": "Failed to create conversation"}, 500
+
+    @staticmethod
+    def list_conversations(user_id, limit=None, skip=None):
+        """Most recently active conversations first; messages are not included"""
+        limit = _page_size(limit, CONVERSATION_PAGE_SIZE)
+        try:
+            skip = max(0, int(skip or 0))
+        except (TypeError, ValueError):
+            skip = 0
+
+        try:
+            conversations_col, _ = _collections()
+            conversations = list(
+                conversations_col.find({"userId": user_id})
+                .sort("updatedAt", -1).skip(skip).limit(limit + 1)
+            )
+            return {
+                "status": "success",
+                "conversations": [
+                    Conversation.get_conversation_response(conversation)
+                    for conversation in conversations[:limit]
+                ],
+                "hasMore": len(conversations) > limit
+            }
+        except Exception as e:
+            print(f"Error listing conversations: {e}")
+            return {"status": "error", "message": "Failed to fetch conversations"}, 500
+
+    @staticmethod
+    def find_conversation(user_id, conversation_id):
+        """The user's conversation document, or None"""
+        conversation_oid = _object_id(conversation_id)
+        if conversation_oid is None:
+            return None
+        conversations_col, _ = _collections()
+        return conversations_col.find_one({"_id": conversation_oid, "userId": user_id})
+
+    @staticmethod
+    def get_messages(user_id, conversation_id, before=None, limit=None):
+        """
+        One page of history in chronological order: the `limit` messages
+        preceding seq `before` (the newest ones when omitted). Pass the
+        returned nextBefore to fetch the page before it.
+        """
+        limit = _page_size(limit, CONVERSATION_PAGE_SIZE)
+        try:
+            conversation = ConversationService.find_conversation(user_id, conversation_id)
+            if not conversation:
+                return {"status": "error", "message": "Conversation not found"}, 404
+
+            end = conversation.get("messageCount", 0)
+            if before is not None:
+                try:
+                    end = max(0, min(int(before), end))
+                except (TypeError, ValueError):
+                    return {"status": "error", "message": "Invalid 'before' cursor"}, 400
+            start = max(0, end - limit)
+
+            _, messages_col = _collections()
+            messages = _read_range(messages_col, conversation, start, end)
+            return {
+                "status": "success",
+                "conversation": Conversation.get_conversation_response(conversation),
+                "messages": [Conversation.get_message_response(message) for message in messages],
+                "nextBefore": start if start > 0 else None
+            }
+        except Exception as e:
+            print(f"Error fetching conversation messages: {e}")
+            return {"status": "error", "message": "Failed to fetch messages"}, 500
+
+    @staticmethod
+    def delete_conversation(user_id, conversation_id):
+        try:
+            conversation = ConversationService.find_conversation(user_id, conversation_id)
+            if not conversation:
+                return {"status": "error", "message": "Conversation not found"}, 404
+
+            conversations_col, messages_col = _collections()
+            messages_col.delete_many({"conversationId": conversation["_id"]})
+            conversations_col.delete_one({"_id": conversation["_id"]})
+            return {"status": "success", "message": "Conversation deleted"}
+        except Exception as e:
+            print(f"Error deleting conversation: {e}")
+            return {"status": "error", "message": "Failed to delete conversation"}, 500
+
+    @staticmethod
+    def load_history(user_id, conversation_id, limit=CONVERSATION_CONTEXT_MESSAGES):
+        """
+        Prompt context for a conversation: {"summary", "fromSeq", "messages"}.
+        `summary` covers every message before seq `fromSeq`; `messages`
+        ({role, text}) are the ones after it, at most `limit`, read only from
+        the buckets that hold them. None when the conversation is not the user's.
+        """
+        conversation = ConversationService.find_conversation(user_id, conversation_id)
+        if not conversation:
+            return None
+
+        end = conversation.get("messageCount", 0)
+        summarized = conversation.get("summarizedThroughSeq") or 0
+        start = max(summarized, end - limit)
+        _, messages_col = _collections()
+        messages = _read_range(messages_col, conversation, start, end)
+        return {
+            "summary": conversation.get("summary") if summarized else None,
+            "fromSeq": start,
+            "messages": [{"role": message["role"], "text": message.get("text", "")} for message in messages]
+        }
+
+    @staticmethod
+    def save_summary(user_id, conversation_id, summary, through_seq):
+        """Store the rolling summary of messages before through_seq, unless a newer one is stored"""
+        conversation_oid = _object_id(conversation_id)
+        if conversation_oid is None:
+            return False
+        conversations_col, _ = _collections()
+        result = conversations_col.update_one(
+            {
+                "_id": conversation_oid,
+                "userId": user_id,
+                "$or": [
+                    {"summarizedThroughSeq": {"$lt": through_seq}},
+                    {"summarizedThroughSeq": {"$exists": False}}
+                ]
+            },
+            {"$set": {"summary": summary, "summarizedThroughSeq": through_seq, "summaryUpdatedAt": datetime.now()}}
+        )
+        return result.modified_count > 0
+
+    @staticmethod
+    def append_messages(user_id, conversation_id, messages):
+        """
+        Append (role, text) pairs. Sequence numbers are reserved with one atomic
+        $inc on the conversation, then each message is $push-ed into its bucket,
+        so concurrent writers never collide. Returns the first seq, or None.
+        """
+        if not messages:
+            return None
+        conversation_oid = _object_id(conversation_id)
+        if conversation_oid is None:
+            return None
+
+        conversations_col, messages_col = _collections()
+        now = datetime.now()
+        conversation = conversations_col.find_one_and_update(
+            {"_id": conversation_oid, "userId": user_id},
+            {"$inc": {"messageCount": len(messages)}, "$set": {"updatedAt": now, "lastMessageAt": now}},
+            projection={"messageCount": 1, "bucketSize": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not conversation:
+            return None
+
+        bucket_size = conversation.get("bucketSize") or CONVERSATION_BUCKET_SIZE
+        first_seq = conversation["messageCount"] - len(messages)
+        by_bucket = {}
+        for seq, (role, text) in enumerate(messages, start=first_seq):
+            by_bucket.setdefault(seq // bucket_size, []).append(Conversation.create_message(seq, role, text))
+
+        for bucket, bucket_messages in by_bucket.items():
+            update = {
+                "$push": {"messages": {"$each": bucket_messages}},
+                "$inc": {"count": len(bucket_messages)},
+                "$setOnInsert": {"userId": user_id}
+            }
+            query = {"conversationId": conversation_oid, "bucket": bucket}
+            try:
+                messages_col.update_one(query, update, upsert=True)
+            except DuplicateKeyError:
+                # Another writer created the bucket first; it exists now
+                messages_col.update_one(query, update)
+        return first_seq
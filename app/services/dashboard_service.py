@@ -1,134 +1,256 @@
 from datetime import datetime
 from bson import ObjectId
+from app.models.plan import Plan
 from app.utils.helpers import get_db
+from app.services.stats_service import StatsService
+
+RECENT_COMPLETIONS = 6
+
+
+def dashboard_pipeline(user_id):
+    """
+    Aggregation over the user's todos returning, in one document, per-plan
+    totals / completed counts / distinct completed days, the user's plans and
+    their most recent completions. Each part starts with a userId match so it
+    is served by an index (see INDEX_SPECS).
+    """
+    completed = {"$eq": ["$completed", True]}
+    return [
+        {"$match": {"userId": user_id}},
+        {"$facet": {
+            "perPlan": [
+                {"$group": {
+                    "_id": "$planId",
+                    "totalTodos": {"$sum": 1},
+                    "completedTodos": {"$sum": {"$cond": [completed, 1, 0]}},
+                    "completedDays": {"$addToSet": {"$cond": [completed, "$day", "$$REMOVE"]}}
+                }},
+                {"$project": {
+                    "totalTodos": 1,
+                    "completedTodos": 1,
+                    "completedDays": {"$size": "$completedDays"}
+                }}
+            ]
+        }},
+        {"$lookup": {
+            "from": "learning_plans",
+            "pipeline": [
+                {"$match": {"userId": user_id, "status": {"$ne": Plan.PENDING}}},
+                {"$sort": {"_id": 1}},
+                {"$project": {"topic": 1, "days": 1, "hours": 1, "status": 1, "startDate": 1, "createdAt": 1}}
+            ],
+            "as": "plans"
+        }},
+        {"$lookup": {
+            "from": "todos",
+            "pipeline": [
+                {"$match": {"userId": user_id, "completed": True}},
+                {"$sort": {"updatedAt": -1}},
+                {"$limit": RECENT_COMPLETIONS},
+                {"$project": {"_id": 0, "planId": 1, "task": 1, "updatedAt": 1}}
+            ],
+            "as": "recentCompletions"
+        }}
+    ]
+
 
 class DashboardService:
     @staticmethod
     def get_dashboard_data(user_id):
+        """Dashboard from the user's write-time summary: one find_one by _id"""
         try:
-            plans_col = get_db().learning_plans
-            todos_col = get_db().todos
-            
-            # Get all plans for the user
-            all_plans = list(plans_col.find({"userId": user_id}))
-            
-            plans_progress = []
-            total_completed_todos = 0
-            total_todos = 0
-            completed_plans = 0
-            active_plans = 0
-            
-            # Calculate progress for each plan
-            for plan in all_plans:
-                plan_id = str(plan['_id'])
-                
-                # Get todos for this plan
-                todos = list(todos_col.find({"planId": plan_id, "userId": user_id}))
-                total_plan_todos = len(todos)
-                completed_plan_todos = len([t for t in todos if t.get('completed', False)])
-                
-                # Calculate completion rate
-                completion_rate = 0
-                if total_plan_todos > 0:
-                    completion_rate = round((completed_plan_todos / total_plan_todos) * 100)
-                
-                # Calculate completed days
-                completed_days = len(set([t['day'] for t in todos if t.get('completed', False)]))
-                
-                total_completed_todos += completed_plan_todos
-                total_todos += total_plan_todos
-                
-                if plan.get('status') == 'COMPLETED':
-                    completed_plans += 1
-                else:
-                    active_plans += 1
-                
-                plans_progress.append({
-                    "planId": plan_id,
-                    "topic": plan.get('topic', 'Unknown Topic'),
-                    "totalDays": plan.get('days', 0),
-                    "completedDays": completed_days,
-                    "totalTodos": total_plan_todos,
-                    "completedTodos": completed_plan_todos,
-                    "completionRate": completion_rate,
-                    "status": plan.get('status', 'ONGOING'),
-                    "startDate": plan.get('startDate')
-                })
-            
-            # Calculate overall statistics
-            overall_completion_rate = 0
-            if total_todos > 0:
-                overall_completion_rate = round((total_completed_todos / total_todos) * 100)
-            
-            # Calculate consistency
-            total_active_days = sum([p['completedDays'] for p in plans_progress])
-            total_possible_days = sum([p['totalDays'] for p in plans_progress])
-            
-            consistency = 0
-            if total_possible_days > 0:
-                consistency = round((total_active_days / total_possible_days) * 100)
-            
-            # Calculate total study hours (estimate)
-            total_study_hours = sum([plan.get('hours', 0) * plan.get('days', 0) for plan in all_plans])
-            
-            # Get user's first plan date for "learning since"
-            first_plan = plans_col.find_one({"userId": user_id}, sort=[("createdAt", 1)])
-            learning_since = "Recently"
-            if first_plan and first_plan.get('createdAt'):
-                learning_since = first_plan['createdAt'].strftime("%b %d, %Y")
-            
-            # Generate recent activity
-            recent_activity = []
-            for plan in all_plans[:3]:
-                recent_todos = list(todos_col.find(
-                    {"planId": str(plan['_id']), "userId": user_id, "completed": True}
-                ).sort("updatedAt", -1).limit(2))
-                
-                for todo in recent_todos:
-                    recent_activity.append({
-                        "type": "completed",
-                        "description": f"Completed: {todo.get('task', 'Task')}",
-                        "timestamp": todo.get('updatedAt', datetime.now()).strftime("%b %d, %H:%M")
-                    })
-            
-            # Add some created plan activities
-            for plan in all_plans[:2]:
-                recent_activity.append({
-                    "type": "created",
-                    "description": f"Started: {plan.get('topic', 'New Plan')}",
-                    "timestamp": plan.get('createdAt', datetime.now()).strftime("%b %d, %H:%M")
-                })
-            
-            # Sort activities by timestamp
-            recent_activity.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            dashboard_data = {
-                "plansProgress": plans_progress,
-                "overallStats": {
-                    "totalPlans": len(all_plans),
-                    "activePlans": active_plans,
-                    "completedPlans": completed_plans,
-                    "totalCompletedTodos": total_completed_todos,
-                    "totalTodos": total_todos,
-                    "completionRate": overall_completion_rate,
-                    "consistency": consistency,
-                    "totalStudyHours": total_study_hours,
-                    "activeDays": total_active_days,
-                    "currentStreak": min(7, total_active_days),
-                    "avgDailyProgress": round(overall_completion_rate / max(1, len(all_plans))),
-                    "learningSince": learning_since
-                },
-                "recentActivity": recent_activity
+            stats = StatsService.get_user_stats(user_id) or {}
+
+            all_plans = sorted(
+                ({"_id": plan_id, **entry} for plan_id, entry in (stats.get("plans") or {}).items()),
+                key=lambda plan: (plan.get("createdAt") or datetime.min, plan["_id"])
+            )
+            completed_days = {}
+            for key, count in (stats.get("days") or {}).items():
+                if count > 0:
+                    plan_id = key.split(":", 1)[0]
+                    completed_days[plan_id] = completed_days.get(plan_id, 0) + 1
+            stats_by_plan = {
+                plan["_id"]: {
+                    "totalTodos": plan.get("totalTodos", 0),
+                    "completedTodos": plan.get("completedTodos", 0),
+                    "completedDays": completed_days.get(plan["_id"], 0)
+                }
+                for plan in all_plans
             }
-            
+            recent_completions = [
+                {"task": entry.get("task"), "updatedAt": entry.get("completedAt")}
+                for entry in stats.get("recent", [])
+            ]
+
+            dashboard_data = DashboardService.format_dashboard(
+                all_plans, stats_by_plan, recent_completions, totals=stats
+            )
             return {
                 "status": "success",
                 "dashboard": dashboard_data
             }
-            
+
         except Exception as e:
             print(f"Error fetching dashboard data: {e}")
             return {
                 "status": "error",
                 "message": "Failed to load dashboard data"
-            }, 500
\ No newline at end of file
+            }, 500
+
+    @staticmethod
+    def get_live_dashboard_data(user_id):
+        """Dashboard computed from plans and todos (used to check the summaries)"""
+        todos_col = get_db().todos
+
+        # One round trip: per-plan todo stats, the plans and recent completions
+        result = next(todos_col.aggregate(dashboard_pipeline(user_id)), None) or {}
+        all_plans = result.get("plans", [])
+        stats_by_plan = {row["_id"]: row for row in result.get("perPlan", [])}
+        return DashboardService.format_dashboard(all_plans, stats_by_plan, result.get("recentCompletions", []))
+
+    @staticmethod
+    def format_dashboard(all_plans, stats_by_plan, recent_completions, totals=None):
+        """
+        Dashboard response from plans, their {totalTodos, completedTodos,
+        completedDays} and recent completions. `totals` (a user_stats summary)
+        supplies the overall figures instead of summing the plans.
+        """
+        plans_progress = []
+        total_completed_todos = 0
+        total_todos = 0
+        completed_plans = 0
+        active_plans = 0
+        
+        # Calculate progress for each plan
+        for plan in all_plans:
+            plan_id = str(plan['_id'])
+            stats = stats_by_plan.get(plan_id, {})
+            total_plan_todos = stats.get("totalTodos", 0)
+            completed_plan_todos = stats.get("completedTodos", 0)
+            
+            # Calculate completion rate
+            completion_rate = 0
+            if total_plan_todos > 0:
+                completion_rate = round((completed_plan_todos / total_plan_todos) * 100)
+            
+            # Distinct days with at least one completed todo
+            completed_days = stats.get("completedDays", 0)
+            
+            total_completed_todos += completed_plan_todos
+            total_todos += total_plan_todos
+            
+            if plan.get('status') == 'COMPLETED':
+                completed_plans += 1
+            else:
+                active_plans += 1
+            
+            plans_progress.append({
+                "planId": plan_id,
+                "topic": plan.get('topic', 'Unknown Topic'),
+                "totalDays": plan.get('days', 0),
+                "completedDays": completed_days,
+                "totalTodos": total_plan_todos,
+                "completedTodos": completed_plan_todos,
+                "completionRate": completion_rate,
+                "status": plan.get('status', 'ONGOING'),
+                "startDate": plan.get('startDate')
+            })
+        
+        if totals is not None:
+            # Maintained by the summary; no need to trust the per-plan sums
+            total_todos = totals.get("totalTodos", 0)
+            total_completed_todos = totals.get("completedTodos", 0)
+            active_plans = totals.get("activePlans", 0)
+            completed_plans = totals.get("completedPlans", 0)
+        
+        # Calculate overall statistics
+        overall_completion_rate = 0
+        if total_todos > 0:
+            overall_completion_rate = round((total_completed_todos / total_todos) * 100)
+        
+        # Calculate consistency
+        total_active_days = sum([p['completedDays'] for p in plans_progress])
+        if totals is not None:
+            total_active_days = totals.get("activeDays", 0)
+        total_possible_days = sum([p['totalDays'] for p in plans_progress])
+        
+        consistency = 0
+        if total_possible_days > 0:
+            consistency = round((total_active_days / total_possible_days) * 100)
+        
+        # Calculate total study hours (estimate)
+        total_study_hours = sum([plan.get('hours', 0) * plan.get('days', 0) for plan in all_plans])
+        if totals is not None:
+            total_study_hours = totals.get("totalStudyHours", 0)
+        
+        # Get user's first plan date for "learning since"
+        created_dates = [plan['createdAt'] for plan in all_plans if plan.get('createdAt')]
+        learning_since = "Recently"
+        if created_dates:
+            learning_since = min(created_dates).strftime("%b %d, %Y")
+        
+        # Generate recent activity
+        recent_activity = []
+        for todo in recent_completions:
+            recent_activity.append({
+                "type": "completed",
+                "description": f"Completed: {todo.get('task', 'Task')}",
+                "timestamp": todo.get('updatedAt', datetime.now()).strftime("%b %d, %H:%M")
+            })
+        
+        # Add some created plan activities
+        for plan in all_plans[:2]:
+            recent_activity.append({
+                "type": "created",
+                "description": f"Started: {plan.get('topic', 'New Plan')}",
+                "timestamp": plan.get('createdAt', datetime.now()).strftime("%b %d, %H:%M")
+            })
+        
+        # Sort activities by timestamp
+        recent_activity.sort(key=lambda x: x['timestamp'], reverse=True)
+        
+        dashboard_data = {
+            "plansProgress": plans_progress,
+            "overallStats": {
+                "totalPlans": len(all_plans),
+                "activePlans": active_plans,
+                "completedPlans": completed_plans,
+                "totalCompletedTodos": total_completed_todos,
+                "totalTodos": total_todos,
+                "completionRate": overall_completion_rate,
+                "consistency": consistency,
+                "totalStudyHours": total_study_hours,
+                "activeDays": total_active_days,
+                "currentStreak": min(7, total_active_days),
+                "avgDailyProgress": round(overall_completion_rate / max(1, len(all_plans))),
+                "learningSince": learning_since
+            },
+            "recentActivity": recent_activity
+        }
+        
+        return dashboard_data
+
+    @staticmethod
+    def explain_dashboard(user_id):
+        """
+        Explain the dashboard aggregation and, separately, each $lookup
+        sub-pipeline (whose plans the outer explain does not always show).
+        Returns {part: [collection-scanned namespaces]}; all empty when every
+        part is index-backed.
+        """
+        from app.utils.indexes import collection_scans
+
+        db = get_db()
+        pipeline = dashboard_pipeline(user_id)
+        parts = {"todos": ("todos", pipeline)}
+        for stage in pipeline:
+            lookup = stage.get("$lookup")
+            if lookup:
+                parts[lookup["as"]] = (lookup["from"], lookup["pipeline"])
+
+        report = {}
+        for name, (collection, part) in parts.items():
+            explain = db.command("aggregate", collection, pipeline=part, explain=True)
+            report[name] = collection_scans(explain)
+        return report
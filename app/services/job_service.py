@@ -0,0 +1,289 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.models.job import Job
+from app.utils.helpers import get_db
+from app.utils.indexes import ensure_collection_indexes
+
+# "inprocess" runs jobs on a thread pool inside the web worker,
+# "external" leaves them for worker.py processes
+JOB_MODE = os.getenv("JOB_MODE", "inprocess").lower()
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "86400"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# A RUNNING job whose heartbeat is older than the lease lost its worker
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# inprocess mode: how often to reclaim stale jobs and run orphaned queued ones (0 disables)
+JOB_RECOVERY_INTERVAL = float(os.getenv("JOB_RECOVERY_INTERVAL", "60"))
+
+_executor = None
+_executor_lock = threading.Lock()
+_indexes_ready = False
+_recovery_started = False
+
+
+def _run_generate_roadmap(user_id, payload):
+    from app.services.plan_service import PlanService
+    return PlanService.generate_roadmap(payload)
+
+
+def _run_refine(user_id, payload):
+    from app.services.plan_service import PlanService
+    return PlanService.refine_roadmap(payload.get("roadmap"), payload.get("instruction"), payload.get("mode"))
+
+
+def _run_study_guide(user_id, payload):
+    from app.services.ai_service import AIService
+    return AIService.generate_study_guide(payload, user_id)
+
+
+def _run_flashcards(user_id, payload):
+    from app.services.ai_service import AIService
+    return AIService.generate_flashcards(payload, user_id)
+
+
+def _run_repair_plan_counters(user_id, payload):
+    from app.services.todo_service import TodoService
+    return TodoService.repair_plan_counters(payload.get("userId"))
+
+
+def _run_rebuild_user_stats(user_id, payload):
+    from app.services.stats_service import StatsService
+    return StatsService.rebuild(payload.get("userId"))
+
+
+JOB_HANDLERS = {
+    "generate_roadmap": _run_generate_roadmap,
+    "refine": _run_refine,
+    "study_guide": _run_study_guide,
+    "flashcards": _run_flashcards,
+    "repair_plan_counters": _run_repair_plan_counters,
+    "rebuild_user_stats": _run_rebuild_user_stats,
+}
+
+# Owner recorded on jobs submitted through the admin endpoints
+ADMIN_JOB_USER = "admin"
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="jobs")
+    return _executor
+
+
+def _jobs_collection():
+    global _indexes_ready
+    jobs_col = get_db().jobs
+    if not _indexes_ready:
+        # Finished jobs disappear once expiresAt passes (see INDEX_SPECS)
+        ensure_collection_indexes(jobs_col)
+        _indexes_ready = True
+    return jobs_col
+
+
+class JobService:
+    @staticmethod
+    def submit(user_id, kind, payload):
+        if kind not in JOB_HANDLERS:
+            return {"status": "error", "message": f"Unknown job type: {kind}"}, 400
+
+        try:
+            job_doc = Job.create_job_doc(user_id, kind, payload, JOB_RESULT_TTL)
+            job_id = _jobs_collection().insert_one(job_doc).inserted_id
+
+            if JOB_MODE == "inprocess":
+                _get_executor().submit(JobService.run_job, job_id)
+
+            return {
+                "status": "success",
+                "jobId": str(job_id),
+                "jobStatus": Job.QUEUED
+            }, 202
+        except Exception as e:
+            print(f"Error submitting {kind} job: {e}")
+            return {"status": "error", "message": "Failed to submit job"}, 500
+
+    @staticmethod
+    def get_job(user_id, job_id):
+        if not ObjectId.is_valid(job_id):
+            return {"status": "error", "message": "Job not found"}, 404
+        try:
+            job = _jobs_collection().find_one({"_id": ObjectId(job_id), "userId": user_id})
+            if not job:
+                return {"status": "error", "message": "Job not found"}, 404
+
+            return {"status": "success", "job": Job.get_job_response(job)}
+        except Exception as e:
+            print(f"Error fetching job: {e}")
+            return {"status": "error", "message": "Failed to fetch job"}, 500
+
+    @staticmethod
+    def run_job(job_id):
+        """Claim a queued job by id and execute it"""
+        job = JobService._claim({"_id": job_id})
+        if job:
+            JobService._execute(job)
+
+    @staticmethod
+    def claim_next(queued_before=None):
+        """Atomically claim the oldest queued job (used by external workers)"""
+        query = {}
+        if queued_before is not None:
+            query["createdAt"] = {"$lt": queued_before}
+        return JobService._claim(query, sort=[("createdAt", 1)])
+
+    @staticmethod
+    def _claim(query, sort=None):
+        now = datetime.now()
+        return _jobs_collection().find_one_and_update(
+            {**query, "status": Job.QUEUED},
+            {"$set": {"status": Job.RUNNING, "startedAt": now, "claimedAt": now,
+                      "heartbeatAt": now, "updatedAt": now},
+             "$inc": {"attempts": 1}},
+            sort=sort,
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def requeue_stale():
+        """
+        Re-queue RUNNING jobs whose worker stopped heartbeating (it crashed or
+        was restarted); jobs that already used JOB_MAX_ATTEMPTS are failed.
+        Returns (requeued, failed).
+        """
+        now = datetime.now()
+        cutoff = now - timedelta(seconds=JOB_LEASE_SECONDS)
+        stale = {"status": Job.RUNNING, "$or": [
+            {"heartbeatAt": {"$lt": cutoff}},
+            # Claimed before jobs had heartbeats
+            {"heartbeatAt": None, "startedAt": {"$lt": cutoff}}
+        ]}
+        jobs_col = _jobs_collection()
+        failed = jobs_col.update_many(
+            {**stale, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+            {"$set": {"status": Job.FAILED, "error": "Job worker stopped responding",
+                      "finishedAt": now, "updatedAt": now}}
+        ).modified_count
+        requeued = jobs_col.update_many(
+            stale, {"$set": {"status": Job.QUEUED, "updatedAt": now}}
+        ).modified_count
+        if requeued or failed:
+            print(f"♻️ Jobs with expired leases: {requeued} re-queued, {failed} failed")
+        return requeued, failed
+
+    @staticmethod
+    def recover_jobs():
+        """
+        One inprocess recovery pass: reclaim stale jobs, then run jobs that
+        have been queued for longer than a lease. Those were lost by a
+        restarted worker (live ones are picked up by the executor long before).
+        """
+        JobService.requeue_stale()
+        queued_before = datetime.now() - timedelta(seconds=JOB_LEASE_SECONDS)
+        while True:
+            job = JobService.claim_next(queued_before)
+            if not job:
+                break
+            JobService._execute(job)
+
+    @staticmethod
+    def start_recovery():
+        """Startup hook for inprocess mode: run recover_jobs() on a daemon thread"""
+        global _recovery_started
+        if JOB_MODE != "inprocess" or JOB_RECOVERY_INTERVAL <= 0:
+            return
+        with _executor_lock:
+            if _recovery_started:
+                return
+            _recovery_started = True
+
+        def run():
+            while True:
+                # Sleep first so short-lived processes (CLI commands) never claim jobs
+                time.sleep(JOB_RECOVERY_INTERVAL)
+                try:
+                    JobService.recover_jobs()
+                except Exception as e:
+                    print(f"❌ Job recovery failed: {e}")
+
+        threading.Thread(target=run, name="job-recovery", daemon=True).start()
+
+    @staticmethod
+    def work_forever():
+        print(f"🔄 Job worker started (poll every {JOB_POLL_INTERVAL}s)")
+        last_sweep = 0
+        while True:
+            try:
+                if time.monotonic() - last_sweep >= JOB_HEARTBEAT_INTERVAL:
+                    JobService.requeue_stale()
+                    last_sweep = time.monotonic()
+                job = JobService.claim_next()
+            except Exception as e:
+                print(f"❌ Job worker error: {e}")
+                job = None
+
+            if job:
+                JobService._execute(job)
+            else:
+                time.sleep(JOB_POLL_INTERVAL)
+
+    @staticmethod
+    def _heartbeat(job, stop):
+        # Only the current claim (same attempt) may extend the lease
+        lease = {"_id": job["_id"], "status": Job.RUNNING, "attempts": job.get("attempts")}
+        while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                _jobs_collection().update_one(lease, {"$set": {"heartbeatAt": datetime.now()}})
+            except Exception as e:
+                print(f"❌ Job {job['_id']} heartbeat failed: {e}")
+
+    @staticmethod
+    def _execute(job):
+        handler = JOB_HANDLERS.get(job.get("kind"))
+        status, result, error = Job.FAILED, None, None
+
+        stop = threading.Event()
+        threading.Thread(
+            target=JobService._heartbeat, args=(job, stop), name=f"job-heartbeat-{job['_id']}", daemon=True
+        ).start()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job type: {job.get('kind')}")
+
+            result = handler(job.get("userId"), job.get("payload") or {})
+
+            # Service methods return either a body or a (body, status_code) tuple
+            code = 200
+            if isinstance(result, tuple):
+                result, code = result
+            if code < 400:
+                status = Job.SUCCEEDED
+            else:
+                error = result.get("message") if isinstance(result, dict) else "Job failed"
+        except Exception as e:
+            print(f"❌ Job {job['_id']} failed: {e}")
+            error = str(e)
+        finally:
+            stop.set()
+
+        finished = _jobs_collection().update_one(
+            {"_id": job["_id"], "status": Job.RUNNING, "attempts": job.get("attempts")},
+            {"$set": {
+                "status": status,
+                "result": result,
+                "error": error,
+                "finishedAt": datetime.now(),
+                "updatedAt": datetime.now()
+            }}
+        )
+        if not finished.matched_count:
+            print(f"⚠️ Job {job['_id']} lost its lease; result of attempt {job.get('attempts')} discarded")
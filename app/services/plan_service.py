@@ -1,10 +1,22 @@
 from bson import ObjectId
 from app.models.plan import Plan
 from app.models.todo import Todo
+from app.utils import events
 from app.utils.helpers import get_db
 from datetime import datetime
-from app.utils.ai_helpers import run_chain, roadmap_prompt, refinement_prompt_template
+from app.utils.ai_helpers import run_chain, roadmap_prompt, refinement_prompt_template, refinement_patch_prompt
+from app.utils.roadmap_patch import apply_roadmap_patch, is_patchable, PatchError
 import json
+import os
+
+# Todos are written with insert_many in batches of this size
+TODO_INSERT_BATCH_SIZE = int(os.getenv("TODO_INSERT_BATCH_SIZE", "500"))
+# "auto" uses a transaction when the deployment supports one and the
+# PENDING-then-ONGOING plan status otherwise; "transaction" / "pending" force one
+PLAN_WRITE_MODE = os.getenv("PLAN_WRITE_MODE", "auto").lower()
+
+# "patch" asks the model for JSON Patch operations, "full" for the whole roadmap
+ROADMAP_REFINE_MODE = os.getenv("ROADMAP_REFINE_MODE", "patch").lower()
 
 class PlanService:
     @staticmethod
@@ -16,7 +28,8 @@ class PlanService:
                 "message": "Missing required fields (topic, days, hours, or experience). Please complete the form."
             }, 400
         
-        roadmap_data = run_chain(roadmap_prompt, data)
+        # "bypassCache" lets the client force a fresh generation
+        roadmap_data = run_chain(roadmap_prompt, data, use_cache=not data.get("bypassCache"))
         
         if roadmap_data:
             return {"status": "success", "roadmap": roadmap_data}
@@ -29,33 +42,37 @@ class PlanService:
             return {"status": "error", "message": "Missing roadmap"}, 400
 
         try:
-            plans_col = get_db().learning_plans
-            todos_col = get_db().todos
-            
+            plan_id = ObjectId()
+            todo_docs = [
+                Todo.create_todo_doc(
+                    user_id,
+                    str(plan_id),
+                    day.get("day"),
+                    task.get("parent_task"),
+                    sub_task.get("task"),
+                    sub_task.get("duration_minutes"),
+                    sub_task.get("description")
+                )
+                for day in roadmap.get("roadmap", [])
+                for task in day.get("tasks", [])
+                for sub_task in task.get("sub_tasks", [])
+            ]
+
             plan_doc = Plan.create_plan_doc(
                 user_id, 
                 roadmap.get("topic"), 
                 roadmap.get("days"), 
-                roadmap.get("hours")
+                roadmap.get("hours"),
+                total_todos=len(todo_docs)
             )
-            plan_result = plans_col.insert_one(plan_doc)
-            plan_id = plan_result.inserted_id
-
-            for day in roadmap.get("roadmap", []):
-                day_num = day.get("day")
-                for task in day.get("tasks", []):
-                    parent_task_title = task.get("parent_task")
-                    for sub_task in task.get("sub_tasks", []):
-                        todo_doc = Todo.create_todo_doc(
-                            user_id, 
-                            str(plan_id), 
-                            day_num, 
-                            parent_task_title,
-                            sub_task.get("task"),
-                            sub_task.get("duration_minutes"),
-                            sub_task.get("description")
-                        )
-                        todos_col.insert_one(todo_doc)
+            plan_doc["_id"] = plan_id
+
+            if PlanService._supports_transactions():
+                PlanService._write_plan_in_transaction(plan_doc, todo_docs)
+            else:
+                PlanService._write_plan_pending(plan_doc, todo_docs)
+
+            events.emit(events.PLAN_CREATED, user_id=user_id, plan=plan_doc, written_at=datetime.now())
 
             return {
                 "status": "success",
@@ -68,7 +85,64 @@ class PlanService:
             return {"status": "error", "message": "Failed to generate todo list"}, 500
 
     @staticmethod
-    def refine_roadmap(roadmap, instruction):
+    def _supports_transactions():
+        """Transactions need a replica set or sharded cluster, not a standalone server"""
+        if PLAN_WRITE_MODE != "auto":
+            return PLAN_WRITE_MODE == "transaction"
+        try:
+            topology = get_db().client.topology_description.topology_type_name
+        except Exception:
+            return False
+        return topology in ("ReplicaSetWithPrimary", "Sharded")
+
+    @staticmethod
+    def _insert_todos(todo_docs, session=None):
+        # One round trip per batch; unordered so the server can apply a batch in parallel
+        todos_col = get_db().todos
+        for start in range(0, len(todo_docs), TODO_INSERT_BATCH_SIZE):
+            todos_col.insert_many(todo_docs[start:start + TODO_INSERT_BATCH_SIZE], ordered=False, session=session)
+
+    @staticmethod
+    def _write_plan_in_transaction(plan_doc, todo_docs):
+        """Plan and todos become visible together when the transaction commits"""
+        def write(session):
+            get_db().learning_plans.insert_one(plan_doc, session=session)
+            PlanService._insert_todos(todo_docs, session=session)
+
+        with get_db().client.start_session() as session:
+            session.with_transaction(write)
+
+    @staticmethod
+    def _write_plan_pending(plan_doc, todo_docs):
+        """
+        Without transactions the plan is written as PENDING (hidden from every
+        listing), its todos are inserted, then one update makes it ONGOING.
+        A failure removes whatever was written.
+        """
+        plans_col = get_db().learning_plans
+        plan_id = plan_doc["_id"]
+        plans_col.insert_one({**plan_doc, "status": Plan.PENDING})
+        try:
+            PlanService._insert_todos(todo_docs)
+            plans_col.update_one(
+                {"_id": plan_id, "status": Plan.PENDING},
+                {"$set": {"status": plan_doc["status"], "updatedAt": datetime.now()}}
+            )
+        except Exception:
+            get_db().todos.delete_many({"planId": str(plan_id)})
+            plans_col.delete_one({"_id": plan_id})
+            raise
+
+    @staticmethod
+    def refine_roadmap(roadmap, instruction, mode=None):
+        mode = (mode or ROADMAP_REFINE_MODE).lower()
+
+        if mode == "patch":
+            patched = PlanService._refine_with_patch(roadmap, instruction)
+            if patched:
+                return {"status": "success", "roadmap": patched[0], "mode": "patch", "operations": patched[1]}
+            print("Roadmap patch failed, falling back to full regeneration")
+
         prompt_data = {
             "roadmap": json.dumps(roadmap),
             "instruction": instruction
@@ -77,17 +151,39 @@ class PlanService:
         refined_roadmap = run_chain(refinement_prompt_template, prompt_data)
 
         if refined_roadmap:
-            return {"status": "success", "roadmap": refined_roadmap}
+            return {"status": "success", "roadmap": refined_roadmap, "mode": "full"}
         else:
             return {"status": "error", "message": "Failed to refine roadmap"}, 500
 
+    @staticmethod
+    def _refine_with_patch(roadmap, instruction):
+        """(patched roadmap, operation count), or None when the patch is unusable"""
+        # Malformed roadmaps go to full regeneration, as before patch mode
+        if not is_patchable(roadmap):
+            return None
+
+        result = run_chain(refinement_patch_prompt, {
+            # Compact separators: the roadmap is the bulk of the input tokens
+            "roadmap": json.dumps(roadmap, separators=(",", ":")),
+            "instruction": instruction
+        })
+        operations = result.get("patch") if isinstance(result, dict) else result
+        if not isinstance(operations, list):
+            return None
+
+        try:
+            return apply_roadmap_patch(roadmap, operations), len(operations)
+        except PatchError as e:
+            print(f"Invalid roadmap patch: {e}")
+            return None
+
     @staticmethod
     def get_active_plans(user_id):
         try:
             plans_col = get_db().learning_plans
             
             active_plans = list(plans_col.find(
-                {"userId": user_id, "status": {"$ne": "COMPLETED"}},
+                {"userId": user_id, "status": {"$nin": [Plan.COMPLETED, Plan.PENDING]}},
                 {"_id": 1, "topic": 1, "days": 1, "hours": 1, "progress": 1, "status": 1, "startDate": 1}
             ).sort("_id", -1))
             
@@ -108,7 +204,7 @@ class PlanService:
             plans_col = get_db().learning_plans
             
             all_plans = list(plans_col.find(
-                {"userId": user_id},
+                {"userId": user_id, "status": {"$ne": Plan.PENDING}},
                 {"_id": 1, "topic": 1, "days": 1, "hours": 1, "progress": 1, "status": 1, "startDate": 1}
             ).sort("_id", -1))
             
@@ -140,6 +236,7 @@ class PlanService:
                 return {"status": "error", "message": "Plan not found"}, 404
             
             todos_col.delete_many({"planId": plan_id, "userId": user_id})
+            events.emit(events.PLAN_DELETED, user_id=user_id, plan_id=plan_id)
             
             return {
                 "status": "success",
@@ -156,14 +253,14 @@ class PlanService:
             
             # Get latest plan for this user
             latest_plan = plans_col.find_one(
-                {"userId": user_id}, 
+                {"userId": user_id, "status": {"$ne": Plan.PENDING}}, 
                 sort=[('_id', -1)]
             )
             plan_id = str(latest_plan['_id']) if latest_plan else None
 
             # Get active plans for this user
             active_plans = list(plans_col.find(
-                {"userId": user_id, "status": {"$ne": "COMPLETED"}},
+                {"userId": user_id, "status": {"$nin": [Plan.COMPLETED, Plan.PENDING]}},
                 {"_id": 1, "topic": 1, "days": 1, "hours": 1, "progress": 1, "status": 1, "startDate": 1}
             ).sort("_id", -1))
             
@@ -232,6 +329,7 @@ class PlanService:
                 {"_id": next_task["_id"]},
                 {"$set": {"isBonus": True, "originalDay": next_day, "day": current_day}}
             )
+            events.emit(events.TODO_MOVED, user_id=user_id, todo=next_task, new_day=current_day, written_at=datetime.now())
             
             # Return the updated task
             next_task['_id'] = str(next_task['_id'])
@@ -0,0 +1,321 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument, ReplaceOne
+from pymongo.errors import BulkWriteError
+from app.models.plan import Plan
+from app.models.user_stats import UserStats
+from app.utils import events
+from app.utils.helpers import get_db
+
+REBUILD_BATCH_SIZE = 500
+# Rebuilds of a summary that kept changing underneath are retried this often
+REBUILD_ATTEMPTS = 3
+
+
+def _stats_collection():
+    # Documents are keyed by userId, so reads and updates use the _id index
+    return get_db().user_stats
+
+
+def _status_counts(status, sign):
+    field = "completedPlans" if status == Plan.COMPLETED else "activePlans"
+    return {field: sign}
+
+
+def _apply(user_id, update, projection, written_at=None):
+    """
+    Apply an incremental update to an existing summary and return the
+    document as it was before. Users without a summary are skipped: theirs is
+    built from scratch on the next dashboard read. Every update bumps
+    `version`, which a concurrent rebuild checks before replacing the summary.
+    A write made at or before a rebuild's `snapshotAt` is already counted in
+    that summary and is skipped too (written_at is taken once the write is done).
+    """
+    query = {"_id": user_id}
+    if written_at is not None:
+        query["$or"] = [{"snapshotAt": {"$lt": written_at}}, {"snapshotAt": None}]
+    update = {**update, "$inc": {**update.get("$inc", {}), "version": 1}}
+    return _stats_collection().find_one_and_update(
+        query, update, projection={**projection, "generation": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+
+
+def _adjust(user_id, before, update, condition=None):
+    """
+    Follow-up update derived from _apply's before-image. It only applies to
+    the same generation: a rebuild in between already counted the change.
+    """
+    if update:
+        _stats_collection().update_one(
+            {"_id": user_id, "generation": before.get("generation"), **(condition or {})},
+            {**update, "$inc": {**update.get("$inc", {}), "version": 1}}
+        )
+
+
+def _increments(increments):
+    increments = {field: value for field, value in increments.items() if value}
+    return {"$inc": increments} if increments else None
+
+
+def _day_count(before, key):
+    return (before.get("days") or {}).get(key, 0)
+
+
+def _plan_status(before, plan_id):
+    return ((before.get("plans") or {}).get(plan_id) or {}).get("status")
+
+
+class StatsService:
+    """
+    Write-time dashboard summaries in `user_stats`, one document per user.
+    Each event is one atomic $inc/$set on the summary. When it crosses a
+    threshold (a day's first completion, a plan changing status), a second
+    $inc adjusts the derived counter. The before-image of the first update
+    tells exactly one writer that it crossed it.
+    """
+
+    @staticmethod
+    def on_plan_created(user_id, plan, written_at=None):
+        plan_id = str(plan["_id"])
+        entry = UserStats.create_plan_entry(plan, plan.get("totalTodos", 0))
+        _apply(user_id, {
+            "$set": {f"plans.{plan_id}": entry},
+            "$inc": {
+                "totalPlans": 1,
+                **_status_counts(entry["status"], 1),
+                "totalTodos": entry["totalTodos"],
+                "totalStudyHours": entry["studyHours"]
+            }
+        }, {"_id": 1}, written_at)
+
+    @staticmethod
+    def on_plan_deleted(user_id, plan_id):
+        plan_id = str(plan_id)
+        before = _apply(user_id, {
+            "$unset": {f"plans.{plan_id}": ""},
+            "$pull": {"recent": {"planId": plan_id}}
+        }, {f"plans.{plan_id}": 1, "days": 1})
+        entry = ((before or {}).get("plans") or {}).get(plan_id)
+        if not entry:
+            return
+
+        prefix = UserStats.day_key(plan_id, "")
+        day_keys = [key for key in (before.get("days") or {}) if key.startswith(prefix)]
+        active_days = sum(1 for key in day_keys if before["days"][key] > 0)
+        update = _increments({
+            "totalPlans": -1,
+            **_status_counts(entry["status"], -1),
+            "totalTodos": -entry.get("totalTodos", 0),
+            "completedTodos": -entry.get("completedTodos", 0),
+            "totalStudyHours": -entry.get("studyHours", 0),
+            "activeDays": -active_days
+        }) or {}
+        if day_keys:
+            update["$unset"] = {f"days.{key}": "" for key in day_keys}
+        _adjust(user_id, before, update)
+
+    @staticmethod
+    def on_todo_toggled(user_id, todo, plan_status, written_at=None):
+        plan_id = str(todo["planId"])
+        key = UserStats.day_key(plan_id, todo.get("day"))
+        delta = 1 if todo.get("completed") else -1
+
+        update = {
+            "$inc": {"completedTodos": delta, f"plans.{plan_id}.completedTodos": delta, f"days.{key}": delta},
+            "$set": {f"plans.{plan_id}.status": plan_status}
+        }
+        if delta < 0:
+            update["$pull"] = {"recent": {"todoId": str(todo["_id"])}}
+
+        before = _apply(user_id, update, {f"days.{key}": 1, f"plans.{plan_id}.status": 1}, written_at)
+        if before is None:
+            return
+
+        if delta > 0:
+            # A todo appears in `recent` once, however often it is re-completed
+            entry = UserStats.create_recent_entry(todo["_id"], plan_id, todo.get("task"), written_at)
+            _adjust(user_id, before, {
+                "$push": {"recent": {"$each": [entry], "$position": 0, "$slice": UserStats.RECENT_LIMIT}}
+            }, {"recent.todoId": {"$ne": entry["todoId"]}})
+
+        StatsService._after_todo_change(user_id, before, plan_id, plan_status, key, delta)
+
+    @staticmethod
+    def on_todo_deleted(user_id, todo, plan_status, written_at=None):
+        plan_id = str(todo["planId"])
+        key = UserStats.day_key(plan_id, todo.get("day"))
+        delta = -1 if todo.get("completed") else 0
+
+        increments = {"totalTodos": -1, f"plans.{plan_id}.totalTodos": -1}
+        if delta:
+            increments.update({"completedTodos": -1, f"plans.{plan_id}.completedTodos": -1, f"days.{key}": -1})
+        before = _apply(user_id, {
+            "$inc": increments,
+            "$set": {f"plans.{plan_id}.status": plan_status},
+            "$pull": {"recent": {"todoId": str(todo["_id"])}}
+        }, {f"days.{key}": 1, f"plans.{plan_id}.status": 1}, written_at)
+        if before is None:
+            return
+
+        StatsService._after_todo_change(user_id, before, plan_id, plan_status, key, delta)
+
+    @staticmethod
+    def _after_todo_change(user_id, before, plan_id, plan_status, key, delta):
+        increments = {}
+        # A day is active while it has at least one completed todo
+        count = _day_count(before, key)
+        if delta > 0 and count == 0:
+            increments["activeDays"] = 1
+        elif delta < 0 and count == 1:
+            increments["activeDays"] = -1
+
+        previous_status = _plan_status(before, plan_id)
+        if previous_status and previous_status != plan_status:
+            increments.update(_status_counts(previous_status, -1))
+            for field, value in _status_counts(plan_status, 1).items():
+                increments[field] = increments.get(field, 0) + value
+        _adjust(user_id, before, _increments(increments))
+
+    @staticmethod
+    def on_todo_moved(user_id, todo, new_day, written_at=None):
+        """Only completed todos count towards active days"""
+        if not todo.get("completed") or todo.get("day") == new_day:
+            return
+        plan_id = str(todo["planId"])
+        old_key = UserStats.day_key(plan_id, todo.get("day"))
+        new_key = UserStats.day_key(plan_id, new_day)
+
+        before = _apply(user_id, {"$inc": {f"days.{old_key}": -1, f"days.{new_key}": 1}},
+                        {f"days.{old_key}": 1, f"days.{new_key}": 1}, written_at)
+        if before is None:
+            return
+        _adjust(user_id, before, _increments({
+            "activeDays": (-1 if _day_count(before, old_key) == 1 else 0)
+                          + (1 if _day_count(before, new_key) == 0 else 0)
+        }))
+
+    @staticmethod
+    def get_user_stats(user_id):
+        """The user's summary, built from scratch the first time it is needed"""
+        stats = _stats_collection().find_one({"_id": user_id})
+        if stats is None:
+            StatsService.rebuild(user_id)
+            stats = _stats_collection().find_one({"_id": user_id})
+        return stats
+
+    @staticmethod
+    def rebuild(user_id=None):
+        """
+        Recompute summaries from plans and todos: every user's, or one user's.
+        A summary is only replaced if no event changed it while its snapshot
+        was read (its `version` is unchanged); those users are rebuilt again.
+        """
+        user_ids = [user_id] if user_id else None
+        rebuilt = 0
+        for attempt in range(REBUILD_ATTEMPTS):
+            written, conflicts = StatsService._rebuild_users(user_ids, remove_missing=attempt == 0 and not user_id)
+            rebuilt += written
+            if not conflicts:
+                break
+            user_ids = conflicts
+        else:
+            print(f"⚠️ {len(conflicts)} summary(ies) kept changing during rebuild; left as they are")
+
+        print(f"📊 Rebuilt dashboard summaries for {rebuilt} user(s)")
+        return {"status": "success", "users": rebuilt}
+
+    @staticmethod
+    def _rebuild_users(user_ids=None, remove_missing=False):
+        """
+        One rebuild pass for the given users (None: everyone). Todo counts per
+        (user, plan, day) come from one aggregation and the summaries are
+        replaced with batched bulk writes. Returns (written, conflicting user ids).
+        """
+        db = get_db()
+        plan_query = {"status": {"$ne": Plan.PENDING}}
+        todo_match = {}
+        stats_query = {}
+        if user_ids is not None:
+            plan_query["userId"] = {"$in": user_ids}
+            todo_match["userId"] = {"$in": user_ids}
+            stats_query["_id"] = {"$in": user_ids}
+
+        # Versions are read before the snapshot; any event after this bumps them.
+        # Events for writes done by now are in the snapshot and skip this summary
+        snapshot_at = datetime.now()
+        versions = {doc["_id"]: doc.get("version") for doc in _stats_collection().find(stats_query, {"version": 1})}
+
+        counts = {}
+        for row in db.todos.aggregate([
+            {"$match": todo_match},
+            {"$group": {
+                "_id": {"userId": "$userId", "planId": "$planId", "day": "$day"},
+                "total": {"$sum": 1},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$completed", True]}, 1, 0]}}
+            }}
+        ]):
+            group = row["_id"]
+            counts.setdefault((group["userId"], group["planId"]), []).append(
+                (group.get("day"), row["total"], row["completed"])
+            )
+
+        users = {owner: ({}, {}) for owner in user_ids or []}
+        projection = {"userId": 1, "topic": 1, "days": 1, "hours": 1, "status": 1, "startDate": 1, "createdAt": 1}
+        for plan in db.learning_plans.find(plan_query, projection):
+            plans, days = users.setdefault(plan["userId"], ({}, {}))
+            plan_id = str(plan["_id"])
+            day_counts = counts.get((plan["userId"], plan_id), [])
+            plans[plan_id] = UserStats.create_plan_entry(
+                plan,
+                sum(total for _, total, _ in day_counts),
+                sum(completed for _, _, completed in day_counts)
+            )
+            for day, _, completed in day_counts:
+                if completed:
+                    days[UserStats.day_key(plan_id, day)] = completed
+
+        generation = ObjectId()
+        operations = []
+        for owner, (plans, days) in users.items():
+            recent = [
+                UserStats.create_recent_entry(todo["_id"], todo["planId"], todo.get("task"), todo.get("updatedAt"))
+                for todo in db.todos.find(
+                    {"userId": owner, "completed": True, "planId": {"$in": list(plans)}},
+                    {"planId": 1, "task": 1, "updatedAt": 1}
+                ).sort("updatedAt", -1).limit(UserStats.RECENT_LIMIT)
+            ]
+            # Replace only the version we read; a missing summary is inserted
+            # (a duplicate key then means another writer created it meanwhile)
+            version = versions.get(owner)
+            expected = {"_id": owner, "version": version} if version is not None \
+                else {"_id": owner, "version": {"$exists": False}}
+            operations.append(ReplaceOne(
+                expected, UserStats.create_stats_doc(owner, plans, days, recent, generation, snapshot_at), upsert=True
+            ))
+
+        for start in range(0, len(operations), REBUILD_BATCH_SIZE):
+            try:
+                _stats_collection().bulk_write(operations[start:start + REBUILD_BATCH_SIZE], ordered=False)
+            except BulkWriteError as e:
+                # Duplicate keys are the conflicts picked up below
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+        if remove_missing:
+            # Users whose plans are all gone
+            _stats_collection().delete_many({"_id": {"$nin": list(users)}})
+
+        # Summaries that do not carry this generation were changed by an event
+        conflict_query = {"generation": {"$ne": generation}}
+        if user_ids is not None:
+            conflict_query["_id"] = {"$in": user_ids}
+        conflicts = [doc["_id"] for doc in _stats_collection().find(conflict_query, {"_id": 1})]
+        return len(operations) - len(conflicts), conflicts
+
+
+def register_event_handlers():
+    events.subscribe(events.PLAN_CREATED, StatsService.on_plan_created)
+    events.subscribe(events.PLAN_DELETED, StatsService.on_plan_deleted)
+    events.subscribe(events.TODO_TOGGLED, StatsService.on_todo_toggled)
+    events.subscribe(events.TODO_DELETED, StatsService.on_todo_deleted)
+    events.subscribe(events.TODO_MOVED, StatsService.on_todo_moved)
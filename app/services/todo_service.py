@@ -1,7 +1,29 @@
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from app.models.plan import Plan
+from app.utils import events
 from app.utils.helpers import get_db
 
+REPAIR_BATCH_SIZE = 500
+
+
+def progress_stages():
+    """
+    Update-pipeline stages deriving progress and status from the plan's
+    counters: progress is the completed percentage (100 for a plan without
+    todos) and a plan at 100% is COMPLETED.
+    """
+    return [
+        {"$set": {"progress": {"$cond": [
+            {"$gt": ["$totalTodos", 0]},
+            {"$trunc": {"$multiply": [{"$divide": ["$completedTodos", "$totalTodos"]}, 100]}},
+            100
+        ]}}},
+        {"$set": {"status": {"$cond": [{"$gte": ["$progress", 100]}, Plan.COMPLETED, Plan.ONGOING]}}}
+    ]
+
+
 class TodoService:
     @staticmethod
     def get_todos_for_plan(user_id, plan_id):
@@ -9,8 +31,8 @@ class TodoService:
             plans_col = get_db().learning_plans
             todos_col = get_db().todos
             
-            # Verify plan belongs to user
-            plan = plans_col.find_one({"_id": ObjectId(plan_id), "userId": user_id})
+            # Verify plan belongs to user (and is not still being written)
+            plan = plans_col.find_one({"_id": ObjectId(plan_id), "userId": user_id, "status": {"$ne": Plan.PENDING}})
             if not plan:
                 return {"status": "error", "message": "Plan not found"}, 404
             
@@ -52,35 +74,24 @@ class TodoService:
     def toggle_todo(user_id, todo_id):
         try:
             todos_col = get_db().todos
-            plans_col = get_db().learning_plans
             
-            # Verify todo belongs to user
-            todo = todos_col.find_one({"_id": ObjectId(todo_id), "userId": user_id})
-            if not todo:
-                return {"status": "error", "message": "Todo not found"}, 404        
-            plan_id = todo["planId"]
-            new_completed_status = not todo.get("completed", False)
-
-            todos_col.update_one(
+            # Flip `completed` server-side in one atomic update; concurrent toggles cannot lose a flip
+            todo = todos_col.find_one_and_update(
                 {"_id": ObjectId(todo_id), "userId": user_id},
-                {"$set": {"completed": new_completed_status, "updatedAt": datetime.now()}}
+                [{"$set": {
+                    "completed": {"$ne": ["$completed", True]},
+                    "updatedAt": datetime.now()
+                }}],
+                projection={"planId": 1, "completed": 1, "day": 1, "task": 1},
+                return_document=ReturnDocument.AFTER
             )
+            if not todo:
+                return {"status": "error", "message": "Todo not found"}, 404
 
-            total = todos_col.count_documents({"planId": plan_id, "userId": user_id})
-            completed = todos_col.count_documents({"planId": plan_id, "userId": user_id, "completed": True})
-
-            progress = 0
-            status = "ONGOING"
-
-            if total > 0:
-                progress = int((completed / total) * 100)
-                if progress >= 100:
-                    status = "COMPLETED"
-            else:
-                progress = 100
-                status = "COMPLETED"
-
-            plans_col.update_one({"_id": ObjectId(plan_id), "userId": user_id}, {"$set": {"progress": progress, "status": status}})
+            progress, status = TodoService.update_plan_counters(
+                user_id, todo["planId"], completed_delta=1 if todo["completed"] else -1
+            )
+            events.emit(events.TODO_TOGGLED, user_id=user_id, todo=todo, plan_status=status, written_at=datetime.now())
 
             return {
                 "status": "success",
@@ -97,34 +108,19 @@ class TodoService:
     def delete_todo(user_id, todo_id):
         try:
             todos_col = get_db().todos
-            plans_col = get_db().learning_plans
             
-            # Verify todo belongs to user
-            todo = todos_col.find_one({"_id": ObjectId(todo_id), "userId": user_id})
+            # Verify todo belongs to user and delete it in one step
+            todo = todos_col.find_one_and_delete(
+                {"_id": ObjectId(todo_id), "userId": user_id},
+                projection={"planId": 1, "completed": 1, "day": 1}
+            )
             if not todo:
                 return {"status": "error", "message": "Todo not found"}, 404
-            
-            plan_id = todo["planId"]
 
-            result = todos_col.delete_one({"_id": ObjectId(todo_id), "userId": user_id})
-            if result.deleted_count == 0:
-                return {"status": "error", "message": "Todo not found"}, 404
-            
-            total = todos_col.count_documents({"planId": plan_id, "userId": user_id})
-            completed = todos_col.count_documents({"planId": plan_id, "userId": user_id, "completed": True})
-            
-            progress = 0
-            status = "ONGOING"
-            
-            if total > 0:
-                progress = int((completed / total) * 100)
-                if progress >= 100:
-                    status = "COMPLETED"
-            else:
-                progress = 100
-                status = "COMPLETED"
-
-            plans_col.update_one({"_id": ObjectId(plan_id), "userId": user_id}, {"$set": {"progress": progress, "status": status}})
+            progress, status = TodoService.update_plan_counters(
+                user_id, todo["planId"], total_delta=-1, completed_delta=-1 if todo.get("completed") else 0
+            )
+            events.emit(events.TODO_DELETED, user_id=user_id, todo=todo, plan_status=status, written_at=datetime.now())
 
             return {
                 "status": "success", 
@@ -136,6 +132,98 @@ class TodoService:
             print(f"Error deleting todo: {e}")
             return {"status": "error", "message": "Failed to delete todo"}, 500
 
+    @staticmethod
+    def update_plan_counters(user_id, plan_id, total_delta=0, completed_delta=0):
+        """
+        Apply todo count changes to the plan's totalTodos/completedTodos and
+        derive progress and status from them, all in one pipeline update.
+        Plans created before the counters existed are recounted instead.
+        Returns (progress, status).
+        """
+        plans_col = get_db().learning_plans
+        plan = plans_col.find_one_and_update(
+            {"_id": ObjectId(plan_id), "userId": user_id, "totalTodos": {"$exists": True}},
+            [
+                {"$set": {
+                    "totalTodos": {"$add": ["$totalTodos", total_delta]},
+                    "completedTodos": {"$add": [{"$ifNull": ["$completedTodos", 0]}, completed_delta]}
+                }},
+                *progress_stages()
+            ],
+            projection={"progress": 1, "status": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if plan is None:
+            plan = TodoService.recount_plan(plan_id)
+        if plan is None:
+            return 0, Plan.ONGOING
+        return plan.get("progress", 0), plan.get("status", Plan.ONGOING)
+
+    @staticmethod
+    def recount_plan(plan_id):
+        """Recompute one plan's counters from its todos; returns the updated plan"""
+        plans_col = get_db().learning_plans
+        todos_col = get_db().todos
+        plan = plans_col.find_one({"_id": ObjectId(plan_id)}, {"userId": 1})
+        if not plan:
+            return None
+
+        query = {"planId": str(plan_id), "userId": plan["userId"]}
+        total = todos_col.count_documents(query)
+        completed = todos_col.count_documents({**query, "completed": True})
+        return plans_col.find_one_and_update(
+            {"_id": plan["_id"]},
+            [{"$set": {"totalTodos": total, "completedTodos": completed}}, *progress_stages()],
+            projection={"progress": 1, "status": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def repair_plan_counters(user_id=None):
+        """
+        Recompute totalTodos/completedTodos (and so progress/status) for every
+        plan, or one user's plans, from the todos themselves. Counting is one
+        aggregation; the plans are rewritten with a single bulk write.
+        """
+        plans_col = get_db().learning_plans
+        todos_col = get_db().todos
+
+        plan_query = {"status": {"$ne": Plan.PENDING}}
+        todo_match = {}
+        if user_id:
+            plan_query["userId"] = user_id
+            todo_match["userId"] = user_id
+
+        counts = {
+            (row["_id"]["planId"], row["_id"]["userId"]): row
+            for row in todos_col.aggregate([
+                {"$match": todo_match},
+                {"$group": {
+                    "_id": {"planId": "$planId", "userId": "$userId"},
+                    "total": {"$sum": 1},
+                    "completed": {"$sum": {"$cond": [{"$eq": ["$completed", True]}, 1, 0]}}
+                }}
+            ])
+        }
+
+        operations = []
+        changed = 0
+        for plan in plans_col.find(plan_query, {"userId": 1, "totalTodos": 1, "completedTodos": 1}):
+            row = counts.get((str(plan["_id"]), plan.get("userId")), {})
+            total, completed = row.get("total", 0), row.get("completed", 0)
+            if plan.get("totalTodos") != total or plan.get("completedTodos") != completed:
+                changed += 1
+            operations.append(UpdateOne(
+                {"_id": plan["_id"]},
+                [{"$set": {"totalTodos": total, "completedTodos": completed}}, *progress_stages()]
+            ))
+
+        for start in range(0, len(operations), REPAIR_BATCH_SIZE):
+            plans_col.bulk_write(operations[start:start + REPAIR_BATCH_SIZE], ordered=False)
+
+        print(f"🔧 Recounted {len(operations)} plans ({changed} had drifted)")
+        return {"status": "success", "plans": len(operations), "repaired": changed}
+
     @staticmethod
     def move_todo(user_id, todo_id, new_day):
         if new_day is None or not isinstance(new_day, int) or new_day <= 0:
@@ -144,13 +232,16 @@ class TodoService:
         try:
             todos_col = get_db().todos
             
-            result = todos_col.update_one(
+            todo = todos_col.find_one_and_update(
                 {"_id": ObjectId(todo_id), "userId": user_id},
-                {"$set": {"day": new_day, "updatedAt": datetime.now()}}
+                {"$set": {"day": new_day, "updatedAt": datetime.now()}},
+                projection={"planId": 1, "completed": 1, "day": 1}
             )
 
-            if result.matched_count == 0:
+            if not todo:
                 return {"status": "error", "message": "Todo not found"}, 404
+
+            events.emit(events.TODO_MOVED, user_id=user_id, todo=todo, new_day=new_day, written_at=datetime.now())
                 
             return {"status": "success", "message": f"Todo moved to Day {new_day}"}
 
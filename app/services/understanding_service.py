@@ -0,0 +1,126 @@
+import os
+import threading
+from datetime import datetime
+from app.models.understanding import Understanding
+from app.utils.cache import TTLCache
+from app.utils.helpers import get_db
+from app.utils.indexes import ensure_collection_indexes
+
+# Prompts read understanding through this cache; writes refresh it in place
+UNDERSTANDING_CACHE_TTL = int(os.getenv("UNDERSTANDING_CACHE_TTL", "60"))
+
+understanding_cache = TTLCache(
+    max_entries=int(os.getenv("UNDERSTANDING_CACHE_MAX_ENTRIES", "4096")),
+    default_ttl=UNDERSTANDING_CACHE_TTL
+)
+
+_indexes_ready = False
+_indexes_lock = threading.Lock()
+
+
+def _understanding_collection():
+    global _indexes_ready
+    understanding_col = get_db().learner_understanding
+    if not _indexes_ready:
+        with _indexes_lock:
+            if not _indexes_ready:
+                ensure_collection_indexes(understanding_col)
+                _indexes_ready = True
+    return understanding_col
+
+
+class UnderstandingService:
+    @staticmethod
+    def get_understanding(user_id, topic):
+        """Stored {concept: level} for a user's topic (cached for a short TTL)"""
+        topic_key = Understanding.topic_key(topic)
+        if not user_id or not topic_key:
+            return {}
+
+        cache_key = (user_id, topic_key)
+        cached = understanding_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        try:
+            doc = _understanding_collection().find_one(
+                {"userId": user_id, "topic": topic_key}, {"concepts": 1}
+            )
+        except Exception as e:
+            print(f"Error reading understanding: {e}")
+            return {}
+
+        levels = Understanding.get_levels(doc)
+        understanding_cache.set(cache_key, levels)
+        return dict(levels)
+
+    @staticmethod
+    def resolve(user_id, data):
+        """
+        Understanding to put in prompts: the server-side store, merged with any
+        legacy userUnderstanding map a client still sends (highest level wins).
+        """
+        stored = UnderstandingService.get_understanding(user_id, data.get("topic"))
+        for concept, level in (data.get("userUnderstanding") or {}).items():
+            if isinstance(level, (int, float)) and level > stored.get(concept, 0):
+                stored[concept] = level
+        return stored
+
+    @staticmethod
+    def apply_update(user_id, topic, increments=None, minimums=None):
+        """
+        Atomically raise levels: `increments` are added with $inc and
+        `minimums` applied with $max. Levels are capped at Understanding.MAX_LEVEL
+        when read. Returns the updated {concept: level} view.
+        """
+        topic_key = Understanding.topic_key(topic)
+        if not user_id or not topic_key:
+            return {}
+
+        increments = {concept: value for concept, value in (increments or {}).items() if value}
+        minimums = dict(minimums or {})
+        now = datetime.now()
+
+        update = {
+            "$inc": {"interactions": 1},
+            "$set": {"updatedAt": now},
+            "$setOnInsert": {"createdAt": now}
+        }
+        for concept, value in increments.items():
+            update["$inc"][Understanding.concept_field(concept)] = value
+        if minimums:
+            update["$max"] = {
+                Understanding.concept_field(concept): value
+                for concept, value in minimums.items() if concept not in increments
+            }
+
+        # Compute the new view from the cached levels so no read-back is needed
+        levels = UnderstandingService.get_understanding(user_id, topic_key)
+        for concept, value in increments.items():
+            levels[concept] = min(levels.get(concept, 0) + value, Understanding.MAX_LEVEL)
+        for concept, value in minimums.items():
+            if concept not in increments:
+                levels[concept] = max(levels.get(concept, 0), value)
+
+        try:
+            _understanding_collection().update_one(
+                {"userId": user_id, "topic": topic_key}, update, upsert=True
+            )
+            understanding_cache.set((user_id, topic_key), dict(levels))
+        except Exception as e:
+            print(f"Error updating understanding: {e}")
+            understanding_cache.delete((user_id, topic_key))
+
+        return levels
+
+    @staticmethod
+    def get_user_understanding(user_id, topic):
+        try:
+            return {
+                "status": "success",
+                "topic": Understanding.topic_key(topic),
+                "understanding": UnderstandingService.get_understanding(user_id, topic)
+            }
+        except Exception as e:
+            print(f"Error fetching understanding: {e}")
+            return {"status": "error", "message": "Failed to fetch understanding"}, 500
@@ -1,26 +1,76 @@
 import os
 import json
-import re
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.output_parsers import JsonOutputParser
-
-# LLM Setup
-gemini_api_key = os.getenv("GOOGLE_API_KEY")
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    google_api_key=gemini_api_key,
-    temperature=0,
-    markdown=False
+import copy
+import time
+import hashlib
+import threading
+from app.utils.cache import TTLCache
+from app.utils.search_cache import CachedSearch
+from app.utils.search_corpus import create_search_corpus
+from app.utils.singleflight import SingleFlight, SingleFlightTimeout
+from app.utils.llm_providers import create_llm_provider
+from app.utils.llm_scheduler import LLMScheduler, INTERACTIVE, BATCH
+from app.utils.hedging import HedgePolicy
+from app.utils.circuit_breaker import breaker_from_env
+from app.utils.code_fences import CodeFenceStreamParser, extract_code_blocks
+from app.utils.keyword_matcher import match_keywords
+from app.utils.lazy import LazyProxy
+from app.utils.search_parser import (
+    parse_search_results,
+    unique_records,
+    truncate,
+    classify_resource_type,
+    extract_title_from_line,
+    extract_domain_from_url
 )
 
-search = DuckDuckGoSearchRun()
-json_parser = JsonOutputParser()
+# LLM Setup: LLM_PROVIDER selects "gemini" (default) or the offline "fake" model.
+# Clients are built on first use so importing this module stays cheap.
+llm_provider = LazyProxy(create_llm_provider, "llm_provider")
+
+# Per-worker LLM admission control; divide the provider quota by the worker count
+llm_scheduler = LLMScheduler(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    rate_per_minute=float(os.getenv("LLM_RATE_PER_MINUTE", "60")),
+    burst=int(os.getenv("LLM_RATE_BURST", "10")),
+    max_queue={
+        INTERACTIVE: int(os.getenv("LLM_QUEUE_LIMIT_INTERACTIVE", "50")),
+        BATCH: int(os.getenv("LLM_QUEUE_LIMIT_BATCH", "20"))
+    },
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+)
+
+# Hedged LLM calls (opt-in): duplicate a call that outlives the template's p95
+llm_hedge = HedgePolicy(
+    enabled=os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true",
+    percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+    min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+    budget=float(os.getenv("LLM_HEDGE_BUDGET", "0.1")),
+    max_workers=int(os.getenv("LLM_HEDGE_MAX_WORKERS", "16")),
+    templates=[name.strip() for name in os.getenv("LLM_HEDGE_TEMPLATES", "").split(",") if name.strip()]
+)
+
+# Circuit breakers: fail fast (and serve fallbacks) while a dependency is degraded
+llm_breaker = breaker_from_env("llm", slow_call_duration=20.0)
+search_breaker = breaker_from_env("search", slow_call_duration=8.0)
+
+def _build_search_tool():
+    from langchain_community.tools import DuckDuckGoSearchRun
+    return DuckDuckGoSearchRun()
+
+
+def _build_json_parser():
+    from langchain_core.output_parsers import JsonOutputParser
+    return JsonOutputParser()
+
+
+# Web search, cached by normalized query and backed by the local BM25 corpus
+search_corpus = create_search_corpus()
+search = CachedSearch(LazyProxy(_build_search_tool, "search_tool"), corpus=search_corpus, breaker=search_breaker)
+json_parser = LazyProxy(_build_json_parser, "json_parser")
 
 # UPDATED: Markdown-optimized Prompt Templates
-chat_qa_prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are a professional AI tutor.
+CHAT_QA_SYSTEM = """You are a professional AI tutor.
 
 # RESPONSE FORMAT
 
@@ -50,63 +100,60 @@ Current Tasks Context:
 Chat history: Use context only, do NOT repeat in reply.
 
 REMEMBER: Respond ONLY with JSON.
-"""),
-    MessagesPlaceholder(variable_name="chat_history"),
-    ("human", "{question}"),
-])
+"""
 
 
-roadmap_prompt = PromptTemplate.from_template("""
+ROADMAP_TEMPLATE = """
 You are an expert study planner.
 
 Return ONLY a strictly valid JSON object with this structure:
 
-{
+{{
   "topic": "{topic}",
   "days": {days},
   "hours": {hours},
   "roadmap": [
-    {
+    {{
       "day": 1,
       "tasks": [
-        {
+        {{
           "parent_task": "High-level task title",
           "original_duration_minutes": 120,
           "sub_tasks": [
-            {
+            {{
               "task": "Micro task",
               "duration_minutes": 30,
               "description": "One sentence explanation."
-            }
+            }}
           ]
-        }
+        }}
       ]
-    }
+    }}
   ]
-}
+}}
 
 Rules:
 - Only valid JSON.
 - No text outside JSON.
 - Sub-task durations MUST sum to parent.
 - Use actionable steps.
-""")
+"""
 
 
-task_qa_prompt = PromptTemplate.from_template("""
+TASK_QA_TEMPLATE = """
 You are a professional AI tutor.
 
 You MUST return ONLY JSON with:
 
-{
+{{
   "answer": "Full answer as a plain string",
   "key_points": ["Point 1", "Point 2"],
   "steps": ["Step 1", "Step 2"],
   "examples": ["Example explanation"],
   "code_blocks": [
-      {"language": "python", "code": "print('hello')"}
+      {{"language": "python", "code": "print('hello')"}}
   ]
-}
+}}
 
 Rules:
 - No markdown formatting, only plain strings.
@@ -118,10 +165,10 @@ Tasks for today:
 
 Question:
 {question}
-""")
+"""
 
 
-refinement_prompt_template = PromptTemplate.from_template("""
+REFINEMENT_TEMPLATE = """
 You must refine the given roadmap.
 
 Return ONLY the updated JSON. No text outside JSON.
@@ -136,23 +183,45 @@ Rules:
 - Maintain identical structure.
 - Keep sub-tasks nested.
 - Sub-task durations MUST sum to original_duration_minutes.
-""")
+"""
+
+
+# Patch-mode refinement: the model returns only the operations that change the roadmap
+REFINEMENT_PATCH_TEMPLATE = """
+You must refine the given roadmap by returning a JSON Patch (RFC 6902).
+
+Return ONLY JSON of the form:
+{{"patch": [{{"op": "replace", "path": "/roadmap/0/tasks/1/sub_tasks/0/description", "value": "..."}}]}}
+
+Current Roadmap:
+{roadmap}
+
+Instruction:
+{instruction}
+
+Rules:
+- Allowed ops: add, remove, replace, move.
+- Paths point into the roadmap, e.g. /roadmap/<day index>/tasks/<task index>/sub_tasks/<sub-task index>/<field>. Indexes start at 0; "-" appends.
+- Only include operations needed for the instruction.
+- Sub-task durations of every task MUST still sum to its original_duration_minutes.
+- No text outside JSON.
+"""
 
 
 # UPDATED: Flashcard prompt with markdown instructions
-flashcards_prompt = PromptTemplate.from_template("""
+FLASHCARDS_TEMPLATE = """
 Generate 8–10 flashcards and return ONLY valid JSON:
 
-{
+{{
   "flashcards": [
-    {
+    {{
       "question": "Question text",
       "answer": "Answer text",
       "category": "Category",
       "difficulty": "easy/medium/hard"
-    }
+    }}
   ]
-}
+}}
 
 Focus on weak areas:
 {understanding}
@@ -163,40 +232,40 @@ Topic:
 Rules:
 - Only JSON.
 - No extra text.
-""")
+"""
 
 
 # UPDATED: Study guide prompt with markdown instructions
-study_guide_prompt = PromptTemplate.from_template("""
+STUDY_GUIDE_TEMPLATE = """
 Create a structured study guide.
 
 Return ONLY valid JSON with this structure:
 
-{
+{{
   "learning_objectives": ["Objective 1", "Objective 2"],
   "key_concepts": ["Concept 1", "Concept 2"],
   "practice_exercises": [
-    {
+    {{
       "title": "Exercise name",
       "description": "What to do",
       "difficulty": "beginner/intermediate/advanced"
-    }
+    }}
   ],
   "study_schedule": [
-    {
+    {{
       "week": 1,
       "topics": ["Topic A", "Topic B"],
       "exercises": ["Exercise 1"]
-    }
+    }}
   ],
   "resources": [
-    {
+    {{
       "type": "documentation/tutorial/practice",
       "title": "Resource title",
       "url": "https://example.com"
-    }
+    }}
   ]
-}
+}}
 
 User understanding:
 {understanding}
@@ -207,48 +276,48 @@ Topic:
 Rules:
 - No text outside JSON.
 - Follow structure exactly.
-""")
+"""
 
 
-materials_prompt = PromptTemplate.from_template("""
+MATERIALS_TEMPLATE = """
 Provide learning resources. Return ONLY valid JSON:
 
-{
+{{
   "videos": [
-    {
+    {{
       "title": "Video title",
       "url": "https://example.com",
       "channel": "Channel",
       "duration": "10 min",
       "type": "video"
-    }
+    }}
   ],
   "articles": [
-    {
+    {{
       "title": "Article",
       "url": "https://example.com",
       "source": "Website",
       "reading_time": "5 min",
       "type": "article"
-    }
+    }}
   ],
   "practice": [
-    {
+    {{
       "title": "Practice title",
       "url": "https://example.com",
       "difficulty": "Beginner",
       "type": "practice"
-    }
+    }}
   ],
   "tools": [
-    {
+    {{
       "name": "Tool name",
       "url": "https://example.com",
       "description": "What it does",
       "type": "tool"
-    }
+    }}
   ]
-}
+}}
 
 Topic:
 {topic}
@@ -256,28 +325,27 @@ Topic:
 Rules:
 - Only JSON.
 - No additional text.
-""")
+"""
 
 
 # UPDATED: Search enhanced prompt with markdown
-search_enhanced_prompt = ChatPromptTemplate.from_messages([
-    ("system", """
+SEARCH_ENHANCED_SYSTEM = """
 You are an expert tutor with access to search results.
 
 Return ONLY valid JSON with:
 
-{
+{{
   "answer": "Full explanation",
   "key_points": ["Point 1", "Point 2"],
-  "updated_understanding": {"concept": 60},
+  "updated_understanding": {{"concept": 60}},
   "resources": [
-    {
+    {{
       "title": "Resource",
       "url": "https://example.com",
       "type": "video/article/tool"
-    }
+    }}
   ]
-}
+}}
 
 Rules:
 - Use search results only inside the JSON.
@@ -289,21 +357,313 @@ Search Results:
 
 User understanding:
 {understanding}
-"""),
-    MessagesPlaceholder(variable_name="chat_history"),
-    ("human", "{question}")
-])
+"""
+
+
+HISTORY_SUMMARY_TEMPLATE = """
+Summarize this tutoring conversation so it can replace the original messages.
+
+Keep: the student's goals, what was already explained, open questions and
+any code or concepts the student struggled with. Use plain text, at most
+{max_words} words.
+
+Existing summary:
+{previous_summary}
+
+New messages:
+{messages}
+"""
+
+
+# Keyword vocabularies live in app/data (keywords.json and topics/<topic>.json)
+SEARCH_TRIGGER_CATEGORIES = {"search.recency", "search.tutorial", "search.resources"}
+CONCEPT_LEVELS = {
+    "concept.basic": "basic",
+    "concept.intermediate": "intermediate",
+    "concept.advanced": "advanced",
+    "domain.basic": "basic",
+    "domain.intermediate": "intermediate",
+    "domain.advanced": "advanced",
+}
+LEVEL_ORDER = {"basic": 0, "intermediate": 1, "advanced": 2}
+# (confidence, complexity) per level
+CONCEPT_SCORES = {"basic": (0.6, 1), "intermediate": (0.7, 2), "advanced": (0.8, 3)}
+
+
+# Prompt registry: module attribute -> (stable name used for cache keys and
+# per-template settings, factory). Prompts are built on first access.
+_PROMPT_FACTORIES = {
+    "chat_qa_prompt": ("chat_qa", lambda: _chat_prompt(CHAT_QA_SYSTEM)),
+    "roadmap_prompt": ("roadmap", lambda: _text_prompt(ROADMAP_TEMPLATE)),
+    "task_qa_prompt": ("task_qa", lambda: _text_prompt(TASK_QA_TEMPLATE)),
+    "refinement_prompt_template": ("refinement", lambda: _text_prompt(REFINEMENT_TEMPLATE)),
+    "refinement_patch_prompt": ("refinement_patch", lambda: _text_prompt(REFINEMENT_PATCH_TEMPLATE)),
+    "flashcards_prompt": ("flashcards", lambda: _text_prompt(FLASHCARDS_TEMPLATE)),
+    "study_guide_prompt": ("study_guide", lambda: _text_prompt(STUDY_GUIDE_TEMPLATE)),
+    "materials_prompt": ("materials", lambda: _text_prompt(MATERIALS_TEMPLATE)),
+    "search_enhanced_prompt": ("search_enhanced", lambda: _chat_prompt(SEARCH_ENHANCED_SYSTEM)),
+    "history_summary_prompt": ("history_summary", lambda: _text_prompt(HISTORY_SUMMARY_TEMPLATE)),
+}
+
+# id(prompt) -> registered name, filled in as prompts are built
+PROMPT_NAMES = {}
+_prompts = {}
+_prompts_lock = threading.Lock()
+
+
+def _text_prompt(template):
+    from langchain_core.prompts import PromptTemplate
+    return PromptTemplate.from_template(template)
+
+
+def _chat_prompt(system):
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    return ChatPromptTemplate.from_messages([
+        ("system", system),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{question}"),
+    ])
+
+
+def get_prompt(attribute):
+    """Registered prompt by module attribute name, built once per process"""
+    prompt = _prompts.get(attribute)
+    if prompt is not None:
+        return prompt
+    with _prompts_lock:
+        if attribute not in _prompts:
+            name, factory = _PROMPT_FACTORIES[attribute]
+            prompt = factory()
+            PROMPT_NAMES[id(prompt)] = name
+            _prompts[attribute] = prompt
+    return _prompts[attribute]
+
+
+def registered_prompts():
+    """(name, prompt) for every registered prompt, building each one"""
+    return [(name, get_prompt(attribute)) for attribute, (name, _) in _PROMPT_FACTORIES.items()]
+
+
+def __getattr__(attribute):
+    # `from app.utils.ai_helpers import roadmap_prompt` builds the prompt on demand
+    if attribute in _PROMPT_FACTORIES:
+        return get_prompt(attribute)
+    raise AttributeError(f"module {__name__!r} has no attribute {attribute!r}")
+
+# Scheduling priority per template: chat is served before batch generation
+LLM_PRIORITIES = {
+    "chat": INTERACTIVE,
+    "chat_qa": INTERACTIVE,
+    "task_qa": INTERACTIVE,
+    "search_enhanced": INTERACTIVE,
+    "history_summary": INTERACTIVE,
+    "roadmap": BATCH,
+    "refinement": BATCH,
+    "refinement_patch": BATCH,
+    "flashcards": BATCH,
+    "study_guide": BATCH,
+    "materials": BATCH,
+}
+
+# LLM response cache
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() != "false"
+LLM_CACHE_DEFAULT_TTL = int(os.getenv("LLM_CACHE_DEFAULT_TTL", "3600"))
+
+# Cache TTLs (seconds) per prompt template
+LLM_CACHE_TTLS = {
+    "roadmap": 6 * 3600,
+    "refinement": 3600,
+    "refinement_patch": 3600,
+    "flashcards": 3600,
+    "study_guide": 6 * 3600,
+    "materials": 12 * 3600,
+    "chat_qa": 300,
+    "task_qa": 300,
+    "search_enhanced": 300,
+}
+
+llm_cache = TTLCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+    default_ttl=LLM_CACHE_DEFAULT_TTL
+)
+
+# Identical in-flight generations share one LLM call
+LLM_SINGLEFLIGHT_TIMEOUT = float(os.getenv("LLM_SINGLEFLIGHT_TIMEOUT", "90"))
+llm_flight = SingleFlight(default_timeout=LLM_SINGLEFLIGHT_TIMEOUT)
+
+_prompt_fingerprints = {}
+
+
+def get_prompt_name(prompt):
+    """Return the registered name of a prompt template"""
+    return PROMPT_NAMES.get(id(prompt), type(prompt).__name__)
+
+
+def _prompt_fingerprint(prompt):
+    """Hash of the template content, so editing a prompt invalidates its cache entries"""
+    key = id(prompt)
+    if key not in _prompt_fingerprints:
+        _prompt_fingerprints[key] = hashlib.sha256(repr(prompt).encode("utf-8")).hexdigest()[:16]
+    return _prompt_fingerprints[key]
+
+
+def _canonicalize(value):
+    """Normalize input values so equivalent requests produce the same cache key"""
+    if isinstance(value, dict):
+        return {str(k): _canonicalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    if hasattr(value, "content") and hasattr(value, "type"):
+        # Chat history messages
+        return {"type": value.type, "content": _canonicalize(value.content)}
+    return str(value)
+
+
+def llm_cache_key(prompt, data):
+    """Content-addressed key: template identity plus the canonical prompt inputs"""
+    variables = getattr(prompt, "input_variables", None) or list(data.keys())
+    inputs = {var: _canonicalize(data.get(var)) for var in sorted(variables)}
+    raw = json.dumps({
+        "template": get_prompt_name(prompt),
+        "fingerprint": _prompt_fingerprint(prompt),
+        "inputs": inputs
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-def run_chain(prompt, data):
-    chain = prompt | llm | json_parser
+def get_search_cache_stats():
+    return search.stats()
+
+
+def get_circuit_breaker_stats():
+    return {"llm": llm_breaker.stats(), "search": search_breaker.stats()}
+
+
+def get_llm_cache_stats():
+    stats = llm_cache.stats()
+    stats["enabled"] = LLM_CACHE_ENABLED
+    stats["singleFlight"] = llm_flight.stats()
+    return stats
+
+
+def run_chain(prompt, data, use_cache=True):
+    """
+    Run a prompt through the LLM and return the parsed JSON.
+    Results are cached per template and input; pass use_cache=False to bypass.
+    Concurrent calls with the same key are coalesced into one LLM request.
+    """
+    cacheable = use_cache and LLM_CACHE_ENABLED
+    cache_key = llm_cache_key(prompt, data)
+
+    if cacheable:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+    def compute():
+        result, is_fallback = _invoke_chain(prompt, data)
+
+        # Never cache failures or degraded fallback structures
+        if cacheable and result is not None and not is_fallback:
+            ttl = LLM_CACHE_TTLS.get(get_prompt_name(prompt), LLM_CACHE_DEFAULT_TTL)
+            llm_cache.set(cache_key, copy.deepcopy(result), ttl=ttl)
+        return result
+
     try:
-        response = chain.invoke(data)
+        result = llm_flight.do(cache_key, compute)
+    except SingleFlightTimeout as e:
+        print(f"Error waiting for in-flight LLM call: {e}")
+        return None
+
+    # Coalesced callers share the leader's object
+    return copy.deepcopy(result)
+
+
+def invoke_llm(messages, template=None, inputs=None, priority=None):
+    """Single entry point for blocking LLM calls"""
+    if priority is None:
+        priority = LLM_PRIORITIES.get(template, BATCH)
+
+    # Don't queue for a slot while the circuit is open
+    llm_breaker.raise_if_open()
+
+    def attempt(on_start):
+        # Every attempt, hedged or not, takes its own scheduler slot
+        with llm_scheduler.slot(priority):
+            on_start()
+            return llm_breaker.call(llm_provider.invoke, messages, template=template, inputs=inputs)
+
+    return llm_hedge.run(template, attempt)
+
+
+def stream_llm(messages, template=None, inputs=None, priority=None):
+    """Single entry point for streaming LLM calls; yields chunks with .content"""
+    if priority is None:
+        priority = LLM_PRIORITIES.get(template, INTERACTIVE)
+    llm_breaker.raise_if_open()
+    # The slot is held until the stream is exhausted or closed
+    with llm_scheduler.slot(priority):
+        trial = llm_breaker.acquire()
+        start = time.monotonic()
+        first_chunk_after = None
+        failed = None
+        try:
+            for chunk in llm_provider.stream(messages, template=template, inputs=inputs):
+                if first_chunk_after is None:
+                    first_chunk_after = time.monotonic() - start
+                yield chunk
+            failed = False
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Also runs on GeneratorExit when the client disconnects mid-stream
+            if failed is None and first_chunk_after is None:
+                # Abandoned before the model answered: no outcome either way
+                llm_breaker.release(trial)
+            else:
+                # A stream is slow when its first token is, not because the answer is long
+                duration = time.monotonic() - start if failed or first_chunk_after is None else first_chunk_after
+                llm_breaker.record(duration, failed=bool(failed), trial=trial)
+
+
+def summarize_history(previous_summary, messages, max_tokens):
+    """LLM summarizer used by chat_history.compact_history"""
+    transcript = "\n".join(
+        f"{'Student' if message.type == 'human' else 'Tutor'}: {message.content}" for message in messages
+    )
+    inputs = {
+        "previous_summary": previous_summary or "(none)",
+        "messages": transcript,
+        "max_words": max(30, max_tokens * 3 // 4)
+    }
+    response = invoke_llm(get_prompt("history_summary_prompt").invoke(inputs), template="history_summary", inputs=inputs)
+    return response.content.strip()
+
+
+def get_llm_scheduler_stats():
+    return llm_scheduler.stats()
+
+
+def get_llm_hedge_stats():
+    return llm_hedge.stats()
+
+
+def _invoke_chain(prompt, data):
+    """Call the LLM and parse its output. Returns (result, is_fallback)."""
+    try:
+        response = invoke_llm(prompt.invoke(data), template=get_prompt_name(prompt), inputs=data)
         content = response.content
         
         # FIX: Better JSON parsing for flashcards
         try:
-            return json.loads(content)
+            return json.loads(content), False
         except json.JSONDecodeError:
             pass
 
@@ -326,17 +686,17 @@ def run_chain(prompt, data):
         
         if start_index != -1 and end_index != -1:
             json_str = content[start_index : end_index + 1]
-            return json.loads(json_str)
+            return json.loads(json_str), False
             
         # For flashcards specifically, try to create a basic structure
         if "flashcards" in content.lower() or "question" in content.lower():
-            return create_fallback_flashcards(content)
+            return create_fallback_flashcards(content), True
             
-        return None
+        return None, False
         
     except Exception as e:
         print(f"Error during LLM call or final JSON parse: {e}")
-        return None
+        return None, False
 
 def create_fallback_flashcards(content):
     """Create fallback flashcard structure when JSON parsing fails"""
@@ -385,136 +745,31 @@ def create_fallback_flashcards(content):
     
     return {"flashcards": flashcards[:8]}  # Limit to 8 cards
 
-# UPDATED: Remove text cleaning to preserve markdown
 def process_ai_response(raw_text):
     """
     Minimal processing to preserve Markdown formatting.
     Only extracts code blocks while keeping the original markdown intact.
     """
-    if not raw_text:
-        return {"text": "", "code_blocks": []}
-
-    # Extract code blocks for special handling
-    code_blocks = []
-    code_block_regex = r"```(\w+)?\n([\s\S]*?)```"
-
-    if not re.search(code_block_regex, raw_text):
-        return {"text": raw_text, "code_blocks": []}
-    
-    def extract_code(match):
-        language = match.group(1) or "text"
-        code = match.group(2).strip()
-        block_id = f"CODE_BLOCK_{len(code_blocks)}"
-        code_blocks.append({
-            "id": block_id,
-            "language": language,
-            "code": code
-        })
-        return f"\n\n{block_id}\n\n"
-    
-    # Temporarily remove code blocks
-    text_with_placeholders = re.sub(code_block_regex, extract_code, raw_text)
-    
-    # Restore code blocks in their original format
-    processed_text = text_with_placeholders
-    for block in code_blocks:
-        processed_text = processed_text.replace(
-            block['id'], 
-            f"```{block['language']}\n{block['code']}\n```"
-        )
-    
-    return {
-        "text": processed_text.strip(),
-        "code_blocks": code_blocks
-    }
+    return extract_code_blocks(raw_text)
 
 def should_use_search(message: str, topic: str) -> bool:
     """Determine if web search should be used for this query"""
-    search_triggers = [
-        'current', 'recent', 'latest', 'new', 'update',
-        'search', 'find', 'look up', 'what\'s new',
-        'tutorial', 'guide', 'how to', 'examples',
-        'resources', 'tools', 'libraries', 'frameworks',
-        'trend', 'best practice', 'popular'
-    ]
-    
-    message_lower = message.lower()
-    
-    # Always search for recent information
-    if any(trigger in message_lower for trigger in ['current', 'recent', 'latest', '2024', '2025']):
-        return True
-    
-    # Search for tutorials and how-to guides
-    if any(trigger in message_lower for trigger in ['tutorial', 'how to', 'guide', 'learn']):
-        return True
-    
-    # Search for specific tools or resources
-    if any(trigger in message_lower for trigger in ['tools', 'libraries', 'frameworks', 'resources']):
-        return True
-    
-    return False
+    # Recent information, tutorials/how-to guides, or tools and resources
+    categories = {match.category for match in match_keywords(message)}
+    return bool(categories & SEARCH_TRIGGER_CATEGORIES)
 
 def extract_resources_from_search(search_results: str, topic: str) -> list:
     """Extract structured resources from search results"""
-    resources = []
-    lines = search_results.split('\n')
-    
-    for line in lines:
-        if 'http' in line:
-            # Simple URL extraction
-            urls = re.findall(r'https?://[^\s]+', line)
-            for url in urls:
-                resource_type = classify_resource_type(url, line)
-                title = extract_title_from_line(line)
-                if title and url:
-                    resources.append({
-                        "url": url,
-                        "type": resource_type,
-                        "title": title,
-                        "description": line.strip()[:150] + "..." if len(line) > 150 else line.strip()
-                    })
-    
-    # Remove duplicates and limit results
-    seen_urls = set()
-    unique_resources = []
-    
-    for resource in resources:
-        if resource['url'] not in seen_urls and len(unique_resources) < 8:
-            seen_urls.add(resource['url'])
-            unique_resources.append(resource)
-    
-    return unique_resources
-
-def classify_resource_type(url: str, context: str) -> str:
-    """Classify the type of resource based on URL and context"""
-    url_lower = url.lower()
-    context_lower = context.lower()
-    
-    if 'youtube.com' in url_lower or 'youtu.be' in url_lower:
-        return 'video'
-    elif 'github.com' in url_lower:
-        return 'tool'
-    elif 'docs' in url_lower or 'documentation' in context_lower:
-        return 'documentation'
-    elif 'course' in context_lower or 'tutorial' in context_lower:
-        return 'article'
-    else:
-        return 'article'
-
-def extract_title_from_line(line: str) -> str:
-    """Extract a title from search result line"""
-    # Remove URLs and clean up
-    clean_line = re.sub(r'https?://[^\s]+', '', line)
-    clean_line = clean_line.strip(' -•')
-    
-    # Take first 60 characters as title
-    return clean_line[:60] + ('...' if len(clean_line) > 60 else '')
-
-def extract_domain_from_url(url: str) -> str:
-    """Extract domain name from URL"""
-    from urllib.parse import urlparse
-    domain = urlparse(url).netloc
-    return domain.replace('www.', '')
+    records = unique_records(parse_search_results(search_results), predicate=lambda r: r.title, limit=8)
+    return [
+        {
+            "url": record.url,
+            "type": record.type,
+            "title": record.title,
+            "description": truncate(record.snippet, 150)
+        }
+        for record in records
+    ]
 
 def update_understanding_level(question: str, response: str, current_understanding: dict, topic: str) -> dict:
     """Update user's understanding based on the conversation"""
@@ -547,45 +802,8 @@ def extract_concepts_from_text(text: str, topic: str) -> list:
     
     return list(set(potential_concepts))[:5]
 
-# UPDATED: Enhanced processing that preserves markdown
-def enhanced_process_ai_response(raw_text):
-    """
-    Enhanced AI response processing that preserves Markdown formatting.
-    Only extracts code blocks for special handling.
-    """
-    if not raw_text:
-        return {"text": "", "code_blocks": []}
-
-    # Extract code blocks for custom rendering
-    code_blocks = []
-    code_block_regex = r"```(\w+)?\n([\s\S]*?)```"
-    
-    def extract_code(match):
-        language = match.group(1) or "text"
-        code = match.group(2).strip()
-        block_id = f"CODE_BLOCK_{len(code_blocks)}"
-        code_blocks.append({
-            "id": block_id,
-            "language": language,
-            "code": code
-        })
-        return f"\n\n{block_id}\n\n"
-    
-    # Replace code blocks with placeholders
-    text_with_placeholders = re.sub(code_block_regex, extract_code, raw_text)
-    
-    # Restore code blocks in their original markdown format
-    final_text = text_with_placeholders
-    for block in code_blocks:
-        final_text = final_text.replace(
-            block['id'], 
-            f"```{block['language']}\n{block['code']}\n```"
-        )
-    
-    return {
-        "text": final_text.strip(),
-        "code_blocks": code_blocks
-    }
+# Kept for existing callers; both names share the single-pass tokenizer
+enhanced_process_ai_response = process_ai_response
 
 def enhanced_update_understanding_level(question, response, current_understanding, topic):
     """
@@ -625,34 +843,19 @@ def analyze_conversation_depth(question, response):
     """Analyze the depth and quality of the conversation"""
     depth_score = 0
     
-    # Question analysis
-    question_lower = question.lower()
-    response_lower = response.lower()
-    
     # Length analysis
     if len(question.split()) > 15:
         depth_score += 2
     if len(response.split()) > 100:
         depth_score += 3
     
-    # Complexity indicators
-    complexity_indicators = [
-        'how', 'why', 'explain', 'compare', 'difference',
-        'implement', 'optimize', 'architecture', 'best practice'
-    ]
-    
-    for indicator in complexity_indicators:
-        if indicator in question_lower:
-            depth_score += 2
-    
-    # Follow-up indicators
-    follow_up_indicators = ['following up', 'previous', 'earlier', 'based on']
-    for indicator in follow_up_indicators:
-        if indicator in question_lower:
-            depth_score += 3
+    # Complexity and follow-up indicators, each counted once
+    matches = match_keywords(question)
+    depth_score += 2 * len({m.term for m in matches if m.category == "depth.indicator"})
+    depth_score += 3 * len({m.term for m in matches if m.category == "depth.follow_up"})
     
     # Code discussion
-    if 'code' in question_lower or '```' in response:
+    if 'code' in question.lower() or '```' in response:
         depth_score += 3
     
     return min(depth_score, 10)
@@ -668,41 +871,21 @@ def extract_concepts_with_context(text, main_topic):
         'complexity': 2
     })
     
-    # Technical terms with complexity levels
-    technical_terms = {
-        'basic': ['variable', 'function', 'loop', 'if', 'else', 'print'],
-        'intermediate': ['class', 'object', 'method', 'array', 'string', 'number'],
-        'advanced': ['algorithm', 'framework', 'api', 'database', 'async', 'promise']
-    }
-    
-    text_lower = text.lower()
-    
-    # Check for basic concepts
-    for term in technical_terms['basic']:
-        if term in text_lower:
-            concepts.append({
-                'concept': term,
-                'confidence': 0.6,
-                'complexity': 1
-            })
-    
-    # Check for intermediate concepts
-    for term in technical_terms['intermediate']:
-        if term in text_lower:
-            concepts.append({
-                'concept': term,
-                'confidence': 0.7,
-                'complexity': 2
-            })
-    
-    # Check for advanced concepts
-    for term in technical_terms['advanced']:
-        if term in text_lower:
-            concepts.append({
-                'concept': term,
-                'confidence': 0.8,
-                'complexity': 3
-            })
+    # Shared technical terms and the topic's domain terms, in one pass
+    found = {}
+    for match in match_keywords(text, main_topic, whole_words=True):
+        level = CONCEPT_LEVELS.get(match.category)
+        if level and (level, match.term) not in found:
+            found[(level, match.term)] = match.start
+    
+    # Basic concepts first, then intermediate, then advanced
+    for (level, term), _ in sorted(found.items(), key=lambda item: (LEVEL_ORDER[item[0][0]], item[1])):
+        confidence, complexity = CONCEPT_SCORES[level]
+        concepts.append({
+            'concept': term,
+            'confidence': confidence,
+            'complexity': complexity
+        })
     
     # Remove duplicates
     seen = set()
@@ -712,4 +895,4 @@ def extract_concepts_with_context(text, main_topic):
             seen.add(concept['concept'])
             unique_concepts.append(concept)
     
-    return unique_concepts[:6]  # Limit to 6 concepts
\ No newline at end of file
+    return unique_concepts[:6]  # Limit to 6 concepts
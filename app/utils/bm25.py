@@ -0,0 +1,110 @@
+import math
+import threading
+from collections import Counter, namedtuple
+
+BM25Hit = namedtuple("BM25Hit", ["doc_id", "score", "matched", "payload"])
+
+
+def simple_tokenize(text):
+    return (text or "").lower().split()
+
+
+class BM25Index:
+    """
+    Incrementally updatable inverted index with Okapi BM25 ranking.
+    add() replaces a document with the same id; remove() drops it. Postings
+    are kept per term, so a query only touches documents sharing a term.
+    """
+
+    def __init__(self, tokenizer=None, k1=1.5, b=0.75):
+        self.tokenizer = tokenizer or simple_tokenize
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._docs = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def add(self, doc_id, text, payload=None):
+        terms = Counter(self.tokenizer(text))
+        with self._lock:
+            self.remove(doc_id)
+            if not terms:
+                return False
+            for term, freq in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = freq
+            length = sum(terms.values())
+            self._docs[doc_id] = (tuple(terms), length, payload)
+            self._total_length += length
+            return True
+
+    def remove(self, doc_id):
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+            if doc is None:
+                return False
+            terms, length, _ = doc
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= length
+            return True
+
+    def get(self, doc_id):
+        doc = self._docs.get(doc_id)
+        return doc[2] if doc else None
+
+    def search(self, query, k=10, accept=None):
+        """
+        Top-k documents for the query as BM25Hit tuples, best first.
+        `accept(payload)` can reject documents (e.g. stale ones) before ranking.
+        """
+        query_terms = list(dict.fromkeys(self.tokenizer(query)))
+        with self._lock:
+            doc_count = len(self._docs)
+            if not doc_count or not query_terms:
+                return []
+            avg_length = self._total_length / doc_count
+
+            scores = {}
+            matched = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc_id, freq in postings.items():
+                    length = self._docs[doc_id][1]
+                    norm = freq + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / norm
+                    matched.setdefault(doc_id, set()).add(term)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            hits = []
+            for doc_id, score in ranked:
+                payload = self._docs[doc_id][2]
+                if accept is not None and not accept(payload):
+                    continue
+                hits.append(BM25Hit(doc_id, score, frozenset(matched[doc_id]), payload))
+                if len(hits) >= k:
+                    break
+            return hits
+
+    def items(self):
+        with self._lock:
+            return [(doc_id, doc[2]) for doc_id, doc in self._docs.items()]
+
+    def __len__(self):
+        return len(self._docs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "terms": len(self._postings),
+                "avgLength": round(self._total_length / len(self._docs), 1) if self._docs else 0
+            }
@@ -0,0 +1,132 @@
+import os
+import hashlib
+from langchain_core.messages import HumanMessage
+from app.utils.cache import TTLCache
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+CHAT_HISTORY_KEEP_MESSAGES = int(os.getenv("CHAT_HISTORY_KEEP_MESSAGES", "6"))
+CHAT_SUMMARY_TTL = int(os.getenv("CHAT_SUMMARY_TTL", "21600"))
+
+# Rolling summaries per conversation: {"folded": n, "digest": ..., "summary": ...}
+summary_cache = TTLCache(max_entries=int(os.getenv("CHAT_SUMMARY_MAX_ENTRIES", "2048")), default_ttl=CHAT_SUMMARY_TTL)
+
+SUMMARY_PREFIX = "Summary of our earlier conversation:\n"
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+
+def _messages_tokens(messages):
+    return sum(estimate_tokens(str(message.content)) for message in messages)
+
+
+def _digest(messages):
+    """Fingerprint of a message prefix, to detect edited or different histories"""
+    sha = hashlib.sha256()
+    for message in messages:
+        sha.update(f"{message.type}:{message.content}\x00".encode("utf-8"))
+    return sha.hexdigest()
+
+
+def conversation_key(user_id, messages, conversation_id=None):
+    """Stable id for a conversation: explicit id if given, else its opening message"""
+    if conversation_id:
+        return f"{user_id}:{conversation_id}"
+    opening = str(messages[0].content) if messages else ""
+    return f"{user_id}:{hashlib.sha256(opening.encode('utf-8')).hexdigest()[:16]}"
+
+
+def extractive_summary(previous_summary, messages, max_tokens):
+    """Fallback summary: the start of each folded message, trimmed to the budget"""
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        speaker = "Student" if message.type == "human" else "Tutor"
+        lines.append(f"- {speaker}: {' '.join(str(message.content).split())[:160]}")
+    summary = "\n".join(lines)
+    max_chars = max_tokens * 4
+    return summary[-max_chars:] if len(summary) > max_chars else summary
+
+
+def _split_window(messages, budget, keep_last):
+    """(older, recent): the verbatim window and the messages to fold before it"""
+    split = max(0, len(messages) - keep_last)
+    older, recent = messages[:split], messages[split:]
+
+    # Even the verbatim window can be too large: drop its oldest messages first
+    recent_budget = budget * 2 // 3
+    while len(recent) > 1 and _messages_tokens(recent) > recent_budget:
+        older = older + [recent[0]]
+        recent = recent[1:]
+    return older, recent
+
+
+def _fold(previous_summary, new_messages, max_tokens, summarize):
+    """Summary of previous_summary plus new_messages; extractive if the summarizer fails"""
+    try:
+        summary = summarize(previous_summary, new_messages, max_tokens) if summarize else None
+    except Exception as e:
+        print(f"Chat summary error: {e}")
+        summary = None
+    return summary or extractive_summary(previous_summary, new_messages, max_tokens)
+
+
+def compact_history(messages, user_id=None, conversation_id=None, budget=None, keep_last=None, summarize=None):
+    """
+    Keep the prompt's chat history under a token budget.
+    The last `keep_last` messages stay verbatim; older ones are folded into a
+    rolling summary that is cached per conversation, so each turn only
+    summarizes the messages that newly fell out of the window.
+    `summarize(previous_summary, new_messages, max_tokens)` produces the summary text.
+    """
+    budget = CHAT_HISTORY_TOKEN_BUDGET if budget is None else budget
+    keep_last = CHAT_HISTORY_KEEP_MESSAGES if keep_last is None else keep_last
+
+    if not messages or _messages_tokens(messages) <= budget:
+        return messages
+
+    older, recent = _split_window(messages, budget, keep_last)
+    if not older:
+        return recent
+
+    summary_budget = max(64, budget - _messages_tokens(recent))
+    key = conversation_key(user_id, messages, conversation_id)
+    entry = summary_cache.get(key)
+
+    previous_summary = ""
+    new_messages = older
+    if entry and entry["folded"] <= len(older) and entry["digest"] == _digest(older[:entry["folded"]]):
+        previous_summary = entry["summary"]
+        new_messages = older[entry["folded"]:]
+
+    summary = previous_summary
+    if new_messages:
+        summary = _fold(previous_summary, new_messages, summary_budget, summarize)
+        summary_cache.set(key, {"folded": len(older), "digest": _digest(older), "summary": summary})
+
+    return [HumanMessage(content=SUMMARY_PREFIX + summary)] + recent
+
+
+def compact_stored_history(messages, previous_summary=None, budget=None, keep_last=None, summarize=None):
+    """
+    compact_history for a server-side conversation, whose rolling summary is
+    stored with it: `previous_summary` covers every message before `messages`.
+    Returns (history, summary, folded), where `folded` counts the leading
+    messages the returned summary now also covers (0 when it is unchanged).
+    """
+    budget = CHAT_HISTORY_TOKEN_BUDGET if budget is None else budget
+    keep_last = CHAT_HISTORY_KEEP_MESSAGES if keep_last is None else keep_last
+    summary = previous_summary or ""
+
+    older, recent = [], messages or []
+    if recent and _messages_tokens(recent) > budget:
+        older, recent = _split_window(recent, budget, keep_last)
+
+    if older:
+        summary = _fold(summary, older, max(64, budget - _messages_tokens(recent)), summarize)
+    if not summary:
+        return recent, summary, 0
+    return [HumanMessage(content=SUMMARY_PREFIX + summary)] + recent, summary, len(older)
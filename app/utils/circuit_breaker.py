@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Count-based sliding-window circuit breaker.
+    Trips OPEN when, over the last `window` calls (at least `min_calls`), the
+    failure rate or the rate of calls slower than `slow_call_duration`
+    reaches its threshold. While OPEN every call fails fast; after
+    `open_seconds` up to `half_open_calls` trial calls are let through and
+    the circuit closes once that many pass, or reopens on the first one
+    that fails or is slow. A trial that never reports back (record() or
+    release()) gives up its slot after `trial_timeout` seconds.
+    """
+
+    def __init__(self, name, window=20, min_calls=10, failure_rate=0.5, slow_call_rate=0.5,
+                 slow_call_duration=10.0, open_seconds=30.0, half_open_calls=3, trial_timeout=60.0):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_duration = slow_call_duration
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.trial_timeout = trial_timeout
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, slow)
+        self._opened_at = None
+        self._trials = {}  # trial id -> start time, for trials that have not reported
+        self._next_trial = 0
+        self._trials_passed = 0
+        self._counters = {"calls": 0, "failures": 0, "slowCalls": 0, "rejected": 0, "opened": 0,
+                          "trialsExpired": 0}
+        self._lock = threading.Lock()
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._counters["opened"] += 1
+        print(f"⚡ Circuit '{self.name}' opened")
+
+    def _retry_after(self, now):
+        return max(0.0, self._opened_at + self.open_seconds - now)
+
+    def acquire(self):
+        """
+        Permission for one call; raises CircuitOpenError when the call must
+        not be made. Returns a trial id while HALF_OPEN (None otherwise) to
+        pass back to record() or release().
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if self._retry_after(now) > 0:
+                    self._counters["rejected"] += 1
+                    raise CircuitOpenError(self.name, self._retry_after(now))
+                self.state = HALF_OPEN
+                self._trials.clear()
+                self._trials_passed = 0
+                print(f"⚡ Circuit '{self.name}' half-open: probing")
+
+            if self.state == HALF_OPEN:
+                self._expire_trials(now)
+                if len(self._trials) >= self.half_open_calls:
+                    self._counters["rejected"] += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._next_trial += 1
+                self._trials[self._next_trial] = now
+                return self._next_trial
+            return None
+
+    def _expire_trials(self, now):
+        # Trials whose caller vanished without reporting must not hold a slot forever
+        for trial, started in list(self._trials.items()):
+            if now - started >= self.trial_timeout:
+                del self._trials[trial]
+                self._counters["trialsExpired"] += 1
+
+    def release(self, trial=None):
+        """End a call without an outcome (e.g. its client went away)"""
+        with self._lock:
+            self._trials.pop(trial, None)
+
+    def raise_if_open(self):
+        """Cheap pre-check that fails fast without reserving a trial call"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and self._retry_after(now) > 0:
+                self._counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self._retry_after(now))
+
+    def record(self, duration, failed, trial=None):
+        slow = duration >= self.slow_call_duration
+        now = time.monotonic()
+        with self._lock:
+            self._trials.pop(trial, None)
+            self._counters["calls"] += 1
+            self._counters["failures"] += 1 if failed else 0
+            self._counters["slowCalls"] += 1 if slow else 0
+
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                    return
+                self._trials_passed += 1
+                if self._trials_passed >= self.half_open_calls:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    print(f"⚡ Circuit '{self.name}' closed")
+                return
+
+            if self.state == OPEN:
+                # A call admitted before the circuit opened finished late
+                return
+
+            self._outcomes.append((failed, slow))
+            if len(self._outcomes) >= self.min_calls:
+                calls = len(self._outcomes)
+                failures = sum(1 for failed_call, _ in self._outcomes if failed_call)
+                slow_calls = sum(1 for _, slow_call in self._outcomes if slow_call)
+                if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                    self._open(now)
+
+    def call(self, fn, *args, **kwargs):
+        trial = self.acquire()
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(time.monotonic() - start, failed=True, trial=trial)
+            raise
+        except BaseException:
+            # Interrupted, not failed: free the trial slot without an outcome
+            self.release(trial)
+            raise
+        self.record(time.monotonic() - start, failed=False, trial=trial)
+        return result
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "failureRate": round(sum(1 for f, _ in self._outcomes if f) / calls, 3) if calls else 0.0,
+                "slowCallRate": round(sum(1 for _, s in self._outcomes if s) / calls, 3) if calls else 0.0,
+                "retryAfter": round(self._retry_after(now), 1) if self.state == OPEN else 0.0,
+                "trialsInFlight": len(self._trials),
+                **self._counters
+            }
+
+
+def breaker_from_env(name, slow_call_duration):
+    """CircuitBreaker configured by CIRCUIT_<NAME>_* environment variables"""
+    prefix = f"CIRCUIT_{name.upper()}_"
+    return CircuitBreaker(
+        name,
+        window=int(os.getenv(prefix + "WINDOW", "20")),
+        min_calls=int(os.getenv(prefix + "MIN_CALLS", "10")),
+        failure_rate=float(os.getenv(prefix + "FAILURE_RATE", "0.5")),
+        slow_call_rate=float(os.getenv(prefix + "SLOW_CALL_RATE", "0.5")),
+        slow_call_duration=float(os.getenv(prefix + "SLOW_CALL_SECONDS", str(slow_call_duration))),
+        open_seconds=float(os.getenv(prefix + "OPEN_SECONDS", "30")),
+        half_open_calls=int(os.getenv(prefix + "HALF_OPEN_CALLS", "3")),
+        trial_timeout=float(os.getenv(prefix + "TRIAL_TIMEOUT", "60"))
+    )
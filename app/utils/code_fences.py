@@ -0,0 +1,141 @@
+import re
+
+FENCE = "```"
+# Language tag directly after the opening fence, e.g. ```python
+LANGUAGE_PATTERN = re.compile(r"\w*")
+
+
+class CodeFenceStreamParser:
+    """
+    Single-pass code-fence tokenizer for complete or streamed responses.
+    feed() returns events as soon as they can be decided:
+      {"type": "text", "text": ...}             prose outside code fences
+      {"type": "code", "id": ..., "text": ...}  code inside an open fence
+      {"type": "code_block", "block": {...}}    a fence was closed
+    result() returns {"text", "code_blocks"}: fences are normalized to
+    ```language\\ncode\\n``` on their own paragraph and an unterminated fence
+    is closed at the end of the input.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_code = False
+        self._language = None
+        self._code_parts = []
+        self._text_parts = []
+        self.code_blocks = []
+
+    def feed(self, chunk):
+        if not chunk:
+            return []
+        self._buffer += chunk
+        return self._drain(final=False)
+
+    def close(self):
+        return self._drain(final=True)
+
+    def result(self):
+        return {
+            "text": "".join(self._text_parts).strip(),
+            "code_blocks": self.code_blocks
+        }
+
+    def _current_block_id(self):
+        return f"CODE_BLOCK_{len(self.code_blocks)}"
+
+    @staticmethod
+    def _safe_end(buf, pos):
+        """Hold back trailing backticks that may be the start of a fence split across chunks"""
+        end = len(buf)
+        while end > pos and len(buf) - end < len(FENCE) - 1 and buf[end - 1] == "`":
+            end -= 1
+        return end
+
+    def _drain(self, final):
+        events = []
+        buf = self._buffer
+        pos = 0
+
+        while True:
+            fence_at = buf.find(FENCE, pos)
+
+            if self._in_code:
+                if fence_at == -1:
+                    end = len(buf) if final else self._safe_end(buf, pos)
+                    self._emit_code(buf[pos:end], events)
+                    pos = end
+                    if final:
+                        self._finish_block(events)
+                    break
+                self._emit_code(buf[pos:fence_at], events)
+                pos = fence_at + len(FENCE)
+                self._finish_block(events)
+                continue
+
+            if fence_at == -1:
+                end = len(buf) if final else self._safe_end(buf, pos)
+                self._emit_text(buf[pos:end], events)
+                pos = end
+                break
+
+            header_start = fence_at + len(FENCE)
+            header_end = LANGUAGE_PATTERN.match(buf, header_start).end()
+
+            if header_end == len(buf):
+                if final:
+                    self._emit_text(buf[pos:], events)
+                    pos = len(buf)
+                    break
+                # Wait for the rest of the header before deciding
+                self._emit_text(buf[pos:fence_at], events)
+                pos = fence_at
+                break
+
+            if buf[header_end] != "\n":
+                # Not an opening fence: keep one backtick and rescan from the next
+                self._emit_text(buf[pos:fence_at + 1], events)
+                pos = fence_at + 1
+                continue
+
+            self._emit_text(buf[pos:fence_at], events)
+            self._language = buf[header_start:header_end] or "text"
+            self._code_parts = []
+            self._in_code = True
+            pos = header_end + 1
+
+        self._buffer = buf[pos:]
+        return events
+
+    def _emit_text(self, text, events):
+        if text:
+            self._text_parts.append(text)
+            events.append({"type": "text", "text": text})
+
+    def _emit_code(self, code, events):
+        if code:
+            self._code_parts.append(code)
+            events.append({"type": "code", "id": self._current_block_id(), "text": code})
+
+    def _finish_block(self, events):
+        block = {
+            "id": self._current_block_id(),
+            "language": self._language,
+            "code": "".join(self._code_parts).strip()
+        }
+        self.code_blocks.append(block)
+        self._text_parts.append(f"\n\n{FENCE}{block['language']}\n{block['code']}\n{FENCE}\n\n")
+        self._code_parts = []
+        self._language = None
+        self._in_code = False
+        events.append({"type": "code_block", "block": block})
+
+
+def extract_code_blocks(raw_text):
+    """Process a complete response in one linear pass"""
+    if not raw_text:
+        return {"text": "", "code_blocks": []}
+
+    parser = CodeFenceStreamParser()
+    parser.feed(raw_text)
+    parser.close()
+    return parser.result()
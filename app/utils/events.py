@@ -0,0 +1,32 @@
+import threading
+
+# Domain events emitted after the write they describe has succeeded. Handlers
+# also receive written_at, the time the write was done
+PLAN_CREATED = "plan_created"
+PLAN_DELETED = "plan_deleted"
+TODO_TOGGLED = "todo_toggled"
+TODO_DELETED = "todo_deleted"
+TODO_MOVED = "todo_moved"
+
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def subscribe(event, handler):
+    """Register handler(**payload) for an event; registering twice is a no-op"""
+    with _handlers_lock:
+        handlers = _handlers.setdefault(event, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def emit(event, **payload):
+    """
+    Call the event's handlers synchronously. A failing handler is logged and
+    never fails the request that emitted the event.
+    """
+    for handler in list(_handlers.get(event, ())):
+        try:
+            handler(**payload)
+        except Exception as e:
+            print(f"❌ Event handler {handler.__name__} for '{event}' failed: {e}")
@@ -0,0 +1,207 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Log-spaced latency buckets from 10ms to ~5min (25% apart)
+_BUCKET_BOUNDS = [0.01 * 1.25 ** i for i in range(47)]
+
+
+class LatencyHistogram:
+    """
+    Bucketed latency histogram with exponential forgetting: once `window`
+    samples are counted, all buckets are halved so percentiles follow the
+    recent behaviour of the backend.
+    """
+
+    def __init__(self, window=500):
+        self.window = window
+        self.counts = [0.0] * (len(_BUCKET_BOUNDS) + 1)
+        self.total = 0.0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        index = 0 if seconds <= _BUCKET_BOUNDS[0] else min(
+            len(_BUCKET_BOUNDS), int(math.log(seconds / _BUCKET_BOUNDS[0], 1.25)) + 1
+        )
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.samples += 1
+            if self.total >= self.window:
+                self.counts = [count / 2 for count in self.counts]
+                self.total /= 2
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, in seconds"""
+        with self._lock:
+            if not self.total:
+                return None
+            target = q * self.total
+            running = 0.0
+            for index, count in enumerate(self.counts):
+                running += count
+                if running >= target:
+                    return _BUCKET_BOUNDS[min(index, len(_BUCKET_BOUNDS) - 1)]
+            return _BUCKET_BOUNDS[-1]
+
+
+class HedgePolicy:
+    """
+    Hedged requests: if an attempt is still running after the template's
+    observed latency percentile, start a duplicate and return whichever
+    succeeds first. Duplicates spend from a budget that earns `budget`
+    hedges per call, so at most that fraction of extra load is added.
+    Python threads cannot be interrupted, so the losing attempt is cancelled
+    if it has not started and otherwise finishes with its result discarded.
+    """
+
+    def __init__(self, enabled=False, percentile=0.95, min_samples=20, budget=0.1, max_credits=5,
+                 min_delay=0.05, max_workers=16, templates=None):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget = budget
+        self.max_credits = max_credits
+        self.min_delay = min_delay
+        self.templates = set(templates) if templates else None
+        self.max_workers = max_workers
+        self.histograms = {}
+        self._credits = float(max_credits)
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _histogram(self, template):
+        histogram = self.histograms.get(template)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(template, LatencyHistogram())
+        return histogram
+
+    def _count(self, template, name):
+        with self._lock:
+            counters = self._counters.setdefault(
+                template, {"calls": 0, "hedged": 0, "hedgeWins": 0, "budgetDenied": 0}
+            )
+            counters[name] += 1
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-hedge")
+        return self._executor
+
+    def record(self, template, seconds):
+        self._histogram(template).record(seconds)
+
+    def applies_to(self, template):
+        return self.enabled and (self.templates is None or template in self.templates)
+
+    def hedge_delay(self, template):
+        """Seconds to wait before hedging, or None while there is too little data"""
+        histogram = self._histogram(template)
+        if histogram.samples < self.min_samples:
+            return None
+        return max(self.min_delay, histogram.percentile(self.percentile))
+
+    def _take_credit(self):
+        with self._lock:
+            if self._credits >= 1:
+                self._credits -= 1
+                return True
+            return False
+
+    def _earn_credit(self):
+        with self._lock:
+            self._credits = min(self.max_credits, self._credits + self.budget)
+
+    def _timed(self, template, fn):
+        """Run fn(on_start); record the latency measured from on_start()"""
+        started = threading.Event()
+        start = [None]
+
+        def on_start():
+            start[0] = time.monotonic()
+            started.set()
+
+        def attempt():
+            result = fn(on_start)
+            if start[0] is not None:
+                self.record(template, time.monotonic() - start[0])
+            return result
+
+        return attempt, started
+
+    def run(self, template, fn):
+        """
+        Call fn(on_start) with hedging. fn must call on_start() when the real
+        work begins (after any queueing), which starts the hedge timer.
+        """
+        if not self.applies_to(template):
+            attempt, _ = self._timed(template, fn)
+            return attempt()
+
+        self._count(template, "calls")
+        self._earn_credit()
+        delay = self.hedge_delay(template)
+        primary_attempt, started = self._timed(template, fn)
+        if delay is None:
+            # Too few samples to hedge yet: no reason to hop to the executor
+            return primary_attempt()
+
+        primary = self._get_executor().submit(primary_attempt)
+
+        # Hedge on time spent in the backend, not time spent queued for a slot
+        while not started.wait(0.05):
+            if primary.done():
+                return primary.result()
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if not self._take_credit():
+            self._count(template, "budgetDenied")
+            return primary.result()
+
+        self._count(template, "hedged")
+        backup_attempt, _ = self._timed(template, fn)
+        backup = self._get_executor().submit(backup_attempt)
+        pending = {primary, backup}
+        error = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is backup:
+                        self._count(template, "hedgeWins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self):
+        with self._lock:
+            counters = {template: dict(values) for template, values in self._counters.items()}
+            credits = round(self._credits, 2)
+        templates = {}
+        for template, histogram in list(self.histograms.items()):
+            p50 = histogram.percentile(0.5)
+            p95 = histogram.percentile(0.95)
+            templates[template or "default"] = {
+                "samples": histogram.samples,
+                "p50Ms": round(p50 * 1000) if p50 is not None else None,
+                "p95Ms": round(p95 * 1000) if p95 is not None else None,
+                **counters.get(template, {})
+            }
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "budget": self.budget,
+            "credits": credits,
+            "templates": templates
+        }
@@ -1,39 +1,57 @@
 import os
+import json
+import threading
 import jwt
 from pymongo import MongoClient
 from flask import jsonify
-import firebase_admin
-from firebase_admin import auth as firebase_auth, credentials
 from datetime import datetime
 
 # MongoDB connection
 _client = None
 _db = None
+_db_lock = threading.Lock()
 
 def get_db():
-    global _db
     if _db is None:
         initialize_db()
     return _db
 
 def initialize_db():
     global _client, _db
-    MONGO_URI = os.getenv("MONGO_URI")
-    _client = MongoClient(MONGO_URI)
-    _db = _client.learning_planner
+    with _db_lock:
+        # Another thread may have connected while we waited
+        if _db is not None:
+            return
+        MONGO_URI = os.getenv("MONGO_URI")
+        _client = MongoClient(MONGO_URI)
+        _db = _client.learning_planner
+
+def format_sse(event, data):
+    """Format a payload as a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 def get_jwt_secret():
     return os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 
-# Firebase initialization
+# Firebase initialization: firebase_admin is imported and set up on first use
 _firebase_initialized = False
+_firebase_lock = threading.Lock()
 
 def initialize_firebase():
+    if _firebase_initialized:
+        return True
+    with _firebase_lock:
+        return _initialize_firebase()
+
+def _initialize_firebase():
     global _firebase_initialized
     if _firebase_initialized:
         return True
         
     try:
+        import firebase_admin
+        from firebase_admin import credentials
+
         if not firebase_admin._apps:
             print("🔄 Initializing Firebase Admin SDK...")
             
@@ -87,6 +105,7 @@ def verify_firebase_token(token):
     try:
         if not _firebase_initialized:
             initialize_firebase()
+        from firebase_admin import auth as firebase_auth
         return firebase_auth.verify_id_token(token)
     except Exception as e:
         print(f"❌ Token verification failed: {str(e)}")
@@ -0,0 +1,206 @@
+import os
+import threading
+from collections import namedtuple
+
+# The indexes every service query relies on. They are built idempotently by
+# `flask indexes sync` (or at startup) and compared with the live database by
+# `flask indexes check`.
+INDEXES_SYNC_ON_STARTUP = os.getenv("INDEXES_SYNC_ON_STARTUP", "false").lower() == "true"
+
+IndexSpec = namedtuple("IndexSpec", ["collection", "keys", "options", "purpose"])
+
+# Options compared when looking for drift; build-only options (name, background) are not
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+INDEX_SPECS = (
+    # Logins look users up by email / Firebase uid; both must identify one user.
+    # Email/password users have no firebaseUid, so only string uids are unique.
+    IndexSpec("users", [("email", 1)], {"unique": True}, "login and email-change checks"),
+    IndexSpec("users", [("firebaseUid", 1)],
+              {"unique": True, "partialFilterExpression": {"firebaseUid": {"$type": "string"}}},
+              "Firebase login"),
+
+    IndexSpec("learning_plans", [("userId", 1), ("status", 1), ("_id", -1)], {},
+              "active plans, newest first"),
+    IndexSpec("learning_plans", [("userId", 1), ("_id", -1)], {},
+              "all plans / latest plan, newest first"),
+    IndexSpec("learning_plans", [("userId", 1), ("createdAt", 1)], {},
+              "dashboard 'learning since'"),
+
+    IndexSpec("todos", [("userId", 1), ("planId", 1), ("day", 1), ("completed", 1)], {},
+              "a plan's todos for a day, progress counts, plan deletion"),
+    IndexSpec("todos", [("userId", 1), ("completed", 1), ("updatedAt", -1)], {},
+              "dashboard recent completions"),
+
+    IndexSpec("jobs", [("expiresAt", 1)], {"expireAfterSeconds": 0}, "finished jobs expire"),
+    IndexSpec("jobs", [("status", 1), ("createdAt", 1)], {}, "workers claim the oldest queued job"),
+
+    IndexSpec("learner_understanding", [("userId", 1), ("topic", 1)], {"unique": True},
+              "one understanding document per user and topic"),
+
+    IndexSpec("conversations", [("userId", 1), ("updatedAt", -1)], {},
+              "conversation list, most recent first"),
+    IndexSpec("conversation_messages", [("conversationId", 1), ("bucket", 1)], {"unique": True},
+              "message buckets of a conversation"),
+
+    IndexSpec("search_cache", [("expiresAt", 1)], {"expireAfterSeconds": 0}, "cached searches expire"),
+    IndexSpec("search_corpus", [("expiresAt", 1)], {"expireAfterSeconds": 0}, "corpus passages expire"),
+)
+
+
+def specs_for(collection_name):
+    return [spec for spec in INDEX_SPECS if spec.collection == collection_name]
+
+
+def _key_tuple(keys):
+    return tuple((field, direction) for field, direction in keys)
+
+
+def _compared(options):
+    return {name: options[name] for name in _COMPARED_OPTIONS if name in options}
+
+
+def _normalized(options):
+    """Index options as the server reports them (numbers may come back as floats)"""
+    normalized = {}
+    for name, value in _compared(options).items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            normalized[name] = value
+        else:
+            normalized[name] = int(value)
+    return normalized
+
+
+def _existing_indexes(collection):
+    """{key tuple: (name, compared options)} for the live indexes of a collection"""
+    existing = {}
+    for name, info in collection.index_information().items():
+        keys = tuple((field, int(direction) if isinstance(direction, float) else direction)
+                     for field, direction in info["key"])
+        existing[keys] = (name, _normalized(info))
+    return existing
+
+
+def check_collection(collection, collection_name=None):
+    """
+    Drift between the declared indexes and one live collection:
+    missing (declared, not built), mismatched (same keys, different options)
+    and extra (built, not declared) indexes.
+    """
+    specs = specs_for(collection_name or collection.name)
+    existing = _existing_indexes(collection)
+    report = {"collection": collection.name, "ok": [], "missing": [], "mismatched": [], "extra": []}
+
+    declared = set()
+    for spec in specs:
+        keys = _key_tuple(spec.keys)
+        declared.add(keys)
+        if keys not in existing:
+            report["missing"].append(spec)
+        elif existing[keys][1] != _normalized(spec.options):
+            report["mismatched"].append((spec, existing[keys][0], existing[keys][1]))
+        else:
+            report["ok"].append(spec)
+
+    for keys, (name, _) in existing.items():
+        if keys not in declared and name != "_id_":
+            report["extra"].append((name, keys))
+    return report
+
+
+def ensure_collection_indexes(collection, collection_name=None):
+    """
+    Build the declared indexes a collection is missing. Mismatched indexes are
+    reported, never dropped: changing them needs a deliberate migration.
+    Returns the drift report from before the build plus any build errors.
+    """
+    report = check_collection(collection, collection_name)
+    report["created"] = []
+    report["errors"] = []
+    for spec in report["missing"]:
+        try:
+            report["created"].append(collection.create_index(spec.keys, **spec.options))
+        except Exception as e:
+            # e.g. a unique index over data that already has duplicates
+            report["errors"].append((spec, str(e)))
+            print(f"❌ Failed to build index {spec.keys} on {collection.name}: {e}")
+    return report
+
+
+def _collection_names():
+    return list(dict.fromkeys(spec.collection for spec in INDEX_SPECS))
+
+
+def ensure_indexes(db):
+    """Build every declared index; returns one report per collection"""
+    return [ensure_collection_indexes(db[name]) for name in _collection_names()]
+
+
+def check_indexes(db):
+    return [check_collection(db[name]) for name in _collection_names()]
+
+
+def format_report(report):
+    """Human-readable lines for one collection's report"""
+    lines = []
+    name = report["collection"]
+    for spec in report["ok"]:
+        lines.append(f"  ✅ {name} {spec.keys}")
+    failed = [spec for spec, _ in report.get("errors", [])]
+    for spec in report["missing"]:
+        if "created" in report and spec not in failed:
+            lines.append(f"  🆕 {name} {spec.keys} built ({spec.purpose})")
+        elif spec not in failed:
+            lines.append(f"  ❌ {name} {spec.keys} missing ({spec.purpose})")
+    for spec, index_name, options in report["mismatched"]:
+        lines.append(f"  ⚠️ {name} {spec.keys}: index '{index_name}' has {options}, declared {_compared(spec.options)}")
+    for index_name, keys in report["extra"]:
+        lines.append(f"  ➖ {name} '{index_name}' {list(keys)} is not declared")
+    for spec, error in report.get("errors", []):
+        lines.append(f"  ❌ {name} {spec.keys}: {error}")
+    return lines
+
+
+def has_drift(reports):
+    return any(
+        report["mismatched"] or report["extra"] or report.get("errors")
+        or ("created" not in report and report["missing"])
+        for report in reports
+    )
+
+
+def collection_scans(explain):
+    """Namespaces an explain() output reads with a COLLSCAN, anywhere in its plan tree"""
+    scans = []
+
+    def walk(node, namespace=None):
+        if isinstance(node, dict):
+            namespace = node.get("namespace", namespace)
+            if node.get("stage") == "COLLSCAN":
+                scans.append(namespace or "unknown")
+            for value in node.values():
+                walk(value, namespace)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, namespace)
+
+    walk(explain)
+    return sorted(set(scans))
+
+
+def sync_indexes_in_background():
+    """Startup hook: build missing indexes without holding up worker boot"""
+    def run():
+        from app.utils.helpers import get_db
+        try:
+            reports = ensure_indexes(get_db())
+            created = sum(len(report["created"]) for report in reports)
+            print(f"🗂️ Index sync finished: {created} built")
+            for report in reports:
+                for line in format_report(report):
+                    if not line.lstrip().startswith("✅"):
+                        print(line)
+        except Exception as e:
+            print(f"❌ Index sync failed: {e}")
+
+    threading.Thread(target=run, name="index-sync", daemon=True).start()
@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import threading
+from collections import deque, namedtuple
+
+KEYWORD_VOCAB_DIR = os.getenv(
+    "KEYWORD_VOCAB_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+)
+
+KeywordMatch = namedtuple("KeywordMatch", ["term", "category", "start", "end", "whole_word"])
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over lowercased terms.
+    find() reports every occurrence of every term, with its category, in a
+    single pass over the text regardless of vocabulary size.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._terms = []
+        self._built = False
+
+    def add(self, term, category):
+        term = " ".join(str(term).lower().split())
+        if not term:
+            return
+        node = 0
+        for char in term:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(len(self._terms))
+        self._terms.append((term, category))
+        self._built = False
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit matches that end at the same position
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+        self._built = True
+        return self
+
+    def find(self, text, whole_words=False):
+        if not self._built:
+            self.build()
+
+        text = (text or "").lower()
+        goto, fail, output, terms = self._goto, self._fail, self._output, self._terms
+        matches = []
+        node = 0
+
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            for term_id in output[node]:
+                term, category = terms[term_id]
+                start = index - len(term) + 1
+                whole = (start == 0 or not _is_word_char(text[start - 1])) and \
+                        (index + 1 == len(text) or not _is_word_char(text[index + 1]))
+                if whole or not whole_words:
+                    matches.append(KeywordMatch(term, category, start, index + 1, whole))
+
+        return matches
+
+    def __len__(self):
+        return len(self._terms)
+
+
+def _load_vocabulary(path):
+    with open(path, encoding="utf-8") as vocab_file:
+        return json.load(vocab_file)
+
+
+def topic_slug(topic):
+    return re.sub(r"[^a-z0-9]+", "_", (topic or "").lower()).strip("_")
+
+
+_automata = {}
+_automata_lock = threading.Lock()
+
+
+def get_keyword_automaton(topic=None):
+    """
+    Compiled automaton for the shared vocabulary plus the topic's domain terms
+    (data/topics/<slug>.json). Each combination is compiled once per process.
+    """
+    slug = topic_slug(topic)
+    topic_path = os.path.join(KEYWORD_VOCAB_DIR, "topics", f"{slug}.json") if slug else None
+    key = slug if topic_path and os.path.exists(topic_path) else ""
+
+    automaton = _automata.get(key)
+    if automaton is not None:
+        return automaton
+
+    with _automata_lock:
+        if key not in _automata:
+            automaton = KeywordAutomaton()
+            vocabularies = [_load_vocabulary(os.path.join(KEYWORD_VOCAB_DIR, "keywords.json"))]
+            if key:
+                vocabularies.append(_load_vocabulary(topic_path))
+            for vocabulary in vocabularies:
+                for category, terms in vocabulary.items():
+                    for term in terms:
+                        automaton.add(term, category)
+            _automata[key] = automaton.build()
+            print(f"🔤 Compiled keyword automaton for '{key or 'default'}' ({len(automaton)} terms)")
+    return _automata[key]
+
+
+def match_keywords(text, topic=None, whole_words=False):
+    """All keyword matches in text, as KeywordMatch tuples"""
+    return get_keyword_automaton(topic).find(text, whole_words=whole_words)
@@ -0,0 +1,46 @@
+import threading
+
+
+class LazySingleton:
+    """
+    Thread-safe, build-once holder for an expensive object.
+    The factory runs on the first get(); concurrent first callers wait for
+    that single construction instead of building their own.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "object")
+        self._instance = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._built:
+            return self._instance
+        with self._lock:
+            if not self._built:
+                self._instance = self._factory()
+                self._built = True
+        return self._instance
+
+    @property
+    def built(self):
+        return self._built
+
+    def reset(self):
+        with self._lock:
+            self._instance = None
+            self._built = False
+
+
+class LazyProxy(LazySingleton):
+    """LazySingleton that forwards attribute access, so it can stand in for the object"""
+
+    def __getattr__(self, name):
+        # Only called for attributes the proxy itself does not have
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        state = repr(self._instance) if self._built else "not built"
+        return f"<LazyProxy {self._name}: {state}>"
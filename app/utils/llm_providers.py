@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import random
+import hashlib
+from abc import ABC, abstractmethod
+
+
+class LLMResponse:
+    """Minimal message object: providers return anything with a .content string"""
+
+    def __init__(self, content):
+        self.content = content
+
+
+def prompt_to_text(messages):
+    """Flatten a PromptValue, message list or string into plain text"""
+    if hasattr(messages, "to_string"):
+        return messages.to_string()
+    if isinstance(messages, (list, tuple)):
+        return "\n".join(str(getattr(message, "content", message)) for message in messages)
+    return str(messages)
+
+
+class BaseLLMProvider(ABC):
+    """
+    Interface every LLM backend implements (invoke is required, stream
+    defaults to one chunk).
+    `template` is the registered prompt name and `inputs` the raw prompt
+    variables, which providers may use for routing or simulation.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def invoke(self, messages, template=None, inputs=None):
+        """Blocking call returning an object with a .content string"""
+
+    def stream(self, messages, template=None, inputs=None):
+        yield self.invoke(messages, template=template, inputs=inputs)
+
+
+class GeminiProvider(BaseLLMProvider):
+    name = "gemini"
+
+    def __init__(self, model="gemini-2.5-flash", api_key=None):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        self.model = model
+        self.client = ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=api_key or os.getenv("GOOGLE_API_KEY"),
+            temperature=0,
+            markdown=False
+        )
+
+    def invoke(self, messages, template=None, inputs=None):
+        return self.client.invoke(messages)
+
+    def stream(self, messages, template=None, inputs=None):
+        return self.client.stream(messages)
+
+
+def parse_latency_spec(spec):
+    """
+    Parse a latency distribution in seconds:
+    "fixed:0.5", "uniform:0.2,1.5", "normal:0.8,0.2" or "lognormal:-0.5,0.6"
+    """
+    kind, _, params = (spec or "fixed:0").partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] or [0.0]
+    kind = kind.strip().lower()
+
+    if kind == "uniform":
+        low, high = (values + [values[0]])[:2]
+        return lambda rng: rng.uniform(low, high)
+    if kind == "normal":
+        mean, std = (values + [0.0])[:2]
+        return lambda rng: max(0.0, rng.gauss(mean, std))
+    if kind == "lognormal":
+        mu, sigma = (values + [0.0])[:2]
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    return lambda rng: values[0]
+
+
+class FakeLLMProvider(BaseLLMProvider):
+    """
+    Deterministic offline model for benchmarks and load tests.
+    Returns schema-valid JSON for each registered prompt; the same prompt
+    always produces the same answer. Latency is sampled from
+    FAKE_LLM_LATENCY, overridable per template with FAKE_LLM_LATENCY_<NAME>.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=None, seed=None, chunk_size=24):
+        self.default_latency = parse_latency_spec(latency or os.getenv("FAKE_LLM_LATENCY", "fixed:0"))
+        self.chunk_size = chunk_size
+        self._latencies = {}
+        self._rng = random.Random(seed if seed is not None else os.getenv("FAKE_LLM_SEED"))
+
+    def invoke(self, messages, template=None, inputs=None):
+        time.sleep(self._sample_latency(template))
+        return LLMResponse(self._render(messages, template, inputs or {}))
+
+    def stream(self, messages, template=None, inputs=None):
+        content = self._render(messages, template, inputs or {})
+        latency = self._sample_latency(template)
+        chunks = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)] or [""]
+
+        # Spend a fifth of the latency before the first token, spread the rest
+        time.sleep(latency * 0.2)
+        per_chunk = latency * 0.8 / len(chunks)
+        for chunk in chunks:
+            yield LLMResponse(chunk)
+            time.sleep(per_chunk)
+
+    def _sample_latency(self, template):
+        if template not in self._latencies:
+            spec = os.getenv(f"FAKE_LLM_LATENCY_{(template or '').upper()}")
+            self._latencies[template] = parse_latency_spec(spec) if spec else self.default_latency
+        return self._latencies[template](self._rng)
+
+    def _render(self, messages, template, inputs):
+        text = prompt_to_text(messages)
+        seed = hashlib.sha256(f"{template}:{text}".encode("utf-8")).hexdigest()
+        rng = random.Random(seed)
+        topic = str(inputs.get("topic") or "the topic").strip()
+
+        builder = getattr(self, f"_fake_{template}", None)
+        if builder is None:
+            return self._fake_chat(topic, rng, inputs)
+        return builder(topic, rng, inputs)
+
+    @staticmethod
+    def _as_int(value, default, upper):
+        try:
+            return max(1, min(int(float(value)), upper))
+        except (TypeError, ValueError):
+            return default
+
+    def _fake_roadmap(self, topic, rng, inputs):
+        days = self._as_int(inputs.get("days"), 3, 60)
+        minutes = self._as_int(inputs.get("hours"), 2, 12) * 60
+        roadmap = []
+        for day in range(1, days + 1):
+            tasks = []
+            for part, share in enumerate((minutes // 2, minutes - minutes // 2), start=1):
+                first = share // 2
+                tasks.append({
+                    "parent_task": f"{topic} day {day} block {part}",
+                    "original_duration_minutes": share,
+                    "sub_tasks": [
+                        {"task": f"Study {topic} concept {day}.{part}", "duration_minutes": first,
+                         "description": f"Read about concept {rng.randint(1, 99)} of {topic}."},
+                        {"task": f"Practice {topic} exercise {day}.{part}", "duration_minutes": share - first,
+                         "description": f"Solve exercise {rng.randint(1, 99)} on {topic}."}
+                    ]
+                })
+            roadmap.append({"day": day, "tasks": tasks})
+        return json.dumps({"topic": topic, "days": days, "hours": minutes // 60, "roadmap": roadmap})
+
+    def _fake_refinement(self, topic, rng, inputs):
+        try:
+            return json.dumps(json.loads(inputs.get("roadmap") or "{}"))
+        except (TypeError, ValueError):
+            return "{}"
+
+    def _fake_refinement_patch(self, topic, rng, inputs):
+        try:
+            roadmap = json.loads(inputs.get("roadmap") or "{}")
+        except (TypeError, ValueError):
+            return json.dumps({"patch": []})
+        if not roadmap.get("roadmap") or not roadmap["roadmap"][0].get("tasks"):
+            return json.dumps({"patch": []})
+        return json.dumps({"patch": [{
+            "op": "replace",
+            "path": "/roadmap/0/tasks/0/sub_tasks/0/description",
+            "value": f"Refined: {inputs.get('instruction') or 'updated'}"
+        }]})
+
+    def _fake_flashcards(self, topic, rng, inputs):
+        difficulties = ["easy", "medium", "hard"]
+        return json.dumps({"flashcards": [
+            {
+                "question": f"What is key idea {i} of {topic}?",
+                "answer": f"Key idea {i} of {topic} explained in one sentence.",
+                "category": f"{topic} basics",
+                "difficulty": rng.choice(difficulties)
+            } for i in range(1, 9)
+        ]})
+
+    def _fake_study_guide(self, topic, rng, inputs):
+        return json.dumps({
+            "learning_objectives": [f"Understand {topic} fundamentals", f"Apply {topic} in a project"],
+            "key_concepts": [f"{topic} concept {i}" for i in range(1, 5)],
+            "practice_exercises": [
+                {"title": f"{topic} exercise {i}", "description": "Implement a small example",
+                 "difficulty": level} for i, level in enumerate(["beginner", "intermediate", "advanced"], start=1)
+            ],
+            "study_schedule": [
+                {"week": week, "topics": [f"{topic} part {week}"], "exercises": [f"Exercise {week}"]}
+                for week in (1, 2)
+            ],
+            "resources": [{"type": "documentation", "title": f"{topic} docs", "url": "https://example.com/docs"}]
+        })
+
+    def _fake_materials(self, topic, rng, inputs):
+        slug = "-".join(topic.lower().split()) or "topic"
+        return json.dumps({
+            "videos": [{"title": f"{topic} crash course", "url": f"https://www.youtube.com/watch?v={slug}",
+                        "channel": "Example", "duration": "20 min", "type": "video"}],
+            "articles": [{"title": f"{topic} guide", "url": f"https://example.com/{slug}/guide",
+                          "source": "example.com", "reading_time": "8 min", "type": "article"}],
+            "practice": [{"title": f"{topic} exercises", "url": f"https://example.com/{slug}/practice",
+                          "difficulty": "Beginner", "type": "practice"}],
+            "tools": [{"name": f"{topic} toolkit", "url": f"https://github.com/example/{slug}",
+                       "description": f"Tooling for {topic}", "type": "tool"}]
+        })
+
+    def _fake_chat_qa(self, topic, rng, inputs):
+        question = str(inputs.get("question") or "your question")
+        return json.dumps({
+            "bullets": [f"Main point about {question}", "Second point"],
+            "steps": ["Read the task", "Try the example"],
+            "bold": ["main point"],
+            "markdown": f"## Answer\n\nHere is **the answer** to: {question}\n\n```python\nprint('example')\n```",
+            "code_blocks": [{"language": "python", "code": "print('example')"}]
+        })
+
+    def _fake_task_qa(self, topic, rng, inputs):
+        question = str(inputs.get("question") or "your question")
+        return json.dumps({
+            "answer": f"Answer to {question}",
+            "key_points": ["Point 1", "Point 2"],
+            "steps": ["Step 1", "Step 2"],
+            "examples": ["Example explanation"],
+            "code_blocks": [{"language": "python", "code": "print('example')"}]
+        })
+
+    def _fake_search_enhanced(self, topic, rng, inputs):
+        return json.dumps({
+            "answer": f"Explanation of {inputs.get('question') or topic} based on search results.",
+            "key_points": ["Point 1", "Point 2"],
+            "updated_understanding": {topic.lower(): rng.randint(30, 80)},
+            "resources": [{"title": f"{topic} guide", "url": "https://example.com/guide", "type": "article"}]
+        })
+
+    def _fake_history_summary(self, topic, rng, inputs):
+        return f"The student and tutor discussed {rng.randint(2, 6)} concepts; follow-up questions remain open."
+
+    def _fake_chat(self, topic, rng, inputs):
+        return (
+            f"Here is an explanation about {topic}.\n\n"
+            f"First, focus on concept {rng.randint(1, 9)}. Then try this example:\n\n"
+            "```python\nfor i in range(3):\n    print(i)\n```\n\n"
+            "Practice it and ask a follow-up question."
+        )
+
+
+LLM_PROVIDERS = {
+    "gemini": GeminiProvider,
+    "fake": FakeLLMProvider,
+}
+
+
+def create_llm_provider(name=None):
+    name = (name or os.getenv("LLM_PROVIDER", "gemini")).lower()
+    if name not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {name}")
+    print(f"🤖 Using LLM provider: {name}")
+    return LLM_PROVIDERS[name]()
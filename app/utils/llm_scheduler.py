@@ -0,0 +1,156 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Priority classes: lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+
+class SchedulerQueueFull(Exception):
+    """Raised when a priority class already has too many queued calls"""
+
+
+class SchedulerTimeout(TimeoutError):
+    """Raised when a call waited longer than the queue timeout"""
+
+
+class TokenBucket:
+    """Classic token bucket; rate_per_minute <= 0 disables limiting"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, rate_per_minute)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self):
+        return self.rate <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until a token is available (0 if one is available now)"""
+        if self.unlimited:
+            return 0
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        if not self.unlimited:
+            self.tokens -= 1
+
+
+class LLMScheduler:
+    """
+    Per-worker admission control for LLM calls.
+    Caps concurrent calls, spends one token-bucket token per call and always
+    admits the highest-priority waiter first. Queues are bounded per priority.
+    """
+
+    def __init__(self, max_concurrency=4, rate_per_minute=0, burst=None, max_queue=None, queue_timeout=30):
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.max_queue = max_queue or {INTERACTIVE: 50, BATCH: 20}
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self._waiting = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._metrics = {
+            priority: {"queued": 0, "started": 0, "rejected": 0, "timeouts": 0, "totalWait": 0.0, "maxWait": 0.0}
+            for priority in PRIORITY_NAMES
+        }
+
+    @contextmanager
+    def slot(self, priority=BATCH, timeout=None):
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, priority=BATCH, timeout=None):
+        timeout = self.queue_timeout if timeout is None else timeout
+        metrics = self._metrics.setdefault(
+            priority, {"queued": 0, "started": 0, "rejected": 0, "timeouts": 0, "totalWait": 0.0, "maxWait": 0.0}
+        )
+        enqueued_at = time.monotonic()
+        deadline = enqueued_at + timeout
+
+        with self._cond:
+            if metrics["queued"] >= self.max_queue.get(priority, 20):
+                metrics["rejected"] += 1
+                raise SchedulerQueueFull(f"LLM queue for {PRIORITY_NAMES.get(priority, priority)} calls is full")
+
+            ticket = (priority, next(self._counter))
+            heapq.heappush(self._waiting, ticket)
+            metrics["queued"] += 1
+
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics["timeouts"] += 1
+                        raise SchedulerTimeout(f"Waited more than {timeout}s for an LLM slot")
+
+                    if self._waiting[0] == ticket and self.running < self.max_concurrency:
+                        token_wait = self.bucket.wait_time()
+                        if token_wait == 0:
+                            break
+                        self._cond.wait(min(remaining, token_wait))
+                    else:
+                        self._cond.wait(remaining)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                metrics["queued"] -= 1
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            metrics["queued"] -= 1
+            self.bucket.consume()
+            self.running += 1
+
+            waited = time.monotonic() - enqueued_at
+            metrics["started"] += 1
+            metrics["totalWait"] += waited
+            metrics["maxWait"] = max(metrics["maxWait"], waited)
+
+            # Let the next waiter re-check capacity
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            classes = {}
+            for priority, metrics in self._metrics.items():
+                started = metrics["started"]
+                classes[PRIORITY_NAMES.get(priority, str(priority))] = {
+                    "queued": metrics["queued"],
+                    "started": started,
+                    "rejected": metrics["rejected"],
+                    "timeouts": metrics["timeouts"],
+                    "avgWaitMs": round(metrics["totalWait"] / started * 1000, 1) if started else 0,
+                    "maxWaitMs": round(metrics["maxWait"] * 1000, 1)
+                }
+            return {
+                "running": self.running,
+                "maxConcurrency": self.max_concurrency,
+                "ratePerMinute": round(self.bucket.rate * 60, 2),
+                "classes": classes
+            }
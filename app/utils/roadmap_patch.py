@@ -0,0 +1,205 @@
+import copy
+import json
+from collections import Counter
+
+PATCH_OPS = ("add", "remove", "replace", "move", "copy", "test")
+
+
+class PatchError(ValueError):
+    """A patch operation could not be applied or left the roadmap invalid"""
+
+
+def parse_pointer(path):
+    """Split a JSON Pointer ("/roadmap/2/tasks/0") into its unescaped tokens"""
+    if path == "":
+        return []
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise PatchError(f"Invalid path: {path!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _child(container, token, path):
+    if isinstance(container, list):
+        try:
+            index = int(token)
+        except ValueError:
+            raise PatchError(f"Expected a list index in {path}")
+        if not 0 <= index < len(container):
+            raise PatchError(f"Index out of range in {path}")
+        return index
+    if isinstance(container, dict):
+        return token
+    raise PatchError(f"Cannot descend into {path}")
+
+
+def _resolve(doc, path):
+    """Parent container and final token for a path"""
+    tokens = parse_pointer(path)
+    if not tokens:
+        raise PatchError("Operations on the whole document are not allowed")
+    parent = doc
+    for token in tokens[:-1]:
+        key = _child(parent, token, path)
+        if isinstance(parent, dict) and key not in parent:
+            raise PatchError(f"Missing path {path}")
+        parent = parent[key]
+    return parent, tokens[-1]
+
+
+def _get(doc, path):
+    parent, token = _resolve(doc, path)
+    key = _child(parent, token, path)
+    if isinstance(parent, dict) and key not in parent:
+        raise PatchError(f"Missing path {path}")
+    return parent[key]
+
+
+def _add(doc, path, value):
+    parent, token = _resolve(doc, path)
+    if isinstance(parent, list):
+        if token == "-":
+            parent.append(value)
+            return
+        try:
+            index = int(token)
+        except ValueError:
+            raise PatchError(f"Expected a list index in {path}")
+        if not 0 <= index <= len(parent):
+            raise PatchError(f"Index out of range in {path}")
+        parent.insert(index, value)
+    elif isinstance(parent, dict):
+        parent[token] = value
+    else:
+        raise PatchError(f"Cannot add to {path}")
+
+
+def _remove(doc, path):
+    parent, token = _resolve(doc, path)
+    key = _child(parent, token, path)
+    if isinstance(parent, dict) and key not in parent:
+        raise PatchError(f"Missing path {path}")
+    return parent.pop(key)
+
+
+def apply_patch(document, operations):
+    """
+    Apply RFC 6902 style operations to a copy of document and return it.
+    The input is never modified, so a failed patch leaves nothing half-applied.
+    """
+    if not isinstance(operations, list):
+        raise PatchError("Patch must be a list of operations")
+
+    doc = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get("op") not in PATCH_OPS:
+            raise PatchError(f"Invalid operation: {operation!r}")
+        op, path = operation["op"], operation.get("path")
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f"Operation {op} on {path} has no value")
+
+        if op == "add":
+            _add(doc, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(doc, path)
+        elif op == "replace":
+            _get(doc, path)
+            parent, token = _resolve(doc, path)
+            parent[_child(parent, token, path)] = copy.deepcopy(operation["value"])
+        elif op == "move":
+            value = _remove(doc, operation.get("from"))
+            _add(doc, path, value)
+        elif op == "copy":
+            _add(doc, path, copy.deepcopy(_get(doc, operation.get("from"))))
+        elif op == "test":
+            if _get(doc, path) != operation["value"]:
+                raise PatchError(f"Test failed at {path}")
+    return doc
+
+
+def _as_minutes(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)) and value >= 0 and float(value).is_integer():
+        return int(value)
+    return None
+
+
+def _roadmap_problems(roadmap):
+    """(path, offending day or task, message) for every problem in a roadmap"""
+    if not isinstance(roadmap, dict) or not isinstance(roadmap.get("roadmap"), list):
+        return [("", roadmap, "roadmap must be an object with a 'roadmap' list")]
+
+    problems = []
+    for day_index, day in enumerate(roadmap["roadmap"]):
+        where = f"/roadmap/{day_index}"
+        if not isinstance(day, dict) or not isinstance(day.get("tasks"), list):
+            problems.append((where, day, " must have a 'tasks' list"))
+            continue
+
+        for task_index, task in enumerate(day["tasks"]):
+            task_where = f"{where}/tasks/{task_index}"
+            if not isinstance(task, dict) or not isinstance(task.get("sub_tasks"), list):
+                problems.append((task_where, task, " must have a 'sub_tasks' list"))
+                continue
+
+            total = _as_minutes(task.get("original_duration_minutes"))
+            if total is None:
+                problems.append((task_where, task, "/original_duration_minutes must be a whole number"))
+                continue
+
+            durations = [
+                _as_minutes(sub_task.get("duration_minutes")) if isinstance(sub_task, dict) else None
+                for sub_task in task["sub_tasks"]
+            ]
+            if None in durations:
+                problems.append((task_where, task, " has a sub-task without a whole-number duration_minutes"))
+            elif sum(durations) != total:
+                problems.append(
+                    (task_where, task, f" sub-task durations sum to {sum(durations)}, expected {total}")
+                )
+    return problems
+
+
+def validate_roadmap(roadmap):
+    """List of problems with a roadmap; empty when it is well formed"""
+    return [f"{where}{message}" for where, _, message in _roadmap_problems(roadmap)]
+
+
+def _problem_key(element, message):
+    # Identify a problem by the day/task content, not by its (shifting) index
+    return json.dumps(element, sort_keys=True, default=str), message
+
+
+def is_patchable(roadmap):
+    """Patches need a roadmap object whose 'roadmap' is a list of day objects"""
+    days = roadmap.get("roadmap") if isinstance(roadmap, dict) else None
+    return isinstance(days, list) and all(isinstance(day, dict) for day in days)
+
+
+def apply_roadmap_patch(roadmap, operations):
+    """Apply a patch to a roadmap and enforce the roadmap invariants on the result"""
+    if not is_patchable(roadmap):
+        raise PatchError("roadmap must be an object with a 'roadmap' list of days")
+    patched = apply_patch(roadmap, operations)
+    if not is_patchable(patched):
+        raise PatchError("patch must leave a 'roadmap' list of days")
+    # Only reject problems the patch introduced, not ones the roadmap already
+    # had: an unchanged day or task keeps its problem wherever it moved to
+    existing = Counter(_problem_key(element, message) for _, element, message in _roadmap_problems(roadmap))
+    problems = []
+    for where, element, message in _roadmap_problems(patched):
+        key = _problem_key(element, message)
+        if existing[key]:
+            existing[key] -= 1
+        else:
+            problems.append(f"{where}{message}")
+    if problems:
+        raise PatchError("; ".join(problems[:5]))
+
+    # Days may have been added or removed: keep the numbering and count consistent
+    for number, day in enumerate(patched["roadmap"], start=1):
+        day["day"] = number
+    if "days" in patched:
+        patched["days"] = len(patched["roadmap"])
+    return patched
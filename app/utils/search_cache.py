@@ -0,0 +1,150 @@
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from app.utils.cache import TTLCache
+from app.utils.helpers import get_db
+from app.utils.indexes import ensure_collection_indexes
+
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "21600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+SEARCH_CACHE_PERSIST = os.getenv("SEARCH_CACHE_PERSIST", "false").lower() == "true"
+
+# Words that do not change what a search returns
+STOP_WORDS = frozenset([
+    "a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "with", "about",
+    "is", "are", "was", "be", "do", "does", "what", "whats", "what's", "which",
+    "can", "i", "me", "my", "you", "your", "please", "some", "any", "this", "that"
+])
+
+# Keep symbols that matter in technology names (c++, c#, .net, node.js)
+_TOKEN_PATTERN = re.compile(r"[\w+#.]+")
+
+
+def normalize_query(query):
+    """Fold case, whitespace and stop words so near-identical queries share a key"""
+    tokens = _TOKEN_PATTERN.findall((query or "").lower())
+    kept = [token.strip(".") for token in tokens if token.strip(".") and token not in STOP_WORDS]
+    return " ".join(kept)
+
+
+class CachedSearch:
+    """
+    Drop-in wrapper around a LangChain search tool that caches results by
+    normalized query, in memory and optionally in a Mongo TTL collection.
+    With a `corpus` (SearchCorpus), queries are answered from previously
+    fetched passages before going to the network, and new results are indexed.
+    Network calls go through `breaker` (a CircuitBreaker) when one is given.
+    """
+
+    def __init__(self, search_tool, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES,
+                 persist=SEARCH_CACHE_PERSIST, collection_name="search_cache", corpus=None, breaker=None):
+        self.search_tool = search_tool
+        self.corpus = corpus
+        self.breaker = breaker
+        self.ttl = ttl
+        self.persist = persist
+        self.collection_name = collection_name
+        self.cache = TTLCache(max_entries=max_entries, default_ttl=ttl)
+        self.persisted_hits = 0
+        self._index_ready = False
+        self._index_lock = threading.Lock()
+
+    def run(self, query, use_cache=True, use_corpus=True):
+        """
+        Search result text for the query. use_corpus=False skips the local
+        corpus (free-form questions need real results, not nearby passages).
+        """
+        key = normalize_query(query)
+        if not use_cache or not key:
+            return self._search_network(query)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        stored = self._load_persisted(key)
+        if stored is not None:
+            self.persisted_hits += 1
+            self.cache.set(key, stored)
+            return stored
+
+        local = self._lookup_corpus(query) if use_corpus else None
+        if local is not None:
+            self.cache.set(key, local)
+            return local
+
+        result = self._search_network(query)
+        if result:
+            self.cache.set(key, result)
+            self._store_persisted(key, query, result)
+            self._index_corpus(query, result)
+        return result
+
+    def _search_network(self, query):
+        if self.breaker is None:
+            return self.search_tool.run(query)
+        return self.breaker.call(self.search_tool.run, query)
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["persist"] = self.persist
+        stats["persistedHits"] = self.persisted_hits
+        if self.corpus is not None:
+            stats["corpus"] = self.corpus.stats()
+        return stats
+
+    def _lookup_corpus(self, query):
+        if self.corpus is None:
+            return None
+        try:
+            return self.corpus.lookup(query)
+        except Exception as e:
+            print(f"❌ Search corpus lookup error: {e}")
+            return None
+
+    def _index_corpus(self, query, result):
+        if self.corpus is None:
+            return
+        try:
+            self.corpus.add_result(query, result)
+        except Exception as e:
+            print(f"❌ Search corpus index error: {e}")
+
+    def _collection(self):
+        collection = get_db()[self.collection_name]
+        if not self._index_ready:
+            with self._index_lock:
+                if not self._index_ready:
+                    # Mongo removes documents once expiresAt has passed (see INDEX_SPECS)
+                    ensure_collection_indexes(collection, "search_cache")
+                    self._index_ready = True
+        return collection
+
+    def _load_persisted(self, key):
+        if not self.persist:
+            return None
+        try:
+            doc = self._collection().find_one({"_id": key, "expiresAt": {"$gt": datetime.utcnow()}})
+            return doc.get("result") if doc else None
+        except Exception as e:
+            print(f"❌ Search cache read error: {e}")
+            return None
+
+    def _store_persisted(self, key, query, result):
+        if not self.persist:
+            return
+        try:
+            now = datetime.utcnow()
+            self._collection().update_one(
+                {"_id": key},
+                {"$set": {
+                    "query": query,
+                    "result": result,
+                    "createdAt": now,
+                    "expiresAt": now + timedelta(seconds=self.ttl)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"❌ Search cache write error: {e}")
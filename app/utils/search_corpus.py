@@ -0,0 +1,253 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from app.utils.bm25 import BM25Index
+from app.utils.helpers import get_db
+from app.utils.indexes import ensure_collection_indexes
+from app.utils.search_cache import normalize_query
+
+SEARCH_CORPUS_ENABLED = os.getenv("SEARCH_CORPUS_ENABLED", "true").lower() == "true"
+# "memory" (per process), "mongo" (shared) or "file" (JSONL at SEARCH_CORPUS_PATH).
+# The file is not coordinated between processes: use it with a single worker.
+SEARCH_CORPUS_BACKEND = os.getenv("SEARCH_CORPUS_BACKEND", "memory").lower()
+SEARCH_CORPUS_PATH = os.getenv("SEARCH_CORPUS_PATH", os.path.join(".cache", "search_corpus.jsonl"))
+SEARCH_CORPUS_MAX_AGE = int(os.getenv("SEARCH_CORPUS_MAX_AGE", "604800"))
+SEARCH_CORPUS_MAX_DOCS = int(os.getenv("SEARCH_CORPUS_MAX_DOCS", "50000"))
+SEARCH_CORPUS_RESULTS = int(os.getenv("SEARCH_CORPUS_RESULTS", "8"))
+SEARCH_CORPUS_MIN_HITS = int(os.getenv("SEARCH_CORPUS_MIN_HITS", "3"))
+# Share of the query's content terms the hits must contain
+SEARCH_CORPUS_MIN_COVERAGE = float(os.getenv("SEARCH_CORPUS_MIN_COVERAGE", "1.0"))
+
+# Words the app's own search queries append ("<topic> <question> tutorial
+# guide examples 2024"); they match almost any passage, so they never count
+# towards coverage
+QUERY_FILLER_TERMS = frozenset(["tutorial", "guide", "examples"])
+_YEAR_PATTERN = re.compile(r"(19|20)\d\d")
+
+MAX_PASSAGE_CHARS = 600
+
+
+def corpus_tokenize(text):
+    """Query tokens, plus the parts of dotted tokens so urls match plain words"""
+    tokens = []
+    for token in normalize_query(text).split():
+        tokens.append(token)
+        if "." in token:
+            tokens.extend(part for part in token.split(".") if part)
+    return tokens
+
+
+def content_terms(query):
+    """Query terms that say what is being searched for (no filler words or years)"""
+    terms = set(normalize_query(query).split())
+    content = {term for term in terms if term not in QUERY_FILLER_TERMS and not _YEAR_PATTERN.fullmatch(term)}
+    return content or terms
+
+
+def _doc_id(text):
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def _passages(result):
+    """Split a raw search blob into indexable passages (one per result line)"""
+    for line in (result or "").split("\n"):
+        line = line.strip()
+        while line:
+            yield line[:MAX_PASSAGE_CHARS]
+            line = line[MAX_PASSAGE_CHARS:].strip()
+
+
+def _resource_text(item):
+    parts = [
+        item.get("title") or item.get("name"),
+        item.get("url"),
+        item.get("type"),
+        item.get("description") or item.get("source") or item.get("channel")
+    ]
+    return " ".join(str(part) for part in parts if part)
+
+
+class SearchCorpus:
+    """
+    Local BM25 corpus of every search result and material already fetched.
+    lookup() answers a query from fresh passages when enough of them match
+    it, so only misses and stale entries go to the network. Every add is
+    appended to the backend, and the index is rebuilt from it on first use.
+    """
+
+    def __init__(self, backend=SEARCH_CORPUS_BACKEND, path=SEARCH_CORPUS_PATH,
+                 max_age=SEARCH_CORPUS_MAX_AGE, max_docs=SEARCH_CORPUS_MAX_DOCS,
+                 collection_name="search_corpus"):
+        self.backend = backend
+        self.path = path
+        self.max_age = max_age
+        self.max_docs = max_docs
+        self.collection_name = collection_name
+        self.index = BM25Index(tokenizer=corpus_tokenize)
+        self.local_hits = 0
+        self.local_misses = 0
+        self._loaded = False
+        self._file_lines = 0
+        self._index_ready = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def lookup(self, query, k=SEARCH_CORPUS_RESULTS, min_hits=SEARCH_CORPUS_MIN_HITS,
+               min_coverage=SEARCH_CORPUS_MIN_COVERAGE):
+        """Search-tool style result text from local passages, or None on a miss"""
+        self._ensure_loaded()
+        query_terms = content_terms(query)
+        if not query_terms:
+            return None
+
+        cutoff = time.time() - self.max_age
+        hits = self.index.search(" ".join(sorted(query_terms)), k=k, accept=lambda doc: doc["fetchedAt"] >= cutoff)
+
+        # Generic passages matching only the filler must not answer a specific query
+        matched = set().union(*(hit.matched for hit in hits)) if hits else set()
+        if len(hits) < min_hits or len(matched & query_terms) < min_coverage * len(query_terms):
+            self.local_misses += 1
+            return None
+
+        self.local_hits += 1
+        return "\n".join(hit.payload["text"] for hit in hits)
+
+    def add_result(self, query, result, source="search"):
+        """Index every passage of a raw search result"""
+        return self._add_documents(
+            [(text, query, source) for text in _passages(result)]
+        )
+
+    def add_resources(self, items, topic, source="materials"):
+        """Index structured resources (materials, extracted resources) as passages"""
+        return self._add_documents(
+            [(_resource_text(item), topic, source) for item in items or [] if isinstance(item, dict)]
+        )
+
+    def stats(self):
+        stats = self.index.stats()
+        stats.update({
+            "backend": self.backend,
+            "localHits": self.local_hits,
+            "localMisses": self.local_misses
+        })
+        return stats
+
+    def _add_documents(self, entries):
+        self._ensure_loaded()
+        now = time.time()
+        docs = []
+        for text, query, source in entries:
+            if not text:
+                continue
+            doc = {"id": _doc_id(text), "text": text, "query": query, "source": source, "fetchedAt": now}
+            if self.index.add(doc["id"], text, doc):
+                docs.append(doc)
+
+        if docs:
+            self._persist(docs)
+            self._evict_oldest()
+        return len(docs)
+
+    def _evict_oldest(self):
+        if len(self.index) <= self.max_docs:
+            return
+        # Drop the oldest tenth in one go instead of one document per add
+        items = sorted(self.index.items(), key=lambda item: item[1]["fetchedAt"])
+        for doc_id, _ in items[:max(1, len(items) - self.max_docs + self.max_docs // 10)]:
+            self.index.remove(doc_id)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            cutoff = time.time() - self.max_age
+            count = 0
+            for doc in self._load_persisted(cutoff):
+                if doc.get("text") and doc.get("fetchedAt", 0) >= cutoff:
+                    self.index.add(doc["id"], doc["text"], doc)
+                    count += 1
+            self._loaded = True
+            if self.backend == "file" and self._file_lines > 2 * len(self.index) + 100:
+                self._compact_file()
+            if count:
+                print(f"📚 Loaded {len(self.index)} search corpus passages ({self.backend})")
+
+    def _collection(self):
+        collection = get_db()[self.collection_name]
+        if not self._index_ready:
+            # Mongo removes documents once expiresAt has passed (see INDEX_SPECS)
+            ensure_collection_indexes(collection, "search_corpus")
+            self._index_ready = True
+        return collection
+
+    def _load_persisted(self, cutoff):
+        try:
+            if self.backend == "file":
+                if not os.path.exists(self.path):
+                    return []
+                docs = {}
+                self._file_lines = 0
+                with open(self.path, encoding="utf-8") as corpus_file:
+                    for line in corpus_file:
+                        self._file_lines += 1
+                        try:
+                            doc = json.loads(line)
+                        except ValueError:
+                            continue
+                        docs[doc.get("id")] = doc
+                return list(docs.values())
+            if self.backend == "mongo":
+                return [
+                    {**doc, "id": doc["_id"]}
+                    for doc in self._collection().find({"fetchedAt": {"$gte": cutoff}}, {"expiresAt": 0})
+                ]
+        except Exception as e:
+            print(f"❌ Search corpus load error: {e}")
+        return []
+
+    def _compact_file(self):
+        """Rewrite the append-only file with only the live, fresh passages"""
+        try:
+            with self._write_lock:
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as corpus_file:
+                    for _, doc in self.index.items():
+                        corpus_file.write(json.dumps(doc) + "\n")
+                os.replace(temp_path, self.path)
+                self._file_lines = len(self.index)
+        except Exception as e:
+            print(f"❌ Search corpus compaction error: {e}")
+
+    def _persist(self, docs):
+        try:
+            if self.backend == "file":
+                with self._write_lock:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as corpus_file:
+                        for doc in docs:
+                            corpus_file.write(json.dumps(doc) + "\n")
+            elif self.backend == "mongo":
+                expires_at = datetime.utcnow() + timedelta(seconds=self.max_age)
+                collection = self._collection()
+                for doc in docs:
+                    fields = {key: value for key, value in doc.items() if key != "id"}
+                    collection.update_one(
+                        {"_id": doc["id"]},
+                        {"$set": {**fields, "expiresAt": expires_at}},
+                        upsert=True
+                    )
+        except Exception as e:
+            print(f"❌ Search corpus write error: {e}")
+
+
+def create_search_corpus():
+    return SearchCorpus() if SEARCH_CORPUS_ENABLED else None
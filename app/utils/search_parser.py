@@ -0,0 +1,153 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+URL_PATTERN = re.compile(r'https?://[^\s]+')
+
+VIDEO_DOMAINS = ('youtube.com', 'youtu.be')
+SOCIAL_DOMAINS = ('twitter.com', 'facebook.com')
+PRACTICE_KEYWORDS = ('exercise', 'practice', 'example', 'tutorial')
+TOOL_KEYWORDS = ('library', 'framework', 'tool', 'package')
+
+# Query parameters that never change the page content: names starting with
+# a prefix, or equal to one of the exact names (`ref` must not match `refresh`)
+TRACKING_PREFIXES = ('utm_',)
+TRACKING_PARAMS = frozenset({'fbclid', 'gclid', 'ref', 'ref_src'})
+
+
+@dataclass(frozen=True)
+class SearchRecord:
+    url: str
+    canonical_url: str
+    domain: str
+    title: str
+    snippet: str
+    type: str
+    tags: frozenset
+
+    @property
+    def is_video(self):
+        return any(site in self.url for site in VIDEO_DOMAINS)
+
+    @property
+    def is_social(self):
+        return any(site in self.url for site in SOCIAL_DOMAINS)
+
+
+def extract_title_from_line(line: str) -> str:
+    """Extract a title from search result line"""
+    # Remove URLs and clean up
+    clean_line = URL_PATTERN.sub('', line)
+    clean_line = clean_line.strip(' -•')
+
+    # Take first 60 characters as title
+    return clean_line[:60] + ('...' if len(clean_line) > 60 else '')
+
+
+def extract_domain_from_url(url: str) -> str:
+    """Extract domain name from URL"""
+    try:
+        domain = urlparse(url).netloc
+    except ValueError:
+        # Malformed URL, e.g. an unclosed IPv6 bracket
+        return ''
+    return domain.replace('www.', '')
+
+
+def classify_resource_type(url: str, context: str) -> str:
+    """Classify the type of resource based on URL and context"""
+    url_lower = url.lower()
+    context_lower = context.lower()
+
+    if 'youtube.com' in url_lower or 'youtu.be' in url_lower:
+        return 'video'
+    elif 'github.com' in url_lower:
+        return 'tool'
+    elif 'docs' in url_lower or 'documentation' in context_lower:
+        return 'documentation'
+    elif 'course' in context_lower or 'tutorial' in context_lower:
+        return 'article'
+    else:
+        return 'article'
+
+
+def _is_tracking_param(key: str) -> bool:
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so the same page found twice dedupes to one record"""
+    url = url.rstrip('.,;:!?)]}\'"')
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        # Malformed URL (e.g. an unclosed IPv6 bracket): dedupe on the raw text
+        return url
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    ])
+    path = parsed.path.rstrip('/') or ''
+    return urlunparse(('https', host, path, '', query, ''))
+
+
+@lru_cache(maxsize=128)
+def parse_search_results(search_results: str) -> tuple:
+    """
+    Parse a raw search result blob into SearchRecords, once.
+    Each line is split, matched and classified a single time; repeated calls
+    with the same blob return the cached records.
+    """
+    records = []
+    for line in (search_results or '').split('\n'):
+        if 'http' not in line:
+            continue
+
+        urls = URL_PATTERN.findall(line)
+        if not urls:
+            continue
+
+        stripped = line.strip()
+        line_lower = line.lower()
+        title = extract_title_from_line(line)
+        tags = frozenset(
+            (['practice'] if any(keyword in line_lower for keyword in PRACTICE_KEYWORDS) else []) +
+            (['tool'] if any(keyword in line_lower for keyword in TOOL_KEYWORDS) else [])
+        )
+
+        for url in urls:
+            records.append(SearchRecord(
+                url=url,
+                canonical_url=canonicalize_url(url),
+                domain=extract_domain_from_url(url),
+                title=title,
+                snippet=stripped,
+                type=classify_resource_type(url, line),
+                tags=tags
+            ))
+    return tuple(records)
+
+
+def unique_records(records, predicate=None, limit=None):
+    """Filter records and dedupe them by canonical URL, preserving order"""
+    seen = set()
+    selected = []
+    for record in records:
+        if predicate and not predicate(record):
+            continue
+        if record.canonical_url in seen:
+            continue
+        seen.add(record.canonical_url)
+        selected.append(record)
+        if limit and len(selected) >= limit:
+            break
+    return selected
+
+
+def truncate(text: str, length: int) -> str:
+    return text[:length] + "..." if len(text) > length else text
@@ -0,0 +1,70 @@
+import threading
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised when a waiter gives up on an in-flight call"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, later callers block until it finishes and share its result.
+    """
+
+    def __init__(self, default_timeout=60):
+        self.default_timeout = default_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        timeout = self.default_timeout if timeout is None else timeout
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = fn(*args, **kwargs)
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        elif not call.done.wait(timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise SingleFlightTimeout(f"Timed out after {timeout}s waiting for in-flight call")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "inFlight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts
+            }
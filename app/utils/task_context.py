@@ -0,0 +1,83 @@
+import os
+from app.utils.bm25 import BM25Index
+from app.utils.search_corpus import corpus_tokenize
+
+TASK_CONTEXT_TOP_K = int(os.getenv("TASK_CONTEXT_TOP_K", "8"))
+# Groups listed by name in the summary of the tasks that were left out
+TASK_SUMMARY_MAX_GROUPS = int(os.getenv("TASK_SUMMARY_MAX_GROUPS", "10"))
+
+
+def format_task_line(task):
+    status = "✅ Completed" if task.get('completed') else "⏳ Pending"
+    return (
+        f"- [Group: {task.get('parent_task_title')}] {task.get('task')} "
+        f"({task.get('duration_minutes', 0)}min) - {status}. Description: {task.get('description')}"
+    )
+
+
+def rank_tasks(tasks, question, top_k=TASK_CONTEXT_TOP_K):
+    """
+    Indexes of the top_k tasks most relevant to the question, by BM25 over
+    task, parent_task_title and description. Unmatched slots go to the
+    first pending tasks, which are what the student is most likely on.
+    """
+    index = BM25Index(tokenizer=corpus_tokenize)
+    for position, task in enumerate(tasks):
+        index.add(position, " ".join(
+            str(task.get(field) or "") for field in ("task", "parent_task_title", "description")
+        ))
+
+    selected = [hit.doc_id for hit in index.search(question or "", k=top_k)]
+    if len(selected) < top_k:
+        chosen = set(selected)
+        for position, task in enumerate(tasks):
+            if len(selected) >= top_k:
+                break
+            if position not in chosen and not task.get('completed'):
+                selected.append(position)
+                chosen.add(position)
+    return selected
+
+
+def summarize_tasks(tasks):
+    """One compact paragraph describing tasks by group instead of line by line"""
+    groups = {}
+    for task in tasks:
+        group = groups.setdefault(task.get('parent_task_title') or "Ungrouped", [0, 0, 0])
+        group[0] += 1
+        group[1] += 1 if task.get('completed') else 0
+        try:
+            group[2] += int(task.get('duration_minutes') or 0)
+        except (TypeError, ValueError):
+            pass
+
+    parts = [
+        f"{name}: {count} tasks, {completed} completed, {minutes}min"
+        for name, (count, completed, minutes) in list(groups.items())[:TASK_SUMMARY_MAX_GROUPS]
+    ]
+    if len(groups) > TASK_SUMMARY_MAX_GROUPS:
+        parts.append(f"{len(groups) - TASK_SUMMARY_MAX_GROUPS} more groups")
+    completed = sum(1 for task in tasks if task.get('completed'))
+    return f"Other tasks ({len(tasks)}, {completed} completed) - " + "; ".join(parts)
+
+
+def build_tasks_context(tasks, question, top_k=TASK_CONTEXT_TOP_K):
+    """tasks_context text for chat_qa_prompt: relevant tasks in full, the rest summarized"""
+    if not tasks:
+        return "No tasks are currently defined."
+
+    if len(tasks) <= top_k:
+        selected = list(range(len(tasks)))
+    else:
+        # Keep plan order so the model still sees the sequence
+        selected = sorted(rank_tasks(tasks, question, top_k))
+
+    lines = ["User's current tasks:"]
+    lines.extend(format_task_line(tasks[position]) for position in selected)
+
+    chosen = set(selected)
+    rest = [task for position, task in enumerate(tasks) if position not in chosen]
+    if rest:
+        lines.append(summarize_tasks(rest))
+
+    return "\n".join(lines) + "\n\n"
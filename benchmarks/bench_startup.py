@@ -0,0 +1,85 @@
+"""
+Worker startup benchmark: time to import the app and run create_app(), the
+process RSS afterwards and which heavy client libraries got loaded.
+
+Each run is a fresh interpreter, like a new gunicorn worker. Pass --ref to
+measure another git revision (checked out in a temporary worktree) side by
+side, e.g. the commit before lazy initialization.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--ref GIT_REF]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_PACKAGES = ("langchain_core", "langchain_community", "langchain_google_genai", "firebase_admin")
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": sorted({name.split(".")[0] for name in sys.modules} & set(%r)),
+}))
+""" % (HEAVY_PACKAGES,)
+
+
+def measure(tree, runs):
+    # The fake provider keeps the eager (pre-lazy) code path from needing an API key
+    env = dict(os.environ, LLM_PROVIDER=os.environ.get("LLM_PROVIDER", "fake"), PYTHONPATH=tree)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=tree, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(sample["seconds"] for sample in samples),
+        "rss_mb": statistics.median(sample["rss_mb"] for sample in samples),
+        "loaded": samples[-1]["loaded"],
+    }
+
+
+def checkout(ref):
+    path = tempfile.mkdtemp(prefix="bench-startup-")
+    subprocess.run(["git", "worktree", "add", "--detach", path, ref], cwd=ROOT, check=True, capture_output=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", help="git revision to compare against")
+    args = parser.parse_args()
+
+    trees = [("working tree", ROOT)]
+    worktree = None
+    if args.ref:
+        worktree = checkout(args.ref)
+        trees.insert(0, (args.ref, worktree))
+
+    try:
+        print(f"{'tree':>14} {'startup ms':>11} {'RSS MB':>8}  heavy modules loaded")
+        for label, tree in trees:
+            result = measure(tree, args.runs)
+            print(f"{label[:14]:>14} {result['seconds'] * 1000:>11.0f} {result['rss_mb']:>8.1f}  "
+                  f"{', '.join(result['loaded']) or '-'}")
+    finally:
+        if worktree:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=ROOT, capture_output=True)
+            shutil.rmtree(worktree, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+from app import create_app
+from app.services.job_service import JobService
+
+app = create_app()
+
+if __name__ == "__main__":
+    # Run with JOB_MODE=external on the web workers so jobs are only executed here
+    with app.app_context():
+        JobService.work_forever()